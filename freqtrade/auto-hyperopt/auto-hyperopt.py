@@ -1,36 +1,42 @@
 import gc
 import hashlib
+import heapq
 import logging
 import os
+import resource
 import shutil
+import sqlite3
 import sys
 import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import (FIRST_COMPLETED, ProcessPoolExecutor,
+                                ThreadPoolExecutor, wait)
+from contextlib import contextmanager, nullcontext
 from copy import deepcopy
-from datetime import datetime, timezone
-from itertools import islice
+from datetime import datetime, timedelta, timezone
+from multiprocessing import get_context
 from pathlib import Path
 
 import fire
 import numpy as np
-import pandas as pd
 import rapidjson
-from freqtrade.commands.optimize_commands import (start_backtesting,
-                                                  start_hyperopt)
+from freqtrade.commands.optimize_commands import setup_optimize_configuration
+from freqtrade.configuration import validate_config_consistency
+from freqtrade.enums import RunMode
 from freqtrade.loggers import setup_logging_pre
-from freqtrade.misc import deep_merge_dicts, safe_value_fallback2
+from freqtrade.misc import deep_merge_dicts
+from freqtrade.optimize.backtesting import Backtesting
+from freqtrade.optimize.hyperopt import Hyperopt
 from freqtrade.optimize.hyperopt_tools import (HYPER_PARAMS_FILE_FORMAT,
                                                HyperoptTools,
                                                hyperopt_serializer)
-from joblib import Parallel, delayed
-from sklearn.preprocessing import StandardScaler
+from freqtrade.resolvers import StrategyResolver
 
 logger = logging.getLogger("freqtrade")
 
-DERIVED_STRATEGY_HEADER = """
-from {strategy} import {strategy}
-
-class {derived_strategy}_{idx:05d}({strategy}):
-"""
+VARIANTS_FILE = "variants.json"
 
 BACKTEST_METRICS_COLUMNS = [
     "total_trades",
@@ -48,6 +54,681 @@ BACKTEST_METRICS_COLUMNS = [
     "winrate",
 ]
 
+METRICS_DTYPE = np.dtype([(column, np.float64) for column in BACKTEST_METRICS_COLUMNS])
+# Lower drawdown scores higher.
+METRICS_SIGN = np.array(
+    [-1.0 if column == "max_relative_drawdown" else 1.0 for column in BACKTEST_METRICS_COLUMNS]
+)
+
+# Work queue states of the strategies of a hyperopt_optimize pipeline.
+PENDING = "pending"
+HYPEROPTED = "hyperopted"  # Hyperopt finished, results not filtered into the output yet.
+DONE = "done"
+# Pipeline states, besides DONE.
+RUNNING = "running"
+
+# Options that have no impact on the results of a pipeline.
+FINGERPRINT_IGNORED_KEYS = (
+    "hyperopt_jobs",
+    "cpu_budget",
+    "max_parallel_backtest",
+    "max_parallel_hyperopt",
+    "max_parallel_pipelines",
+    "backtest_share_indicators",
+    "print_all",
+)
+
+
+class Cancelled(Exception):
+    """Raised in a pipeline once the run was interrupted."""
+
+
+def _wait_first(futures, cancel):
+    """
+    Waits like `wait(futures, return_when=FIRST_COMPLETED)`, but stops waiting
+    once `cancel` is set.
+
+    Parameters:
+    - futures (iterable): Futures to wait on.
+    - cancel (threading.Event): Set when the run was interrupted.
+
+    Returns:
+    - tuple: Sets of the done and the pending futures.
+    """
+    while not cancel.is_set():
+        done, pending = wait(futures, timeout=1, return_when=FIRST_COMPLETED)
+        if done:
+            return done, pending
+    raise Cancelled()
+
+
+class VariantLoader:
+    """
+    Strategy variants of a pipeline, created in memory from their parameters.
+
+    A variant is its base strategy with the parameters of a hyperopt result, as
+    if loaded from a strategy parameter file. While the loader is entered,
+    freqtrade's strategy resolver returns variants by name, without a file to
+    write, import and resolve per variant, and resolves other strategies as usual.
+    """
+
+    def __init__(self, path):
+        with open(path, "r") as f:
+            data = rapidjson.load(f)
+        self.strategy = data["strategy"]
+        self.variants = data["variants"]
+        self._base = None
+        self._resolver = None
+
+    @staticmethod
+    def save(path, strategy, variants):
+        with open(path, "w") as f:
+            rapidjson.dump({"strategy": strategy, "variants": variants}, f)
+
+    def names(self):
+        return sorted(self.variants)
+
+    def __enter__(self):
+        self._resolver = StrategyResolver.__dict__["_load_strategy"]
+        StrategyResolver._load_strategy = staticmethod(self._load_strategy)
+        return self
+
+    def __exit__(self, *args):
+        StrategyResolver._load_strategy = self._resolver
+
+    def _load_strategy(self, strategy_name, config, extra_dir=None):
+        load_strategy = self._resolver.__func__
+        if strategy_name not in self.variants:
+            return load_strategy(strategy_name, config, extra_dir)
+        if self._base is None:
+            # Resolved once, variants only differ in their parameters.
+            self._base = type(load_strategy(self.strategy, config, extra_dir))
+        variant = self.materialize(strategy_name)
+        return StrategyResolver.validate_strategy(variant(config=config))
+
+    def materialize(self, name):
+        """Subclass of the base strategy with the parameters of variant `name`."""
+        params = self.variants[name]
+
+        def load_params_from_file(strategy):
+            # Also part of the backtest cache key, unlike the shared strategy file.
+            return {"strategy_name": name, "params": deepcopy(params)}
+
+        return type(
+            name,
+            (self._base,),
+            {
+                "__module__": self._base.__module__,
+                "__qualname__": name,
+                "load_params_from_file": load_params_from_file,
+            },
+        )
+
+
+def _peak_rss_mb():
+    """Peak RSS of this process and of its finished child processes, in MB."""
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # Bytes on macOS, kilobytes elsewhere.
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def _hyperopt_worker(config, variants_file=None):
+    """Runs the hyperopt of one strategy, returns its results file and run stats."""
+    setup_logging_pre()
+    start = time.perf_counter()
+    # Like start_hyperopt, without its lock on user_data_dir, which lets only one
+    # hyperopt run at a time. Instead each worker process gets its own results
+    # file and its own candle pickle, which freqtrade shares between hyperopts.
+    with VariantLoader(variants_file) if variants_file else nullcontext():
+        hyperopt = Hyperopt(setup_optimize_configuration(config, RunMode.HYPEROPT))
+        pid = os.getpid()
+        results_file = hyperopt.results_file.with_name(
+            f"{hyperopt.results_file.stem}_{pid}{hyperopt.results_file.suffix}"
+        )
+        data_pickle_file = hyperopt.data_pickle_file.with_name(f"hyperopt_tickerdata_{pid}.pkl")
+        hyperopt.results_file = results_file
+        hyperopt.data_pickle_file = data_pickle_file
+        hyperopt.hyperopter.data_pickle_file = data_pickle_file
+        try:
+            hyperopt.start()
+        finally:
+            data_pickle_file.unlink(missing_ok=True)
+    stats = {
+        "epochs": hyperopt.num_epochs_saved,
+        "seconds": time.perf_counter() - start,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+    return str(results_file) if results_file.exists() else None, stats
+
+
+class SharedDataBacktesting(Backtesting):
+    """
+    Backtests batches of derived strategies in one process, against candles
+    loaded once.
+
+    Derived strategies only override the parameters of their base strategy, so
+    a strategy whose hyperopt parameters and base equal those of the previous
+    one reuses its indicators. Disable `share_indicators` for strategies that
+    keep state in `populate_indicators`.
+    """
+
+    def __init__(self, config, share_indicators=True):
+        super().__init__(config)
+        self.share_indicators = share_indicators
+        self._strategies = {s.get_strategy_name(): s for s in self.strategylist}
+        self._bt_data = None
+        self._indicators_key = None
+        self._indicators = None
+        # Per batch state, reset before each batch.
+        self._initial_state = deepcopy(
+            (self.results, self.all_bt_content, self.analysis_results)
+        )
+
+    def load_strategies(self, names):
+        """Strategies by name, loaded like the strategy list of the config."""
+        for name in names:
+            if name not in self._strategies:
+                config = deepcopy(self.config)
+                config["strategy"] = name
+                self._strategies[name] = StrategyResolver.load_strategy(config)
+                validate_config_consistency(config)
+        return [self._strategies[name] for name in names]
+
+    def load_bt_data(self):
+        if self._bt_data is None:
+            self._bt_data = super().load_bt_data()
+        return self._bt_data
+
+    def _get_indicators_key(self, strat):
+        base = next(c for c in type(strat).__mro__ if "populate_indicators" in c.__dict__)
+        params = tuple((name, repr(p.value)) for name, p in strat.enumerate_parameters())
+        return base, strat.timeframe, params
+
+    def backtest_one_strategy(self, strat, data, timerange):
+        if self.share_indicators:
+            advise_all_indicators = strat.advise_all_indicators
+
+            def shared_indicators(data):
+                # Parameter values are loaded when the strategy is set, just before.
+                key = self._get_indicators_key(strat)
+                if self._indicators_key != key:
+                    self._indicators = advise_all_indicators(data)
+                    self._indicators_key = key
+                else:
+                    logger.info(f"Reusing indicators for {strat.get_strategy_name()}")
+                # Backtesting modifies the dataframes it is given.
+                return {pair: df.copy() for pair, df in self._indicators.items()}
+
+            strat.advise_all_indicators = shared_indicators
+        return super().backtest_one_strategy(strat, data, timerange)
+
+    def run_batch(self, strategies, exportfilename):
+        self.strategylist = strategies
+        self.config["strategy_list"] = [s.get_strategy_name() for s in strategies]
+        self.config["exportfilename"] = exportfilename
+        self.results, self.all_bt_content, self.analysis_results = deepcopy(self._initial_state)
+        self.start()
+
+
+# Backtesting of the worker process, with its candles, kept across batches.
+_worker_backtesting = None
+
+
+def _backtest_batch_worker(config, variants_file, batch, share_indicators):
+    """
+    Backtests a (strategy names, export file) batch, returns its run stats.
+
+    The candles are loaded for the first batch of the worker process, and reused
+    for the next batches it is handed.
+    """
+    global _worker_backtesting
+    strat_list, output_file = batch
+    start = time.perf_counter()
+    with VariantLoader(variants_file):
+        if _worker_backtesting is None:
+            setup_logging_pre()
+            config = deepcopy(config)
+            config["strategy_list"] = list(strat_list)
+            config["exportfilename"] = output_file
+            _worker_backtesting = SharedDataBacktesting(
+                setup_optimize_configuration(config, RunMode.BACKTEST), share_indicators
+            )
+        strategies = _worker_backtesting.load_strategies(strat_list)
+    load_seconds = time.perf_counter() - start
+
+    logger.info(f"Backtesting {strat_list}")
+    _worker_backtesting.run_batch(strategies, output_file)
+    gc.collect()
+    return {
+        "strategies": len(strat_list),
+        "seconds": time.perf_counter() - start - load_seconds,
+        "load_seconds": load_seconds,
+        "peak_rss_mb": _peak_rss_mb(),
+        "pid": os.getpid(),
+    }
+
+
+class BacktestScheduler:
+    """
+    Hands batches of strategies to whichever backtest worker is idle.
+
+    Every worker holds its own copy of the candles, so workers start one at a
+    time until the first batch measures the memory of a worker, then as many as
+    fit in `memory_limit_mb`. Batches hold up to `max_batch_size` strategies,
+    and no more than `max_batch_seconds` at the measured backtest time per
+    strategy. They shrink as the strategies run out, so workers finish about
+    together instead of waiting on a last large batch.
+    """
+
+    def __init__(self, max_batch_size, max_workers, memory_limit_mb, max_batch_seconds):
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_workers = max(1, max_workers)
+        self.memory_limit_mb = memory_limit_mb
+        self.max_batch_seconds = max_batch_seconds
+        self.worker_mb = None
+        self.strategies = 0
+        self.seconds = 0.0
+
+    def workers(self):
+        if self.worker_mb is None:
+            return 1
+        return max(1, min(self.max_workers, int(self.memory_limit_mb // self.worker_mb)))
+
+    def batch_size(self, remaining, workers):
+        size = min(self.max_batch_size, -(-remaining // (2 * workers)))
+        if self.strategies and self.seconds:
+            seconds_per_strategy = self.seconds / self.strategies
+            size = min(size, int(self.max_batch_seconds // seconds_per_strategy))
+        return max(1, size)
+
+    def update(self, stats):
+        self.strategies += stats["strategies"]
+        self.seconds += stats["seconds"]
+        self.worker_mb = max(self.worker_mb or 0.0, stats["peak_rss_mb"])
+
+    def run(self, strategies, submit, cancel):
+        """
+        Backtests the strategies, in order, split in batches.
+
+        Parameters:
+        - strategies (list): Strategy names.
+        - submit (callable): Starts the backtest of a batch of names, returns its future.
+        - cancel (threading.Event): Stops the backtests when set.
+
+        Yields:
+        - dict: Run stats of every batch, as it finishes.
+        """
+        failed = []
+        running = {}
+        next_idx = 0
+        while next_idx < len(strategies) or running:
+            workers = self.workers()
+            while next_idx < len(strategies) and len(running) < workers:
+                size = self.batch_size(len(strategies) - next_idx, workers)
+                batch = strategies[next_idx:next_idx + size]
+                next_idx += size
+                running[submit(batch)] = batch
+
+            done, _ = _wait_first(running, cancel)
+            for future in done:
+                batch = running.pop(future)
+                try:
+                    stats = future.result()
+                except Exception:
+                    logger.exception(f"Backtesting of {batch} failed")
+                    failed.extend(batch)
+                    continue
+                self.update(stats)
+                yield stats
+
+        if failed:
+            raise RuntimeError(f"Backtesting failed for {len(failed)} strategies: {failed}")
+
+
+class Telemetry:
+    """
+    Timings and counters of auto-hyperopt runs, appended to a JSONL file, one
+    event per line, and summarized per pipeline by `summary`.
+
+    Events:
+    - pipeline: wall time and status of a pipeline.
+    - hyperopt: wall time, epochs and peak RSS of the hyperopt of a strategy.
+    - scoring: epochs filtered out by loss and profit, scored out, and accepted.
+    - backtest_batch: wall time and peak RSS of a batch of backtests.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.run = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        self._lock = threading.Lock()
+
+    def record(self, event, **fields):
+        line = rapidjson.dumps({"run": self.run, "event": event, **fields})
+        with self._lock, self.path.open("a") as f:
+            f.write(line + "\n")
+
+    @contextmanager
+    def timed(self, event, **fields):
+        """Records the event with its wall time and status once the block exits."""
+        start = time.perf_counter()
+        status = "failed"
+        try:
+            yield fields
+            status = "done"
+        except Cancelled:
+            status = "cancelled"
+            raise
+        finally:
+            self.record(event, status=status, seconds=time.perf_counter() - start, **fields)
+
+    def summary(self, run=None):
+        """
+        Prints where the time of a run went.
+
+        Parameters:
+        - run (str): Start time of the run, None for the last one.
+        """
+        events = []
+        if self.path.exists():
+            with self.path.open("r") as f:
+                events = [rapidjson.loads(line) for line in f if line.strip()]
+        if not events:
+            print(f"No metrics in {self.path}")
+            return
+        run = run or events[-1]["run"]
+        events = [e for e in events if e["run"] == run]
+        by_pipeline = defaultdict(lambda: defaultdict(list))
+        for e in events:
+            by_pipeline[e.get("pipeline_id")][e["event"]].append(e)
+
+        def duration(seconds):
+            return str(timedelta(seconds=round(seconds)))
+
+        print(f"Run {run}\n")
+        _print_table(
+            ["pipeline", "type", "status", "time"],
+            [
+                [e["pipeline_id"], e["type"], e["status"],
+                 duration(e["seconds"]) if "seconds" in e else "-"]
+                for e in events if e["event"] == "pipeline"
+            ],
+        )
+        rows = []
+        for pipeline_id, pipeline in by_pipeline.items():
+            hyperopts = pipeline["hyperopt"]
+            if hyperopts:
+                seconds = sum(e["seconds"] for e in hyperopts)
+                epochs = sum(e["epochs"] for e in hyperopts)
+                rows.append([
+                    pipeline_id, len(hyperopts), epochs, duration(seconds),
+                    f"{epochs / seconds:.2f}" if seconds else "-",
+                    f"{max(e['peak_rss_mb'] for e in hyperopts):.0f}",
+                ])
+        _print_table(["pipeline", "hyperopts", "epochs", "time", "epochs/s", "peak RSS MB"], rows)
+        slowest = sorted(
+            (e for e in events if e["event"] == "hyperopt"), key=lambda e: -e["seconds"]
+        )[:10]
+        _print_table(
+            ["slowest hyperopts", "pipeline", "epochs", "time", "epochs/s"],
+            [
+                [e["strategy"], e["pipeline_id"], e["epochs"], duration(e["seconds"]),
+                 f"{e['epochs'] / e['seconds']:.2f}" if e["seconds"] else "-"]
+                for e in slowest
+            ],
+        )
+        rows = []
+        for pipeline_id, pipeline in by_pipeline.items():
+            # Hyperopt results files, then the candidates kept by the final scoring.
+            scorings = [e for e in pipeline["scoring"] if e["source"] != "final"]
+            final = [e["accepted"] for e in pipeline["scoring"] if e["source"] == "final"]
+            if scorings or final:
+                rows.append([pipeline_id] + [
+                    sum(e[k] for e in scorings)
+                    for k in ["epochs", "rejected_loss", "rejected_score", "accepted"]
+                ] + [final[-1] if final else "-"])
+        _print_table(
+            ["pipeline", "epochs", "rejected (loss)", "rejected (score)", "accepted", "kept"],
+            rows,
+        )
+        rows = []
+        for pipeline_id, pipeline in by_pipeline.items():
+            batches = pipeline["backtest_batch"]
+            if batches:
+                seconds = sum(e["seconds"] for e in batches)
+                strategies = sum(e["strategies"] for e in batches)
+                rows.append([
+                    pipeline_id, len(batches), strategies, duration(seconds),
+                    f"{seconds / len(batches):.1f}", f"{seconds / strategies:.2f}",
+                    f"{max(e['peak_rss_mb'] for e in batches):.0f}",
+                ])
+        _print_table(
+            ["pipeline", "batches", "strategies", "time", "s/batch", "s/strategy", "peak RSS MB"],
+            rows,
+        )
+
+
+def _print_table(headers, rows):
+    if not rows:
+        return
+    rows = [[str(v) for v in row] for row in rows]
+    widths = [max(len(v) for v in column) for column in zip(headers, *rows)]
+    for row in [headers, ["-" * w for w in widths]] + rows:
+        print("  ".join(v.ljust(w) for v, w in zip(row, widths)).rstrip())
+    print()
+
+
+class WorkQueue:
+    """
+    Strategies of a pipeline and how far each got, saved on every change so a
+    crashed or interrupted pipeline resumes where it left off.
+    """
+
+    def __init__(self, path, strategies):
+        self.path = path
+        self.items = {}
+        if path.exists():
+            with open(path, "r") as f:
+                self.items = rapidjson.load(f)
+        for strategy in strategies:
+            self.items.setdefault(strategy, {"status": PENDING, "results_file": None})
+        self.save()
+
+    def save(self):
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            rapidjson.dump(self.items, f, indent=2)
+        os.replace(tmp, self.path)
+
+    def update(self, strategy, status, results_file=None):
+        self.items[strategy] = {"status": status, "results_file": results_file}
+        self.save()
+
+    def with_status(self, status):
+        return [s for s, item in sorted(self.items.items()) if item["status"] == status]
+
+
+class CandidateScorer:
+    """
+    Scores candidates by the sum of their standardized backtest metrics.
+
+    Candidates are added one at a time, only their metrics are kept, in a
+    structured array grown in chunks, and the mean and variance of every metric
+    are updated as they arrive (Welford). Missing metrics are NaN and leave the
+    score NaN, like StandardScaler.
+    """
+
+    def __init__(self, chunk=4096):
+        self.chunk = chunk
+        self.keys = np.empty(chunk, dtype=np.int64)
+        self.metrics = np.empty(chunk, dtype=METRICS_DTYPE)
+        self.n = 0
+        self.count = np.zeros(len(BACKTEST_METRICS_COLUMNS))
+        self.mean = np.zeros(len(BACKTEST_METRICS_COLUMNS))
+        self.m2 = np.zeros(len(BACKTEST_METRICS_COLUMNS))
+
+    def add(self, key, values):
+        """Adds a candidate, `values` in the order of BACKTEST_METRICS_COLUMNS."""
+        if self.n == len(self.keys):
+            self.keys = np.resize(self.keys, self.n + self.chunk)
+            self.metrics = np.resize(self.metrics, self.n + self.chunk)
+        x = np.array(values, dtype=np.float64)
+        self.keys[self.n] = key
+        self.metrics[self.n] = tuple(x)
+        self.n += 1
+
+        known = ~np.isnan(x)
+        self.count[known] += 1
+        delta = x[known] - self.mean[known]
+        self.mean[known] += delta / self.count[known]
+        self.m2[known] += delta * (x[known] - self.mean[known])
+
+    def top(self, limit=None):
+        """
+        Candidates with a positive score, best first.
+
+        Parameters:
+        - limit (int): Maximum number of candidates, None for all.
+
+        Returns:
+        - dict: Score per candidate key.
+        """
+        if self.n == 0:
+            return {}
+        std = np.sqrt(self.m2 / np.maximum(self.count, 1))
+        scale = np.where(std > 0, std, 1.0)  # Constant metrics, as StandardScaler.
+        metrics = self.metrics[: self.n].view(np.float64).reshape(self.n, -1)
+        scores = ((metrics - self.mean) / scale) @ METRICS_SIGN
+        positive = np.flatnonzero(scores > 0.0)
+        # Equal scores keep the order candidates were added in.
+        candidates = ((scores[i], -i) for i in positive)
+        if limit is None:
+            best = sorted(candidates, reverse=True)
+        else:
+            best = heapq.nlargest(limit, candidates)
+        return {int(self.keys[-neg_i]): float(score) for score, neg_i in best}
+
+
+class ResultStore:
+    """
+    Hyperopt results of the pipelines of a strategy, in SQLite. Results are
+    indexed by pipeline, strategy name, epoch, loss and backtest metrics, and
+    the raw result lines are stored beside them. The fingerprint and state of
+    every pipeline are kept in the same database.
+
+    Pipelines running side by side each use their own connection.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        metrics = ", ".join(f"{column} REAL" for column in BACKTEST_METRICS_COLUMNS)
+        self.conn.executescript(
+            f"""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS results (
+                id INTEGER PRIMARY KEY,
+                pipeline_id TEXT NOT NULL,
+                strategy_name TEXT NOT NULL,
+                epoch INTEGER,
+                loss REAL,
+                total_profit REAL,
+                {metrics},
+                raw TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS results_strategy ON results (pipeline_id, strategy_name);
+            CREATE INDEX IF NOT EXISTS results_loss ON results (pipeline_id, loss, total_profit);
+            CREATE TABLE IF NOT EXISTS stages (
+                pipeline_id TEXT PRIMARY KEY,
+                fingerprint TEXT NOT NULL,
+                status TEXT NOT NULL
+            );
+            """
+        )
+
+    @property
+    def conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=60)
+        return conn
+
+    def add(self, pipeline_id, results):
+        """Stores (line, parsed line) results of a hyperopt results file."""
+        columns = ", ".join(BACKTEST_METRICS_COLUMNS)
+        placeholders = ", ".join("?" * (len(BACKTEST_METRICS_COLUMNS) + 6))
+        with self.conn:
+            self.conn.executemany(
+                f"INSERT INTO results (pipeline_id, strategy_name, epoch, loss, total_profit, "
+                f"{columns}, raw) VALUES ({placeholders})",
+                (
+                    (
+                        pipeline_id,
+                        data["results_metrics"]["strategy_name"],
+                        data.get("current_epoch"),
+                        data["loss"],
+                        data["total_profit"],
+                        *(data["results_metrics"].get(c) for c in BACKTEST_METRICS_COLUMNS),
+                        line.rstrip("\n"),
+                    )
+                    for line, data in results
+                ),
+            )
+
+    def count(self, pipeline_id):
+        query = "SELECT COUNT(*) FROM results WHERE pipeline_id = ?"
+        return self.conn.execute(query, (pipeline_id,)).fetchone()[0]
+
+    def strategy_names(self, pipeline_id):
+        query = "SELECT DISTINCT strategy_name FROM results WHERE pipeline_id = ?"
+        return {row[0] for row in self.conn.execute(query, (pipeline_id,))}
+
+    def metrics(self, pipeline_id):
+        """(id, metrics) of the candidates with a negative loss and no total loss."""
+        query = (
+            f"SELECT id, {', '.join(BACKTEST_METRICS_COLUMNS)} FROM results "
+            "WHERE pipeline_id = ? AND loss <= 0 AND total_profit >= 0 ORDER BY id"
+        )
+        for row in self.conn.execute(query, (pipeline_id,)):
+            yield row[0], row[1:]
+
+    def keep(self, pipeline_id, ids):
+        """Deletes the results of a pipeline other than `ids`."""
+        with self.conn:
+            self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id INTEGER PRIMARY KEY)")
+            self.conn.execute("DELETE FROM keep_ids")
+            self.conn.executemany("INSERT INTO keep_ids VALUES (?)", ((int(i),) for i in ids))
+            self.conn.execute(
+                "DELETE FROM results WHERE pipeline_id = ? AND id NOT IN (SELECT id FROM keep_ids)",
+                (pipeline_id,),
+            )
+
+    def lines(self, pipeline_id):
+        """Raw result lines of a pipeline, in the order they were added."""
+        query = "SELECT raw FROM results WHERE pipeline_id = ? ORDER BY id"
+        for (line,) in self.conn.execute(query, (pipeline_id,)):
+            yield line
+
+    def clear(self, pipeline_id):
+        """Deletes the results and the state of a pipeline."""
+        with self.conn:
+            self.conn.execute("DELETE FROM results WHERE pipeline_id = ?", (pipeline_id,))
+            self.conn.execute("DELETE FROM stages WHERE pipeline_id = ?", (pipeline_id,))
+
+    def stage(self, pipeline_id):
+        """(fingerprint, status) of a pipeline, None if it never ran."""
+        query = "SELECT fingerprint, status FROM stages WHERE pipeline_id = ?"
+        return self.conn.execute(query, (pipeline_id,)).fetchone()
+
+    def set_stage(self, pipeline_id, fingerprint, status):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO stages (pipeline_id, fingerprint, status) VALUES (?, ?, ?)",
+                (pipeline_id, fingerprint, status),
+            )
+
 
 class AutoHyperopt:
     def __init__(self, config):
@@ -56,39 +737,157 @@ class AutoHyperopt:
         self.hyperopt_results_path = self.user_data_dir / "hyperopt_results"
         self.backtest_results_path = self.user_data_dir / "backtest_results"
         self.strategy_path = self.user_data_dir / "strategies"
+        results_dir = self.hyperopt_results_path / self.config["strategy"]
+        os.makedirs(results_dir, exist_ok=True)
+        self.store = ResultStore(results_dir / "results.sqlite")
+        self.telemetry = Telemetry(results_dir / "metrics.jsonl")
+        # Pipelines run in threads, they stop at their next wait once it is set.
+        self.cancel = threading.Event()
 
     def run(self):
         for pipeline in self.config.get("pipelines", []):
-            self._run_pipeline(pipeline)
+            self._import_results(pipeline["id"])
+        self._run_pipelines(self.config.get("pipelines", []))
+
+    def _run_pipelines(self, pipelines):
+        """
+        Runs the pipelines as a graph: a pipeline starts once its previous
+        pipeline finished, pipelines on independent branches run side by side.
+        """
+        ids = {p["id"] for p in pipelines}
+        # Previous pipelines outside this config are inputs, not dependencies.
+        upstream = {
+            p["id"]: p["previous_id"] if p.get("previous_id") in ids else None
+            for p in pipelines
+        }
+        for pipeline_id in upstream:
+            seen = set()
+            while pipeline_id is not None:
+                if pipeline_id in seen:
+                    raise ValueError(f"Pipelines form a cycle through {pipeline_id}")
+                seen.add(pipeline_id)
+                pipeline_id = upstream[pipeline_id]
+
+        waiting = list(pipelines)
+        finished, failed = set(), set()
+        running = {}
+        executor = ThreadPoolExecutor(
+            max_workers=max(1, self.config.get("max_parallel_pipelines", 1))
+        )
+        try:
+            while waiting or running:
+                for pipeline in list(waiting):
+                    previous_id = upstream[pipeline["id"]]
+                    if previous_id in failed:
+                        logger.error(f"Pipeline {pipeline['id']} is skipped, {previous_id} failed.")
+                        failed.add(pipeline["id"])
+                    elif previous_id is None or previous_id in finished:
+                        running[executor.submit(self._run_pipeline, pipeline)] = pipeline["id"]
+                    else:
+                        continue
+                    waiting.remove(pipeline)
+                if not running:
+                    continue
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    pipeline_id = running.pop(future)
+                    try:
+                        future.result()
+                    except Exception:
+                        logger.exception(f"Pipeline {pipeline_id} failed")
+                        failed.add(pipeline_id)
+                        continue
+                    finished.add(pipeline_id)
+        except KeyboardInterrupt:
+            logger.info("Interrupted, stopping the running pipelines.")
+            self.cancel.set()
+            executor.shutdown(cancel_futures=True)
+            raise
+        executor.shutdown()
+
+        if failed:
+            raise RuntimeError(f"{len(failed)} pipeline(s) failed or skipped: {sorted(failed)}")
+
+    def _import_results(self, pipeline_id):
+        # Results of pipelines that ran before the store existed.
+        output = self._get_hyperopt_result_path(pipeline_id)
+        if self.store.count(pipeline_id) == 0 and output.exists():
+            with output.open("r") as f:
+                self.store.add(pipeline_id, ((line, rapidjson.loads(line)) for line in f))
+            logger.info(f"Imported {self.store.count(pipeline_id)} results from {output}")
 
     def _run_pipeline(self, pipeline):
         pipeline_id = pipeline.get("id")
         pipeline_type = pipeline.get("type")
         method_name = f"_run_{pipeline_type}"
         method = getattr(self, method_name, None)
-        if method:
-            method(pipeline_id)
-        else:
+        if not method:
             logger.error(f"Unknown pipeline type: {pipeline_type}")
+            return
+
+        fingerprint = self._fingerprint(pipeline_id)
+        stage = self.store.stage(pipeline_id)
+        lockfile = self.hyperopt_results_path / f".{pipeline_id}_DONE"
+        if stage is None and lockfile.exists():
+            # Finished before pipelines were fingerprinted, its inputs are unknown.
+            logger.info(f"Pipeline {pipeline_id} has a DONE file, taken as up to date.")
+            self.store.set_stage(pipeline_id, fingerprint, DONE)
+            lockfile.unlink()
+            stage = (fingerprint, DONE)
+
+        if stage == (fingerprint, DONE):
+            logger.info(f"Pipeline {pipeline_id} is skipped, its inputs are unchanged.")
+            self.telemetry.record(
+                "pipeline", pipeline_id=pipeline_id, type=pipeline_type, status="skipped"
+            )
+            return
+        if stage is not None and stage[0] != fingerprint:
+            # An unfinished run with the same inputs resumes instead.
+            logger.info(f"Pipeline {pipeline_id} inputs changed, running it again.")
+            self._reset_pipeline(pipeline_id)
+
+        self.store.set_stage(pipeline_id, fingerprint, RUNNING)
+        with self.telemetry.timed("pipeline", pipeline_id=pipeline_id, type=pipeline_type):
+            method(pipeline_id)
+        self.store.set_stage(pipeline_id, fingerprint, DONE)
+
+    def _fingerprint(self, pipeline_id):
+        """
+        Hash of everything the results of a pipeline depend on: its effective
+        config, the freqtrade config files, the strategy source and the results
+        of its previous pipeline.
+        """
+        config = self._adjust_config(pipeline_id)
+        digest = hashlib.sha1()
+        digest.update(
+            rapidjson.dumps(
+                {k: v for k, v in config.items() if k not in FINGERPRINT_IGNORED_KEYS},
+                sort_keys=True,
+                default=str,
+            ).encode("utf-8")
+        )
+        for config_file in config.get("config", []):
+            if Path(config_file).is_file():
+                digest.update(Path(config_file).read_bytes())
+        digest.update((self.strategy_path / f"{self.config['strategy']}.py").read_bytes())
+        if config.get("previous_id"):
+            for line in self.store.lines(config["previous_id"]):
+                digest.update(line.encode("utf-8"))
+        return digest.hexdigest().lower()
+
+    def _reset_pipeline(self, pipeline_id):
+        self.store.clear(pipeline_id)
+        self._get_hyperopt_result_path(pipeline_id).unlink(missing_ok=True)
+        (self.hyperopt_results_path / f".{pipeline_id}_queue.json").unlink(missing_ok=True)
+        shutil.rmtree(self.backtest_results_path / pipeline_id, ignore_errors=True)
 
     def _gc_collect(self):
         collected = gc.collect()
         logger.info(f"Garbage collector: collected {collected} objects.")
 
-    def _has_processed(self, target):
-        seen = set([self.config["strategy"]])
-        if not target.exists():
-            return seen
-        with open(target, "r") as file:
-            for line in file:
-                data = rapidjson.loads(line)
-                seen.add(data["results_metrics"]["strategy_name"])
-        return seen
-
-    def _batched(self, iterable, n):
-        it = iter(iterable)
-        for batch in iter(lambda: tuple(islice(it, n)), ()):
-            yield batch
+    def _has_processed(self, pipeline_id):
+        return self.store.strategy_names(pipeline_id) | {self.config["strategy"]}
 
     def _adjust_config(self, pipeline_id):
         config = deepcopy(self.config)
@@ -121,72 +920,82 @@ class AutoHyperopt:
         os.makedirs(dirpath, exist_ok=True)
         return dirpath
 
-    def _count_lines(self, fname):
-        try:
-            with open(fname, "r") as f:
-                return sum(1 for _ in f)
-        except:
-            return 0
-
-    def _filter_hyperopt_output(self, target, use_latest=True):
-        last_result_path = self.hyperopt_results_path / ".last_result.json"
-        input_file = (
-            self.hyperopt_results_path
-            / rapidjson.load(open(last_result_path, "r"))["latest_hyperopt"]
-            if use_latest
-            else target
-        )
+    def _filter_hyperopt_output(self, pipeline_id, use_latest=True, input_file=None):
+        counts = {"epochs": 0, "scored": 0}
+
+        if not use_latest:
+            counts["epochs"] = self.store.count(pipeline_id)
+
+            def candidates():
+                for candidate in self.store.metrics(pipeline_id):
+                    counts["scored"] += 1
+                    yield candidate
+
+            scores = self._calculate_scores(candidates(), self.config["max_generated_candidates"])
+            self._record_scoring(pipeline_id, "final", counts, len(scores))
+            self.store.keep(pipeline_id, scores.keys())
+            self._save_selected_strategies(pipeline_id)
+            return
+
         if not input_file.exists():
             logger.error(f'Input file "{input_file}" doesn\'t exist')
             return
 
-        results = self._calculate_scores(input_file, use_latest)
-        self._save_selected_strategies(input_file, target, results, use_latest)
+        def candidates():
+            with input_file.open("r") as f:
+                for idx, line in enumerate(f):
+                    counts["epochs"] += 1
+                    data = rapidjson.loads(line)
+                    if data["loss"] > 0 or data["total_profit"] < 0:
+                        continue
+                    counts["scored"] += 1
+                    metrics = data["results_metrics"]
+                    yield idx, [metrics.get(c) for c in BACKTEST_METRICS_COLUMNS]
 
-    def _calculate_scores(self, input_file, use_latest):
-        results = {}
+        # Second pass over the file for the selected lines, instead of keeping all lines.
+        selected = set(self._calculate_scores(candidates()))
+        self._record_scoring(pipeline_id, input_file.name, counts, len(selected))
         with input_file.open("r") as f:
-            for idx, line in enumerate(f):
-                data = rapidjson.loads(line)
-                if data["loss"] > 0 or data["total_profit"] < 0:
-                    continue
-                series = pd.Series(
-                    data["results_metrics"], index=BACKTEST_METRICS_COLUMNS
-                )
-                series["strategy_name"] = f"{idx:05d}"
-                results[f"{idx:05d}"] = series
-
-        df = pd.DataFrame(results).T
-        df.set_index("strategy_name", inplace=True)
-        # inverse drawdown
-        df["max_relative_drawdown"] = (
-            df["max_relative_drawdown"].max() - df["max_relative_drawdown"]
+            self.store.add(
+                pipeline_id,
+                ((line, rapidjson.loads(line)) for idx, line in enumerate(f) if idx in selected),
+            )
+        input_file.unlink()
+
+    def _record_scoring(self, pipeline_id, source, counts, accepted):
+        self.telemetry.record(
+            "scoring",
+            pipeline_id=pipeline_id,
+            source=source,
+            epochs=counts["epochs"],
+            rejected_loss=counts["epochs"] - counts["scored"],
+            rejected_score=counts["scored"] - accepted,
+            accepted=accepted,
         )
-        scaler = StandardScaler()
-        scaled_metrics = scaler.fit_transform(df)
-        weights = np.ones(scaled_metrics.shape[1])
-        df["score"] = np.dot(scaled_metrics, weights)
-        df = df[df["score"] > 0.0].sort_values(by="score", ascending=False)
-        if not use_latest:
-            df = df.iloc[: self.config["max_generated_candidates"]]
-        return df["score"].to_dict()
-
-    def _save_selected_strategies(self, input_file, target, results, use_latest):
-        selected = set(results.keys())
-        output_file = (
-            target.open(mode="a")
-            if use_latest
-            else tempfile.NamedTemporaryFile(mode="w", delete=False)
+
+    def _record_hyperopt(self, pipeline_id, strategy, stats):
+        self.telemetry.record(
+            "hyperopt",
+            pipeline_id=pipeline_id,
+            strategy=strategy,
+            **stats,
+            epochs_per_sec=stats["epochs"] / stats["seconds"] if stats["seconds"] else None,
         )
-        with output_file as f:
-            for idx, line in enumerate(input_file.open("r")):
-                if f"{idx:05d}" in selected:
-                    f.write(line)
-        if not use_latest:
-            shutil.copy(output_file.name, target)
-            os.unlink(output_file.name)
-        else:
-            input_file.unlink()
+
+    def _calculate_scores(self, candidates, limit=None):
+        scorer = CandidateScorer()
+        for key, values in candidates:
+            scorer.add(key, values)
+        return scorer.top(limit)
+
+    def _save_selected_strategies(self, pipeline_id):
+        # Exported as a regular hyperopt results file, e.g. for `freqtrade hyperopt-show`.
+        target = self._get_hyperopt_result_path(pipeline_id)
+        with tempfile.NamedTemporaryFile(mode="w", delete=False) as f:
+            for line in self.store.lines(pipeline_id):
+                f.write(line + "\n")
+        shutil.copy(f.name, target)
+        os.unlink(f.name)
 
     def _get_strategy_params(self, params, strategy):
         final_params = deepcopy(params["params_not_optimized"])
@@ -199,82 +1008,15 @@ class AutoHyperopt:
         }
         return final_params
 
-    def _params_pretty_print(self, params, space, header, non_optimized={}):
-        if space in params or space in non_optimized:
-            space_params = HyperoptTools._space_params(params, space, 5)
-            no_params = HyperoptTools._space_params(non_optimized, space, 5)
-            appendix = ""
-            if not space_params and not no_params:
-                # No parameters - don't print
-                return
-            if not space_params:
-                # Not optimized parameters - append string
-                appendix = NON_OPT_PARAM_APPENDIX
-
-            result = f"\n# {header}\n"
-            if space == "stoploss":
-                stoploss = safe_value_fallback2(space_params, no_params, space, space)
-                result += f"stoploss = {stoploss}{appendix}"
-            elif space == "max_open_trades":
-                max_open_trades = safe_value_fallback2(
-                    space_params, no_params, space, space
-                )
-                result += f"max_open_trades = {max_open_trades}{appendix}"
-            elif space == "roi":
-                result = result[:-1] + f"{appendix}\n"
-                minimal_roi_result = rapidjson.dumps(
-                    {str(k): v for k, v in (space_params or no_params).items()},
-                    default=str,
-                    indent=4,
-                    number_mode=rapidjson.NM_NATIVE,
-                )
-                result += f"minimal_roi = {minimal_roi_result}"
-            elif space == "trailing":
-                for k, v in (space_params or no_params).items():
-                    result += f"{k} = {v}{appendix}\n"
-
-            else:
-                result += f"{space}_params = {HyperoptTools._pprint_dict(space_params, no_params)}"
-
-            result = result.replace("\n", "\n    ")
-            return result + "\n"
-
-    def _write_strategy_file(self, params, idx, target_dir, strategy):
-        params_text = [
-            self._params_pretty_print(
-                params["params"], "buy", "Buy hyperspace params:", {}
-            ),
-            self._params_pretty_print(
-                params["params"], "sell", "Sell hyperspace params:", {}
-            ),
-            self._params_pretty_print(params["params"], "roi", "ROI table:", {}),
-            self._params_pretty_print(params["params"], "stoploss", "Stoploss:", {}),
-            self._params_pretty_print(
-                params["params"], "trailing", "Trailing stop:", {}
-            ),
-            self._params_pretty_print(
-                params["params"], "max_open_trades", "Max Open Trades:", {}
-            ),
-        ]
-        params_text = list(filter(None, params_text))
-        derived_strategy = params["strategy_name"]
-        outfile = target_dir / f"{derived_strategy}_{idx:05d}.py"
-        with outfile.open("w") as f:
-            f.write(
-                DERIVED_STRATEGY_HEADER.format(
-                    idx=idx, strategy=strategy, derived_strategy=derived_strategy
-                )
-            )
-            f.write("\n".join(params_text) + "\n")
-
-    def _touch(self, pipeline_id, create=False):
-        lockfile = self.hyperopt_results_path / f".{pipeline_id}_DONE"
-        if lockfile.exists():
-            logger.info(f"Pipeline {pipeline_id} is skipped.")
-            return True
-        if create:
-            lockfile.touch()
-        return False
+    def _hyperopt_parallelism(self):
+        """
+        Splits the CPU budget into concurrent hyperopts and jobs per hyperopt.
+        """
+        budget = self.config.get("cpu_budget") or self.config.get("hyperopt_jobs", -1)
+        if budget <= 0:
+            budget = os.cpu_count() or 1
+        outer = max(1, min(self.config.get("max_parallel_hyperopt", 1), budget))
+        return outer, max(1, budget // outer)
 
     def _export_strategy(self, pipeline_id, previous_id):
         logger.info(f"Export strategies for pipeline_id: {pipeline_id}, "
@@ -291,119 +1033,161 @@ class AutoHyperopt:
         # for rule_file in self.strategy_path.glob("*.rules"):
         #     shutil.copy(rule_file, target_dir)
 
-        input_file = self._get_hyperopt_result_path(previous_id)
-
-        for idx, line in enumerate(open(input_file, "r")):
+        variants = {}
+        for idx, line in enumerate(self.store.lines(previous_id)):
             data = rapidjson.loads(line)
             params = self._get_strategy_params(
                 data, data["results_metrics"]["strategy_name"]
             )
-            self._write_strategy_file(params, idx, target_dir, self.config["strategy"])
+            variants[f"{params['strategy_name']}_{idx:05d}"] = {
+                space: HyperoptTools._space_params(params["params"], space, 5)
+                for space in params["params"]
+            }
+        VariantLoader.save(target_dir / VARIANTS_FILE, self.config["strategy"], variants)
 
     def _run_hyperopt_generate(self, pipeline_id):
-        if self._touch(pipeline_id):
-            return
         logger.info(
             f"Auto-Hyperopt: Generating strategies - Pipeline ID: {pipeline_id}"
         )
         config = self._adjust_config(pipeline_id)
-        output = self._get_hyperopt_result_path(pipeline_id)
-        while self._count_lines(output) < self.config["max_generated_candidates"]:
-            try:
-                start_hyperopt(config)
-            except KeyboardInterrupt:
-                sys.exit()
-            self._filter_hyperopt_output(output)
-        self._filter_hyperopt_output(output, use_latest=False)
-        self._touch(pipeline_id, create=True)
+        # In a fresh process per hyperopt, like hyperopt_optimize, so pipelines
+        # running side by side share neither freqtrade state, .last_result.json
+        # nor hyperopt files (see `_hyperopt_worker`).
+        with ProcessPoolExecutor(
+            max_workers=1, mp_context=get_context("spawn"), max_tasks_per_child=1
+        ) as executor:
+            while self.store.count(pipeline_id) < self.config["max_generated_candidates"]:
+                done, _ = _wait_first([executor.submit(_hyperopt_worker, config)], self.cancel)
+                results_file, stats = done.pop().result()
+                self._record_hyperopt(pipeline_id, config["strategy"], stats)
+                if results_file:
+                    self._filter_hyperopt_output(pipeline_id, input_file=Path(results_file))
+        self._filter_hyperopt_output(pipeline_id, use_latest=False)
         self._gc_collect()
 
     def _run_hyperopt_optimize(self, pipeline_id):
-        if self._touch(pipeline_id):
-            return
-
         logger.info(
             f"Auto-Hyperopt: Optimizing strategies - Pipeline ID: {pipeline_id}"
         )
         config = self._adjust_config(pipeline_id)
         self._export_strategy(pipeline_id, config["previous_id"])
-        output = self._get_hyperopt_result_path(pipeline_id)
         strategy_path = self._get_strategy_path(pipeline_id)
-        seen = self._has_processed(output)
+        variants_file = strategy_path / VARIANTS_FILE
+        seen = self._has_processed(pipeline_id)
+        queue = WorkQueue(
+            self.hyperopt_results_path / f".{pipeline_id}_queue.json",
+            [s for s in VariantLoader(variants_file).names() if s not in seen],
+        )
 
-        for strat in sorted(strategy_path.glob("*.py")):
-            if strat.stem in seen:
-                continue
-            try:
-                config.update(
+        def filter_results(strat, results_file):
+            if results_file and Path(results_file).exists():
+                self._filter_hyperopt_output(pipeline_id, input_file=Path(results_file))
+            queue.update(strat, DONE)
+            self._gc_collect()
+
+        # Hyperopts that finished before a restart, but were not filtered yet.
+        for strat in queue.with_status(HYPEROPTED):
+            filter_results(strat, queue.items[strat]["results_file"])
+
+        outer, inner = self._hyperopt_parallelism()
+        logger.info(f"Running {outer} hyperopt(s) at a time, with {inner} job(s) each")
+        failed = []
+        # A fresh process per hyperopt, freqtrade does not free all memory between runs.
+        executor = ProcessPoolExecutor(
+            max_workers=outer, mp_context=get_context("spawn"), max_tasks_per_child=1
+        )
+        try:
+            futures = {}
+            for strat in queue.with_status(PENDING):
+                strat_config = deepcopy(config)
+                strat_config.update(
                     {
-                        "strategy": strat.stem,
+                        "strategy": strat,
                         "strategy_path": strategy_path,
+                        "hyperopt_jobs": inner,
                     }
                 )
-                logger.info(config)
-                start_hyperopt(config)
-            except KeyboardInterrupt:
-                sys.exit()
-            self._filter_hyperopt_output(output)
-            self._gc_collect()
+                logger.info(strat_config)
+                futures[executor.submit(_hyperopt_worker, strat_config, variants_file)] = strat
+
+            while futures:
+                done, _ = _wait_first(futures, self.cancel)
+                for future in done:
+                    strat = futures.pop(future)
+                    try:
+                        results_file, stats = future.result()
+                    except Exception:
+                        logger.exception(f"Hyperopt of {strat} failed")
+                        failed.append(strat)
+                        continue
+                    self._record_hyperopt(pipeline_id, strat, stats)
+                    queue.update(strat, HYPEROPTED, results_file)
+                    filter_results(strat, results_file)
+        finally:
+            # Hyperopts not started yet stay pending in the queue.
+            executor.shutdown(cancel_futures=True)
+
+        if failed:
+            # Left pending in the queue, a rerun only hyperopts these.
+            raise RuntimeError(f"Hyperopt failed for {len(failed)} strategies: {failed}")
 
-        self._filter_hyperopt_output(output, use_latest=False)
-        self._touch(pipeline_id, create=True)
+        self._filter_hyperopt_output(pipeline_id, use_latest=False)
         self._gc_collect()
 
     def _run_backtesting(self, pipeline_id):
-        if self._touch(pipeline_id):
-            return
-
         logger.info(
             f"Auto-Hyperopt: Backtesting strategies - Pipeline ID: {pipeline_id}"
         )
         config = self._adjust_config(pipeline_id)
         self._export_strategy(pipeline_id, config["previous_id"])
         strategy_path = self._get_strategy_path(pipeline_id)
-        strategies = [
-            strat.stem
-            for strat in sorted(strategy_path.glob("*.py"))
-            if strat.stem != config["strategy"]
-        ]
+        variants_file = strategy_path / VARIANTS_FILE
+        strategies = VariantLoader(variants_file).names()
         backtest_results_path = self.backtest_results_path / pipeline_id
         os.makedirs(backtest_results_path, exist_ok=True)
+        config.update({"strategy": None, "strategy_path": strategy_path})
+        logger.info(config)
 
-        def bt_wrapper(strat_list):
-            fname = (
-                hashlib.sha1(" ".join(strat_list).encode()).hexdigest().lower()
-                + ".json"
+        scheduler = BacktestScheduler(
+            max_batch_size=self.config["max_parallel_backtest"],
+            max_workers=os.cpu_count() or 1,
+            memory_limit_mb=self.config.get("backtest_memory_limit_mb")
+            or 0.8 * os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_PHYS_PAGES") / 2**20,
+            max_batch_seconds=self.config.get("backtest_batch_seconds", 600),
+        )
+        share_indicators = self.config.get("backtest_share_indicators", True)
+        executor = ProcessPoolExecutor(
+            max_workers=scheduler.max_workers, mp_context=get_context("spawn")
+        )
+
+        def submit(batch):
+            output_file = backtest_results_path / (
+                hashlib.sha1(" ".join(batch).encode()).hexdigest().lower() + ".json"
             )
-            output_file = backtest_results_path / fname
-            config.update(
-                {
-                    "strategy": None,
-                    "strategy_list": strat_list,
-                    # "recursive_strategy_search": True,
-                    "strategy_path": strategy_path,
-                    "exportfilename": output_file,
-                }
+            return executor.submit(
+                _backtest_batch_worker,
+                config,
+                variants_file,
+                (batch, output_file),
+                share_indicators,
             )
-            try:
-                logger.info(config)
-                start_backtesting(config)
-            except KeyboardInterrupt:
-                sys.exit()
-            self._gc_collect()
 
-        Parallel(n_jobs=-1)(
-            delayed(bt_wrapper)(list(batch))
-            for batch in self._batched(strategies, self.config["max_parallel_backtest"])
-        )
-        self._touch(pipeline_id, create=True)
+        try:
+            for stats in scheduler.run(strategies, submit, self.cancel):
+                self.telemetry.record("backtest_batch", pipeline_id=pipeline_id, **stats)
+        finally:
+            executor.shutdown(cancel_futures=True)
 
 
-def main(config_file="auto.json"):
+def main(config_file="auto.json", summary=False, run=None):
     gc.set_threshold(50_000, 500, 1000)
     setup_logging_pre()
     with open(config_file, "r") as f:
         config = rapidjson.load(f)
+    if summary:
+        # $ python auto-hyperopt.py auto.json --summary
+        AutoHyperopt(config).telemetry.summary(run)
+        return
     try:
         AutoHyperopt(config).run()
     except KeyboardInterrupt:
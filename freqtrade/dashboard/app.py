@@ -2,13 +2,13 @@ import streamlit as st
 
 st.set_page_config(page_title="Strategy Dashboard", layout="wide")
 
-import rapidjson
 import pandas as pd
 import numpy as np
 import seaborn as sns
 import matplotlib.pyplot as plt
 
-from pathlib import Path
+from backtest_cache import fingerprint, load_backtests
+from metric_kernels import simulated_portfolios
 
 pd.options.mode.chained_assignment = None  # default='warn'
 sns.set(font_scale=0.8)
@@ -16,6 +16,8 @@ sns.set(font_scale=0.8)
 INITIAL_BALANCE = 1_000
 DATA_DIR = "/home/ubuntu/streamlit/data/USDT"
 PORTFOLIO_NUM_STRATEGIES = 5
+MONTECARLO_SIMULATIONS = [50, 100, 500, 1000, 5000]
+MONTECARLO_CHARTED_SIMULATIONS = 50
 
 LIV1_STRATEGIES = [
     "Evolver_000f_0078",
@@ -34,73 +36,10 @@ LIV5_STRATEGIES = [
 ]
 
 
-def calculate_stability(series):
-    ret = series.cumsum()
-    trendline = np.linspace(ret.iloc[0], ret.iloc[-1], len(ret))
-    similarity = np.corrcoef(ret, trendline)[0, 1]
-    stability = similarity**2
-    return stability
-
-
 @st.cache_data
-def load_data(directory):
-    daily_profit, stats, trades = {}, {}, []
-
-    for fname in Path(directory).glob("*.json"):
-        if str(fname).endswith(".meta.json") or str(fname).endswith("last_result.json"):
-            continue
-
-        with fname.open("r") as file:
-            try:
-                data = rapidjson.load(file)
-            except Exception as e:
-                print(e)
-
-        for strat_name, strat_data in data["strategy"].items():
-            force_exit_profit = 0.0
-            for trade in strat_data["trades"]:
-                trade["strategy"] = strat_name
-                trade["direction"] = "SHORT" if trade["is_short"] else "LONG"
-                del trade["is_short"]
-                if trade["exit_reason"] == "force_exit":
-                    force_exit_profit += trade["profit_abs"]
-                trades.append(trade)
-
-            df = pd.DataFrame(
-                strat_data["daily_profit"],
-                columns=["Date", "Profit"],
-            )
-            df["Date"] = pd.to_datetime(df["Date"])
-            df = df.set_index("Date")
-            df.loc[df.tail(1).index, "Profit"] -= force_exit_profit
-            daily_profit[strat_name] = df["Profit"]
-
-            stats[strat_name] = {
-                "Trades": strat_data["total_trades"],
-                "Profit": strat_data["profit_total"],
-                "Max Drawdown": strat_data["max_relative_drawdown"],
-                "CAGR": strat_data["cagr"],
-                "Sharpe": strat_data["sharpe"],
-                "Sortino": strat_data["sortino"],
-                "Expectancy Ratio": strat_data["expectancy_ratio"],
-                "Profit Factor": strat_data["profit_factor"],
-                "Returns/Drawdown": (
-                    strat_data["profit_total"] / strat_data["max_relative_drawdown"]
-                ),
-                "Stability": calculate_stability(df["Profit"]),
-            }
-
-    trades = pd.DataFrame(trades)
-    daily_profit = pd.concat(daily_profit, axis=1)
-
-    stats = pd.DataFrame(stats).T
-    stats.index.names = ["Strategy"]
-
-    return {
-        "trades": trades,
-        "stats": stats,
-        "daily_profit": daily_profit,
-    }
+def load_data(directory, files):
+    # `files` only keys the cache, their fingerprint changes with the backtest files.
+    return load_backtests(directory)
 
 
 def display_open_trades(strategies, data):
@@ -196,52 +135,39 @@ def display_profit_distribution(strategies, data):
     st.pyplot(fig, use_container_width=True)
 
 
-def run_montecarlo_simulation(strategies, data):
-    def _calculate_statistics(df):
-        stats = pd.DataFrame()
-        stats["daily_returns"] = df.mean(axis=0)
-        stats["weights"] = 1 / len(df.columns)
-        return stats
-
-    def _generate_portfolio(df, stats, n_iters, n_sims, init_balance):
-        covariance_matrix = df.cov()
-        L = np.linalg.cholesky(covariance_matrix)
-        historical_returns = np.full(
-            shape=(n_iters, len(df.columns)), fill_value=stats["daily_returns"]
-        )
-
-        portfolio = np.zeros((n_iters, n_sims))
-        for i in range(n_sims):
-            Z = np.random.normal(size=(n_iters, len(df.columns)))
-            daily_returns = historical_returns + np.dot(L, Z.T).T
-            portfolio[:, i] = (
-                np.cumprod(np.dot(daily_returns, stats["weights"]) + 1) * init_balance
-            )
-        return portfolio
-
-    def _calculate_var(sim_portfolio, alpha=5):
-        sim_val = sim_portfolio.iloc[-1, :]
-        mc_var = np.percentile(sim_val, alpha)
-        return mc_var, sim_val[sim_val <= mc_var].mean()
-
-    def _run_simulation(df, n_sims=50, n_iters=90, init_balance=INITIAL_BALANCE):
-        df_pct_change = (init_balance + df).pct_change(axis=0)
-        stats = _calculate_statistics(df_pct_change)
-        portfolio = _generate_portfolio(
-            df_pct_change, stats, n_iters, n_sims, init_balance
-        )
-
-        sim_portfolio = pd.DataFrame(portfolio)
-        mc_var, cond_var = _calculate_var(sim_portfolio)
-        sim_portfolio["MC Var"] = mc_var
-        sim_portfolio["Cond Var"] = cond_var
-        return sim_portfolio
+@st.cache_data
+def simulate_portfolio(df, n_sims, n_iters, init_balance):
+    # Memoized per strategy selection and settings, reruns of the page reuse the paths.
+    df_pct_change = (init_balance + df).pct_change(axis=0)
+    weights = np.full(len(df.columns), 1 / len(df.columns))
+    portfolio = simulated_portfolios(
+        df_pct_change.mean(axis=0).to_numpy(),
+        df_pct_change.cov().to_numpy(),
+        weights,
+        n_iters,
+        n_sims,
+        init_balance,
+        np.random.normal,
+    )
 
+    # VaR of all simulations, only the first paths are charted.
+    sim_val = portfolio[-1]
+    mc_var = np.percentile(sim_val, 5)
+    sim_portfolio = pd.DataFrame(portfolio[:, :MONTECARLO_CHARTED_SIMULATIONS])
+    sim_portfolio["MC Var"] = mc_var
+    sim_portfolio["Cond Var"] = sim_val[sim_val <= mc_var].mean()
+    return sim_portfolio
+
+
+def run_montecarlo_simulation(strategies, data):
+    n_sims = st.select_slider(
+        "Montecarlo simulations", MONTECARLO_SIMULATIONS, MONTECARLO_SIMULATIONS[0]
+    )
     df = data["daily_profit"][strategies].cumsum()
 
     # Simulation Prediction
     days_pred = 90
-    sim_pred = _run_simulation(df, n_iters=days_pred)
+    sim_pred = simulate_portfolio(df, n_sims, days_pred, INITIAL_BALANCE)
     sim_pred = (sim_pred - INITIAL_BALANCE) / INITIAL_BALANCE
 
     # Simulation Validation
@@ -250,10 +176,8 @@ def run_montecarlo_simulation(strategies, data):
     df_subset = df.iloc[:idx_cutoff]
     days_cutoff = len(df.index) - idx_cutoff
     cutoff_balance = df_subset.iloc[-1].sum()
-    sim_valid = _run_simulation(
-        df_subset, n_iters=days_cutoff, init_balance=cutoff_balance
-    )
-    sim_valid.index = df.iloc[idx_cutoff:].index
+    sim_valid = simulate_portfolio(df_subset, n_sims, days_cutoff, cutoff_balance)
+    sim_valid = sim_valid.set_axis(df.iloc[idx_cutoff:].index)
 
     merged = pd.DataFrame()
     merged["Portfolio"] = df.sum(axis=1)
@@ -320,7 +244,7 @@ def ratio_driven_page(title, ratio_column, data):
 
 
 # Main Application
-data = load_data(DATA_DIR)
+data = load_data(DATA_DIR, fingerprint(DATA_DIR))
 page_names_to_funcs = {
     "—--": lambda: default_page(data),
     "RDD": lambda: ratio_driven_page("RDD", "Returns/Drawdown", data),
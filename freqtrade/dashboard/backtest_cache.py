@@ -0,0 +1,265 @@
+"""
+Columnar cache of the backtest results shown by the dashboard.
+
+Every backtest results file is converted once into Parquet tables of its trades,
+daily profit and statistics, in a cache directory next to the results. A
+manifest keeps the modification time and size each file had when converted, so
+only new or changed files are parsed again, and the tables of all files are
+combined once per change. Without changes, loading reads the three combined
+tables.
+
+Nested trade fields, like the orders of a trade, are stored as JSON text.
+"""
+import os
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+import rapidjson
+from metric_kernels import trend_similarity
+
+CACHE_DIR = ".dashboard_cache"
+# Bump when the tables change, tables cached by an older version are rebuilt.
+CACHE_VERSION = 1
+TABLES = ("trades", "daily_profit", "stats")
+
+
+def calculate_stability(series):
+    similarity = trend_similarity(np.cumsum(series.to_numpy(dtype=np.float64)))
+    stability = similarity**2
+    return stability
+
+
+def backtest_files(directory) -> List[Path]:
+    """
+    Backtest results files of a directory, sorted by name.
+    """
+    return sorted(
+        fname
+        for fname in Path(directory).glob("*.json")
+        if not fname.name.endswith(".meta.json") and not fname.name.endswith("last_result.json")
+    )
+
+
+def fingerprint(directory) -> Tuple[Tuple[str, int, int], ...]:
+    """
+    (name, mtime, size) of every backtest results file of a directory, changes
+    whenever a file is added, removed or rewritten.
+    """
+    result = []
+    for fname in backtest_files(directory):
+        stat = fname.stat()
+        result.append((fname.name, stat.st_mtime_ns, stat.st_size))
+    return tuple(result)
+
+
+def convert(path: Path) -> Dict[str, pd.DataFrame]:
+    """
+    Trades, daily profit and statistics of the strategies of a backtest results file.
+
+    Parameters:
+    - path (Path): Backtest results file.
+
+    Returns:
+    - dict: "trades" with one row per trade, "daily_profit" with one column per
+            strategy and "stats" with one row per strategy.
+    """
+    with path.open("r") as file:
+        data = rapidjson.load(file)
+
+    trades, daily_profit, stats = [], {}, {}
+    for strat_name, strat_data in data["strategy"].items():
+        df = pd.DataFrame(strat_data["trades"])
+        force_exit_profit = 0.0
+        if not df.empty:
+            df["strategy"] = strat_name
+            df["direction"] = np.where(df.pop("is_short"), "SHORT", "LONG")
+            force_exit_profit = df.loc[df["exit_reason"] == "force_exit", "profit_abs"].sum()
+            trades.append(df)
+
+        df = pd.DataFrame(
+            strat_data["daily_profit"],
+            columns=["Date", "Profit"],
+        )
+        df["Date"] = pd.to_datetime(df["Date"])
+        df = df.set_index("Date")
+        df.loc[df.tail(1).index, "Profit"] -= force_exit_profit
+        daily_profit[strat_name] = df["Profit"]
+
+        stats[strat_name] = {
+            "Trades": strat_data["total_trades"],
+            "Profit": strat_data["profit_total"],
+            "Max Drawdown": strat_data["max_relative_drawdown"],
+            "CAGR": strat_data["cagr"],
+            "Sharpe": strat_data["sharpe"],
+            "Sortino": strat_data["sortino"],
+            "Expectancy Ratio": strat_data["expectancy_ratio"],
+            "Profit Factor": strat_data["profit_factor"],
+            "Returns/Drawdown": (
+                strat_data["profit_total"] / strat_data["max_relative_drawdown"]
+            ),
+            "Stability": calculate_stability(df["Profit"]),
+        }
+
+    trades = pd.concat(trades, ignore_index=True) if trades else pd.DataFrame()
+    for column in trades.columns:
+        if trades[column].map(lambda x: isinstance(x, (dict, list))).any():
+            trades[column] = trades[column].map(
+                lambda x: rapidjson.dumps(x) if isinstance(x, (dict, list)) else x
+            )
+    return {
+        "trades": trades,
+        "daily_profit": pd.DataFrame(daily_profit),
+        "stats": pd.DataFrame(stats).T,
+    }
+
+
+def combine(tables: List[Dict[str, pd.DataFrame]]) -> Dict[str, pd.DataFrame]:
+    """
+    Tables of all files, in file order. A strategy found in several files keeps
+    its place of first appearance with the values of the last file.
+    """
+    trades = [t["trades"] for t in tables if not t["trades"].empty]
+    daily_profit, stats = {}, {}
+    for t in tables:
+        daily_profit.update(t["daily_profit"].items())
+        stats.update(t["stats"].iterrows())
+
+    stats = pd.DataFrame(stats).T.astype(np.float64)
+    stats.index.names = ["Strategy"]
+    return {
+        "trades": pd.concat(trades, ignore_index=True) if trades else pd.DataFrame(),
+        "daily_profit": pd.concat(daily_profit, axis=1) if daily_profit else pd.DataFrame(),
+        "stats": stats,
+    }
+
+
+def update(previous: Dict[str, pd.DataFrame], stale: List[str],
+           tables: List[Dict[str, pd.DataFrame]], order: List[str]) -> Dict[str, pd.DataFrame]:
+    """
+    Combined tables without the `stale` strategies, with the tables of new files.
+
+    Parameters:
+    - previous (dict): Combined tables.
+    - stale (list): Strategies of the files that changed or were removed.
+    - tables (list): Tables of the new and changed files.
+    - order (list): All strategies, in file order.
+
+    Returns:
+    - dict: Combined tables.
+    """
+    trades = [t["trades"] for t in tables if not t["trades"].empty]
+    if not previous["trades"].empty:
+        trades.insert(0, previous["trades"][~previous["trades"]["strategy"].isin(stale)])
+    daily_profit = pd.concat(
+        [previous["daily_profit"].drop(columns=stale, errors="ignore")]
+        + [t["daily_profit"] for t in tables],
+        axis=1,
+    )
+    stats = pd.concat(
+        [previous["stats"].drop(index=stale, errors="ignore")]
+        + [t["stats"].astype(np.float64) for t in tables]
+    )
+    stats.index.names = ["Strategy"]
+    return {
+        "trades": pd.concat(trades, ignore_index=True) if trades else pd.DataFrame(),
+        # Dates only the stale strategies had are left empty.
+        "daily_profit": daily_profit.dropna(how="all").sort_index()[order],
+        "stats": stats.loc[order],
+    }
+
+
+def load_backtests(directory) -> Dict[str, pd.DataFrame]:
+    """
+    Trades, daily profit and statistics of all backtest results files of a
+    directory, converting only the files that are new or changed since the
+    last call.
+
+    Parameters:
+    - directory (str): Backtest results directory.
+
+    Returns:
+    - dict: "trades", "daily_profit" and "stats" of all strategies.
+    """
+    cache_dir = Path(directory) / CACHE_DIR
+    parts_dir = cache_dir / "parts"
+    manifest_path = cache_dir / "manifest.json"
+    os.makedirs(parts_dir, exist_ok=True)
+
+    manifest = {"version": CACHE_VERSION, "files": {}}
+    if manifest_path.exists():
+        with manifest_path.open("r") as file:
+            manifest = rapidjson.load(file)
+        if manifest.get("version") != CACHE_VERSION:
+            manifest = {"version": CACHE_VERSION, "files": {}}
+
+    # (mtime, size) and strategies of every converted file.
+    cached = manifest["files"]
+    current = {name: [mtime, size] for name, mtime, size in fingerprint(directory)}
+    changed = [name for name in current if cached.get(name, {}).get("stat") != current[name]]
+    removed = [name for name in cached if name not in current]
+    combined_paths = {table: cache_dir / f"{table}.parquet" for table in TABLES}
+    # Only combined tables finished for the files of the manifest can be reused.
+    combined_exist = manifest.get("combined", False) and all(
+        path.exists() for path in combined_paths.values()
+    )
+    if not changed and not removed and combined_exist:
+        return {table: pd.read_parquet(path) for table, path in combined_paths.items()}
+
+    stale = [s for name in changed + removed if name in cached for s in cached[name]["strategies"]]
+    unchanged = {
+        s for name, f in cached.items() if name not in changed + removed for s in f["strategies"]
+    }
+    for name in removed:
+        for table in TABLES:
+            (parts_dir / f"{name}.{table}.parquet").unlink(missing_ok=True)
+        del cached[name]
+    converted = []
+    for name in changed:
+        try:
+            tables = convert(Path(directory) / name)
+        except Exception as e:
+            # Left out of the manifest, converted again on the next load.
+            print(f"{name}: {e}")
+            cached.pop(name, None)
+            continue
+        for table, df in tables.items():
+            df.to_parquet(parts_dir / f"{name}.{table}.parquet")
+        cached[name] = {"stat": current[name], "strategies": tables["stats"].index.tolist()}
+        converted.append(tables)
+
+    order = list(dict.fromkeys(s for name in sorted(cached) for s in cached[name]["strategies"]))
+    new = [s for tables in converted for s in tables["stats"].index]
+    touched = set(stale) | set(new)
+    if combined_exist and len(new) == len(set(new)) and not touched & unchanged:
+        previous = {table: pd.read_parquet(path) for table, path in combined_paths.items()}
+        result = update(previous, stale, converted, order)
+    else:
+        # Strategies found in several files, their values depend on all of them.
+        # Also after an interrupted update, the combined tables are not reliable.
+        result = combine(
+            [
+                {
+                    table: pd.read_parquet(parts_dir / f"{name}.{table}.parquet")
+                    for table in TABLES
+                }
+                for name in sorted(cached)
+            ]
+        )
+    # The parts are saved, the combined tables are rebuilt from them if writing
+    # them fails halfway.
+    manifest["combined"] = False
+    _write_manifest(manifest_path, manifest)
+    for table, df in result.items():
+        df.to_parquet(combined_paths[table])
+    manifest["combined"] = True
+    _write_manifest(manifest_path, manifest)
+    return result
+
+
+def _write_manifest(path: Path, manifest: Dict) -> None:
+    tmp = path.with_suffix(".tmp")
+    with tmp.open("w") as file:
+        rapidjson.dump(manifest, file)
+    os.replace(tmp, path)
@@ -0,0 +1,236 @@
+"""
+Reusable random blocks for Monte Carlo and bootstrap resampling in hyperopt losses.
+
+Blocks of random variates are generated once per trade-count bucket from a
+fixed seed and shared between hyperopt worker processes through shared memory.
+Every epoch resamples from the same numbers, so losses are deterministic, no
+longer couple epochs through the global NumPy RNG state, and skip the random
+number generation on every call.
+"""
+import atexit
+import logging
+import time
+from multiprocessing import resource_tracker, shared_memory
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+SEED = 1337
+MIN_BUCKET = 64  # Smallest trade-count bucket.
+MAX_BLOCK_ELEMENTS = 1 << 23  # Larger blocks are generated per call instead of cached.
+SHM_PREFIX = "ngepet_bs"
+HEADER_BYTES = 8
+READY_MARKER = 0x5EED5EED5EED5EED
+ATTACH_TIMEOUT = 30.0  # Seconds to wait for another process to fill a block.
+
+_KINDS = {"normal": 0, "uniform": 1, "permutation": 2}
+_DTYPES = {"normal": np.float64, "uniform": np.float64, "permutation": np.int64}
+
+
+def _bucket(n: int) -> int:
+    """Rounds a trade count up to the next power of two."""
+    return max(MIN_BUCKET, 1 << (max(n, 1) - 1).bit_length())
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    """Attaches to an existing block without taking ownership of it."""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Python < 3.13 registers attached blocks with the resource tracker,
+        # which would unlink them when this process exits.
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
+
+
+class BootstrapService:
+    """
+    Deterministic random blocks shared across epochs and worker processes.
+
+    Parameters:
+    - seed (int): Seed of all generated blocks.
+    - use_shared_memory (bool): Share blocks between processes, otherwise keep them local.
+    """
+
+    def __init__(self, seed: int = SEED, use_shared_memory: bool = True) -> None:
+        self.seed = seed
+        self.use_shared_memory = use_shared_memory
+        self._blocks: Dict[Tuple[str, int, int], np.ndarray] = {}
+        self._segments: List[shared_memory.SharedMemory] = []
+        # Segments created by this process, removed again by `close`.
+        self._created: List[shared_memory.SharedMemory] = []
+        atexit.register(self.close)
+
+    def close(self) -> None:
+        """
+        Removes the shared blocks created by this process, called at exit.
+
+        Blocks stay mapped until the process exits, arrays handed out keep
+        working. Processes attached to a removed block keep it, processes
+        asking for it later create it again.
+        """
+        for shm in self._created:
+            try:
+                shm.unlink()
+            except FileNotFoundError:
+                pass
+        self._created = []
+
+    def normals(self, iterations: int) -> np.ndarray:
+        """
+        Standard normal variates, one per simulation.
+
+        Returns:
+        - np.ndarray: Read-only array of shape (iterations,).
+        """
+        return self._block("normal", iterations, 1)[:, 0]
+
+    def uniforms(self, n: int, iterations: int, start: int = 0, stop: int = None) -> np.ndarray:
+        """
+        Uniform variates in [0, 1), one row of `n` values per simulation.
+
+        Rows `start:stop` can be requested separately to process large trade
+        counts in chunks, they are identical to the same rows of the full block.
+
+        Returns:
+        - np.ndarray: Read-only view of shape (stop - start, n).
+        """
+        stop = iterations if stop is None else stop
+        cols = _bucket(n)
+        if iterations * cols > MAX_BLOCK_ELEMENTS:
+            # Too large to keep around, generate only the requested rows.
+            return self._generate("uniform", iterations, n, row_start=start, row_stop=stop)
+        return self._block("uniform", iterations, cols)[start:stop, :n]
+
+    def resample_indices(self, n: int, iterations: int, start: int = 0, stop: int = None
+                         ) -> np.ndarray:
+        """
+        Indices for resampling `n` values with replacement.
+
+        Returns:
+        - np.ndarray: Indices in [0, n) of shape (stop - start, n).
+        """
+        return (self.uniforms(n, iterations, start, stop) * n).astype(np.intp)
+
+    def permutations(self, n: int, iterations: int, start: int = 0, stop: int = None
+                     ) -> np.ndarray:
+        """
+        Random orderings of `n` values, e.g. to shuffle trades.
+
+        The orderings of the whole trade-count bucket are cached, the values
+        below `n` keep their random order. They equal the argsort of `uniforms`.
+
+        Returns:
+        - np.ndarray: Permutations of shape (stop - start, n).
+        """
+        stop = iterations if stop is None else stop
+        cols = _bucket(n)
+        if iterations * cols > MAX_BLOCK_ELEMENTS:
+            return np.argsort(self.uniforms(n, iterations, start, stop), axis=1)
+        block = self._block("permutation", iterations, cols)[start:stop]
+        if n == cols:
+            return block
+        return block[block < n].reshape(stop - start, n)
+
+    def confidence_interval(
+        self,
+        values: np.ndarray,
+        statistic: Callable = np.mean,
+        iterations: int = 1000,
+        alpha: float = 0.05,
+    ) -> Tuple[float, float]:
+        """
+        Bootstrap confidence interval of a statistic.
+
+        Parameters:
+        - values (np.ndarray): Sample, e.g. profit ratios of the trades.
+        - statistic (Callable): Function accepting an `axis` argument.
+        - iterations (int): Number of bootstrap samples.
+        - alpha (float): Two-sided significance level.
+
+        Returns:
+        - tuple: Lower and upper bounds of the interval.
+        """
+        n = len(values)
+        estimates = np.empty(iterations)
+        chunk = max(1, MAX_BLOCK_ELEMENTS // max(n, 1))
+        for start in range(0, iterations, chunk):
+            stop = min(start + chunk, iterations)
+            samples = values[self.resample_indices(n, iterations, start, stop)]
+            estimates[start:stop] = statistic(samples, axis=1)
+        low, high = np.quantile(estimates, [alpha / 2, 1 - alpha / 2])
+        return float(low), float(high)
+
+    def _block(self, kind: str, rows: int, cols: int) -> np.ndarray:
+        key = (kind, rows, cols)
+        if key not in self._blocks:
+            block = self._shared_block(kind, rows, cols) if self.use_shared_memory else None
+            if block is None:
+                block = self._generate(kind, rows, cols)
+            block.flags.writeable = False
+            self._blocks[key] = block
+        return self._blocks[key]
+
+    def _generate(self, kind: str, rows: int, cols: int, out: np.ndarray = None,
+                  row_start: int = 0, row_stop: int = None) -> np.ndarray:
+        """Generates rows `row_start:row_stop` of the block, by default all of them."""
+        row_stop = rows if row_stop is None else row_stop
+        if out is None:
+            out = np.empty((row_stop - row_start, cols), dtype=_DTYPES[kind])
+        if kind == "permutation":
+            # Orderings of the uniform block, so they match `uniforms`.
+            uniforms = self._generate("uniform", rows, cols, None, row_start, row_stop)
+            out[:] = np.argsort(uniforms, axis=1)
+            return out
+        rng = np.random.default_rng([self.seed, _KINDS[kind], rows, cols])
+        if kind == "normal":
+            rng.standard_normal(out=out)
+        else:
+            # Every uniform double consumes exactly one 64-bit draw, so rows
+            # can be skipped without generating them.
+            rng.bit_generator.advance(row_start * cols)
+            rng.random(out=out)
+        return out
+
+    def _shared_block(self, kind: str, rows: int, cols: int):
+        """Creates and fills a shared block, or attaches to one made by another process."""
+        name = f"{SHM_PREFIX}_{self.seed}_{_KINDS[kind]}_{rows}_{cols}"
+        dtype = np.dtype(_DTYPES[kind])
+        size = HEADER_BYTES + rows * cols * dtype.itemsize
+        try:
+            try:
+                shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+                created = True
+            except FileExistsError:
+                shm = _attach(name)
+                created = False
+        except OSError as e:
+            logger.warning(f"Bootstrap shared memory unavailable, using local blocks: {e}")
+            self.use_shared_memory = False
+            return None
+
+        header = np.ndarray((1,), dtype=np.uint64, buffer=shm.buf)
+        block = np.ndarray((rows, cols), dtype=dtype, buffer=shm.buf, offset=HEADER_BYTES)
+        if created:
+            self._generate(kind, rows, cols, out=block)
+            header[0] = READY_MARKER
+        else:
+            deadline = time.monotonic() + ATTACH_TIMEOUT
+            while header[0] != READY_MARKER:
+                if time.monotonic() > deadline:
+                    del header, block
+                    shm.close()
+                    return None
+                time.sleep(0.01)
+
+        self._segments.append(shm)
+        if created:
+            self._created.append(shm)
+        return block
+
+
+# Process-wide service used by the losses.
+bootstrap = BootstrapService()
@@ -0,0 +1,129 @@
+import json
+from datetime import datetime
+from typing import Any, Dict, Tuple
+
+import numpy as np
+from pandas import DataFrame
+from freqtrade.constants import Config
+from freqtrade.exceptions import OperationalException
+from freqtrade.optimize.hyperopt import IHyperOptLoss
+from loss_pipeline import METRIC_COSTS, METRICS, Gate, LossContext, LossPipeline
+
+MAX_LOSS = 100000
+
+# Used when the config has no "composite_loss" section.
+DEFAULT_LOSS_CONFIG: Dict[str, Any] = {
+    "objectives": [{"metric": "sqn", "weight": 1.0}],
+    "penalties": [{"metric": "total_profit", "min": 0.0}],
+}
+
+_pipelines: Dict[str, Tuple[LossPipeline, Dict[str, Any]]] = {}
+
+
+def build_pipeline(loss_config: Dict[str, Any]) -> LossPipeline:
+    """
+    Builds the gates and weighted objective of a composite loss.
+
+    Penalty gates are ordered by the cost of their metric, so cheap checks
+    reject an epoch before expensive metrics are computed.
+
+    Parameters:
+    - loss_config (dict): The "composite_loss" section of the config.
+
+    Returns:
+    - LossPipeline: The pipeline evaluating the composite loss.
+    """
+    objectives = [(o["metric"], float(o.get("weight", 1.0))) for o in loss_config["objectives"]]
+    penalties = loss_config.get("penalties", [])
+
+    for metric in [m for m, _ in objectives] + [p["metric"] for p in penalties]:
+        if metric not in METRICS:
+            raise OperationalException(
+                f"CompositeLoss: unknown metric '{metric}', "
+                f"available metrics: {', '.join(sorted(METRICS))}"
+            )
+
+    gates = [Gate("empty", lambda ctx: ctx.trade_count == 0)]
+    for penalty in sorted(penalties, key=lambda p: METRIC_COSTS[p["metric"]]):
+        metric = penalty["metric"]
+        if "min" in penalty:
+            gates.append(
+                Gate(f"min_{metric}", lambda ctx, m=metric, v=penalty["min"]: ctx[m] < v)
+            )
+        if "max" in penalty:
+            gates.append(
+                Gate(f"max_{metric}", lambda ctx, m=metric, v=penalty["max"]: ctx[m] > v)
+            )
+
+    def objective(ctx: LossContext) -> float:
+        score = sum(weight * ctx[metric] for metric, weight in objectives)
+        return -score if np.isfinite(score) else MAX_LOSS
+
+    return LossPipeline("CompositeLoss", gates, objective, max_loss=MAX_LOSS)
+
+
+class CompositeLoss(IHyperOptLoss):
+    """
+    Weighted multi-objective loss configured from the config file.
+
+    Objective terms and penalty thresholds refer to the metrics registered in
+    `loss_pipeline.py` (sqn, romad, sortino, stability, mc_profit_ratio, slope,
+    max_drawdown_relative, ...). All terms are evaluated from a single
+    `LossContext`, so metrics shared between terms and penalties, like the
+    drawdown or the daily returns, are only computed once per epoch.
+
+    The loss is the negative weighted sum of the objective terms. Use negative
+    weights for metrics that should be minimized.
+
+    Example configuration:
+
+        "composite_loss": {
+            "objectives": [
+                {"metric": "sqn", "weight": 1.0},
+                {"metric": "sortino", "weight": 0.5},
+                {"metric": "stability", "weight": 2.0}
+            ],
+            "penalties": [
+                {"metric": "trade_count", "min": 100},
+                {"metric": "profit_mean", "min": 0.005},
+                {"metric": "max_drawdown_relative", "max": 0.3}
+            ],
+            "params": {"sqn_chunk_size": 100, "mc_iterations": 500}
+        }
+    """
+
+    @staticmethod
+    def hyperopt_loss_function(
+        results: DataFrame,
+        trade_count: int,
+        config: Config,
+        min_date: datetime,
+        max_date: datetime,
+        *args,
+        **kwargs
+    ) -> float:
+        """
+        Calculates the composite loss for a set of trading results.
+
+        Parameters:
+        - results (DataFrame): DataFrame containing the results of backtesting.
+        - trade_count (int): Number of trades.
+        - config (Config): Configuration object, with an optional "composite_loss" section.
+        - min_date, max_date (datetime): Backtest period.
+
+        Returns:
+        - float: The calculated loss. A lower (more negative) value indicates better performance.
+        """
+        pipeline, params = CompositeLoss._get_pipeline(
+            config.get("composite_loss", DEFAULT_LOSS_CONFIG)
+        )
+        ctx = LossContext(results, config, trade_count, min_date, max_date, params)
+        return pipeline(ctx)
+
+    @staticmethod
+    def _get_pipeline(loss_config: Dict[str, Any]) -> Tuple[LossPipeline, Dict[str, Any]]:
+        """Returns the pipeline for `loss_config`, built once per process."""
+        key = json.dumps(loss_config, sort_keys=True)
+        if key not in _pipelines:
+            _pipelines[key] = (build_pipeline(loss_config), loss_config.get("params", {}))
+        return _pipelines[key]
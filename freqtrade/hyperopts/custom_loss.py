@@ -1,35 +1,41 @@
 import numpy as np
 import pandas as pd
-from typing import Tuple
 from datetime import datetime
 from freqtrade.constants import Config
-from freqtrade.data.metrics import calculate_max_drawdown, calculate_expectancy
 from freqtrade.optimize.hyperopt import IHyperOptLoss
+from loss_pipeline import Gate, LossContext, LossPipeline
+from metric_kernels import max_drawdown
 
 MAX_LOSS = 100000  # Define a fallback maximum loss value for non-ideal scenarios.
 CHUNK_SIZE = 100  # Define the size of each chunk for calculating scores.
 MAX_DRAWDOWN = 0.5  # Set the maximum acceptable drawdown ratio.
 MIN_PERCENTILE = 20  # Define the percentile for the loss calculation.
 
-def calculate_system_quality(trades: pd.DataFrame) -> float:
+def expectancy_ratio(profit_abs: np.ndarray) -> np.ndarray:
     """
-    Calculate the system quality number (SQN) of a set of trades.
-
-    The SQN is defined as the square root of the number of trades, multiplied by the
-    mean of the profit ratio, divided by the standard deviation of the profit ratio.
-    It is a measure of the system's performance and risk.
+    Row-wise `freqtrade.data.metrics.calculate_expectancy` expectancy ratio.
 
     Parameters:
-    - trades (pd.DataFrame): The DataFrame containing trade results.
+    - profit_abs (np.ndarray): Absolute profits, one set of trades per row.
 
     Returns:
-    - float: The calculated system quality number.
+    - np.ndarray: Expectancy ratio of each row, 100 for rows without losing trades.
     """
-    return (
-        np.sqrt(len(trades))
-        * trades["profit_ratio"].mean()
-        / trades["profit_ratio"].std()
-    )
+    wins = profit_abs > 0
+    losses = profit_abs < 0
+    nb_win_trades = wins.sum(axis=1)
+    nb_loss_trades = losses.sum(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        average_win = np.where(
+            nb_win_trades > 0, np.where(wins, profit_abs, 0.0).sum(axis=1) / nb_win_trades, 0.0
+        )
+        average_loss = np.where(
+            nb_loss_trades > 0, -np.where(losses, profit_abs, 0.0).sum(axis=1) / nb_loss_trades, 0.0
+        )
+        winrate = nb_win_trades / profit_abs.shape[1]
+        return np.where(
+            average_loss > 0, (1 + average_win / average_loss) * winrate - 1, 100.0
+        )
 
 
 class CustomLoss(IHyperOptLoss):
@@ -43,8 +49,29 @@ class CustomLoss(IHyperOptLoss):
     The final loss is calculated based on a negative percentile of scores derived from
     the trading results, encouraging strategies that consistently perform well across
     different segments of the data.
+
+    The profit and drawdown penalties are checked before the chunked scoring,
+    which only runs for the candidates that pass them.
     """
-    
+
+    pipeline = LossPipeline(
+        "CustomLoss",
+        gates=[
+            Gate("empty", lambda ctx: ctx.trade_count == 0),
+            # Penalize results with insufficient profit or excessive drawdown.
+            Gate(
+                "min_profit",
+                lambda ctx: ctx["total_profit"] < ctx.starting_balance * ctx["years"],
+            ),
+            Gate(
+                "max_drawdown",
+                lambda ctx: ctx["max_drawdown"] / ctx["total_profit"] > MAX_DRAWDOWN,
+            ),
+        ],
+        objective=lambda ctx: CustomLoss._calculate_chunk_scores(ctx),
+        max_loss=MAX_LOSS,
+    )
+
     @staticmethod
     def hyperopt_loss_function(
         results: pd.DataFrame,
@@ -66,48 +93,52 @@ class CustomLoss(IHyperOptLoss):
         Returns:
         - float: The calculated loss. A lower (more negative) value indicates better performance.
         """
-        if results.empty:
-            return MAX_LOSS  # Return the maximum loss for empty result sets.
-
-        starting_balance = config["dry_run_wallet"]
-        max_drawdown_abs = calculate_max_drawdown(
-            results,
-            value_col="profit_abs",
-            starting_balance=starting_balance,
-            relative=True,
-        )[0]
-        total_profit_abs = results["profit_abs"].sum()
-        backtest_days = (max_date - min_date).days or 1
-        years = max(1, backtest_days // 365)
-
-        # Penalize results with insufficient profit or excessive drawdown.
-        if total_profit_abs < starting_balance * years or max_drawdown_abs / total_profit_abs > MAX_DRAWDOWN:
+        ctx = LossContext(results, config, min_date=min_date, max_date=max_date)
+        return CustomLoss.pipeline(ctx)
+
+    @staticmethod
+    def _calculate_chunk_scores(ctx: LossContext) -> float:
+        """
+        Scores the strategy on consecutive chunks of CHUNK_SIZE trades.
+
+        Parameters:
+        - ctx (LossContext): Metrics of the current epoch.
+
+        Returns:
+        - float: The negative MIN_PERCENTILE of the chunk scores.
+        """
+        num_chunks = ctx.trade_count // CHUNK_SIZE
+        if num_chunks == 0:
             return MAX_LOSS
 
-        num_chunks = len(results) // CHUNK_SIZE
-        truncated_results = results.iloc[:num_chunks * CHUNK_SIZE]
-
-        scores = []
-
-        # Evaluate the strategy performance in chunks to assess consistency and risk.
-        for i in range(0, num_chunks * CHUNK_SIZE, CHUNK_SIZE):
-            chunk = truncated_results.iloc[i : i + CHUNK_SIZE]
-            total_profit_abs = chunk["profit_abs"].sum()
-            max_drawdown_abs = calculate_max_drawdown(
-                chunk,
-                value_col="profit_abs",
-                starting_balance=starting_balance,
-                relative=True,
-            )[0]
-            exp, exp_ratio = calculate_expectancy(chunk)
-            system_quality = calculate_system_quality(chunk)
+        # Consecutive chunks of trades as rows, the drawdown runs by close date within a chunk.
+        size = num_chunks * CHUNK_SIZE
+        profit_abs = ctx.profit_abs[:size].reshape(num_chunks, CHUNK_SIZE)
+        profit_ratio = ctx.profit_ratio[:size].reshape(num_chunks, CHUNK_SIZE)
+        close_ns = ctx.close_ns[:size].reshape(num_chunks, CHUNK_SIZE)
+        by_close = np.take_along_axis(
+            profit_abs, np.argsort(close_ns, axis=1, kind="stable"), axis=1
+        )
+
+        # Each chunk starts with the balance left by the previous ones.
+        total_profit_abs = profit_abs.sum(axis=1)
+        starting_balance = ctx.starting_balance + np.concatenate(
+            ([0.0], np.cumsum(total_profit_abs)[:-1])
+        )
+        max_drawdown_abs, _ = max_drawdown(by_close, starting_balance[:, None])
+
+        with np.errstate(divide="ignore", invalid="ignore"):
+            system_quality = (
+                np.sqrt(CHUNK_SIZE) * profit_ratio.mean(axis=1) / profit_ratio.std(axis=1, ddof=1)
+            )
             return_over_max_drawdown = total_profit_abs / max_drawdown_abs
-            profit_ratio = total_profit_abs / starting_balance
             score = np.sqrt(
-                exp_ratio * profit_ratio * system_quality * return_over_max_drawdown
+                expectancy_ratio(profit_abs)
+                * (total_profit_abs / starting_balance)
+                * system_quality
+                * return_over_max_drawdown
             )
-            scores.append(np.nan_to_num(score, nan=0.0, posinf=0.0, neginf=0.0))
-            starting_balance += total_profit_abs
+        scores = np.nan_to_num(score, nan=0.0, posinf=0.0, neginf=0.0)
 
         # The loss is the negative value of the specified percentile of the scores, encouraging higher scores.
-        return -np.percentile(scores, MIN_PERCENTILE) if scores else MAX_LOSS
+        return -np.percentile(scores, MIN_PERCENTILE)
@@ -0,0 +1,306 @@
+"""
+Gate pipeline for hyperopt losses.
+
+A loss is declared as a list of gates followed by an objective. Gates run in
+order and the first one that rejects the epoch returns MAX_LOSS, so cheap checks
+(trade count, total profit, mean/median profit) should come before expensive
+ones (Monte Carlo, chunked SQN, resampled ratios) which then only run for the
+candidates that survive.
+
+Metrics are computed lazily through a `LossContext` and cached for the epoch,
+so a value used by a gate and the objective is only computed once. Registered
+metrics carry a relative cost, used to order gates built from configuration.
+"""
+import logging
+from collections import Counter
+from datetime import datetime
+from functools import cached_property
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+
+import numpy as np
+from pandas import DataFrame
+from freqtrade.constants import Config
+from bootstrap_service import bootstrap
+from metric_kernels import (chunked_sqn, daily_sum, epoch_day, epoch_days, linear_slope,
+                            max_drawdown, sortino, trend_similarity)
+
+logger = logging.getLogger(__name__)
+
+MAX_LOSS = 100000  # Loss returned for rejected epochs.
+DAYS_IN_YEAR = 365
+LOG_INTERVAL = 1000  # Log gate statistics every N epochs (per worker process).
+
+# Metric costs, cheapest first.
+COST_SCALAR = 0  # Known without looking at the trades.
+COST_LINEAR = 1  # Single pass over the trades.
+COST_SORTED = 2  # Needs sorting or daily binning of the trades.
+COST_SIMULATION = 3  # Monte Carlo simulations.
+
+# Default metric parameters, overridable per context.
+DEFAULT_PARAMS: Dict[str, Any] = {
+    "sqn_chunk_size": 100,
+    "slippage_per_trade_ratio": 0.0005,
+    "mc_iterations": 500,
+    "mc_quantile": 0.1,
+    "bootstrap_iterations": 1000,
+    "bootstrap_alpha": 0.05,
+}
+
+METRICS: Dict[str, Callable[["LossContext"], Any]] = {}
+METRIC_COSTS: Dict[str, int] = {}
+
+
+def register_metric(name: str, cost: int = COST_LINEAR):
+    """Registers a function of `LossContext` as a named, cached metric."""
+
+    def decorator(func):
+        METRICS[name] = func
+        METRIC_COSTS[name] = cost
+        return func
+
+    return decorator
+
+
+class LossContext:
+    """
+    Lazily evaluated metrics of a single epoch.
+
+    Parameters:
+    - results (DataFrame): Backtest results of the epoch.
+    - config (Config): Configuration object containing settings like starting balance.
+    - trade_count (int): Number of trades, defaults to the length of results.
+    - min_date, max_date (datetime): Backtest period.
+    - params (dict): Overrides of DEFAULT_PARAMS.
+    """
+
+    def __init__(
+        self,
+        results: DataFrame,
+        config: Config,
+        trade_count: Optional[int] = None,
+        min_date: Optional[datetime] = None,
+        max_date: Optional[datetime] = None,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.results = results
+        self.config = config
+        self.trade_count = len(results) if trade_count is None else trade_count
+        self.min_date = min_date
+        self.max_date = max_date
+        self.starting_balance = config["dry_run_wallet"]
+        self.params = {**DEFAULT_PARAMS, **(params or {})}
+        self._values: Dict[str, Any] = {}
+
+    def __getitem__(self, name: str) -> Any:
+        if name not in self._values:
+            self._values[name] = METRICS[name](self)
+        return self._values[name]
+
+    def param(self, name: str) -> Any:
+        return self.params[name]
+
+    @cached_property
+    def profit_abs(self) -> np.ndarray:
+        return self.results["profit_abs"].to_numpy(dtype=np.float64)
+
+    @cached_property
+    def profit_ratio(self) -> np.ndarray:
+        return self.results["profit_ratio"].to_numpy(dtype=np.float64)
+
+    @cached_property
+    def close_ns(self) -> np.ndarray:
+        """Close dates as int64 nanoseconds, sorting Timestamp objects is much slower."""
+        return self.results["close_date"].to_numpy("datetime64[ns]").view(np.int64)
+
+    @cached_property
+    def close_order(self) -> Optional[np.ndarray]:
+        """Stable sort order by close date, None if results are already sorted."""
+        close = self.close_ns
+        if len(close) < 2 or (close[1:] >= close[:-1]).all():
+            return None
+        return np.argsort(close, kind="stable")
+
+    @cached_property
+    def profit_abs_by_close(self) -> np.ndarray:
+        order = self.close_order
+        return self.profit_abs if order is None else self.profit_abs[order]
+
+
+@register_metric("trade_count", cost=COST_SCALAR)
+def _trade_count(ctx: LossContext) -> int:
+    return ctx.trade_count
+
+
+@register_metric("years", cost=COST_SCALAR)
+def _years(ctx: LossContext) -> int:
+    backtest_days = (ctx.max_date - ctx.min_date).days or 1
+    return max(1, backtest_days // DAYS_IN_YEAR)
+
+
+@register_metric("total_profit")
+def _total_profit(ctx: LossContext) -> float:
+    return float(ctx.profit_abs.sum())
+
+
+@register_metric("total_profit_ratio")
+def _total_profit_ratio(ctx: LossContext) -> float:
+    return ctx["total_profit"] / ctx.starting_balance
+
+
+@register_metric("profit_mean")
+def _profit_mean(ctx: LossContext) -> float:
+    return float(ctx.profit_ratio.mean())
+
+
+@register_metric("profit_median", cost=COST_SORTED)
+def _profit_median(ctx: LossContext) -> float:
+    return float(np.median(ctx.profit_ratio))
+
+
+@register_metric("sqn")
+def _sqn(ctx: LossContext) -> float:
+    return chunked_sqn(ctx.profit_ratio, ctx.param("sqn_chunk_size"))
+
+
+@register_metric("slope")
+def _slope(ctx: LossContext) -> float:
+    return linear_slope(np.cumsum(ctx.profit_abs))
+
+
+@register_metric("drawdown", cost=COST_SORTED)
+def _drawdown(ctx: LossContext):
+    return max_drawdown(ctx.profit_abs_by_close, ctx.starting_balance)
+
+
+@register_metric("max_drawdown", cost=COST_SORTED)
+def _max_drawdown(ctx: LossContext) -> float:
+    return ctx["drawdown"][0]
+
+
+@register_metric("max_drawdown_relative", cost=COST_SORTED)
+def _max_drawdown_relative(ctx: LossContext) -> float:
+    return ctx["drawdown"][1]
+
+
+@register_metric("romad", cost=COST_SORTED)
+def _romad(ctx: LossContext) -> float:
+    max_drawdown_abs = ctx["max_drawdown"]
+    return ctx["total_profit"] / max_drawdown_abs if max_drawdown_abs else ctx["total_profit"]
+
+
+@register_metric("daily_returns", cost=COST_SORTED)
+def _daily_returns(ctx: LossContext) -> np.ndarray:
+    """Daily sum of profit ratios after slippage, from min_date to max_date."""
+    start_day = epoch_day(ctx.min_date)
+    return daily_sum(
+        ctx.profit_ratio - ctx.param("slippage_per_trade_ratio"),
+        epoch_days(ctx.results["close_date"]),
+        start_day,
+        epoch_day(ctx.max_date) - start_day + 1,
+    )
+
+
+@register_metric("sortino", cost=COST_SORTED)
+def _sortino(ctx: LossContext) -> float:
+    """Annualized daily Sortino ratio, -100 if there is no downside to measure."""
+    ratio = sortino(ctx["daily_returns"])
+    if np.isnan(ratio):
+        return -100.0
+    return ratio * np.sqrt(DAYS_IN_YEAR)
+
+
+@register_metric("stability", cost=COST_SORTED)
+def _stability(ctx: LossContext) -> float:
+    return trend_similarity(np.cumsum(ctx["daily_returns"]))
+
+
+@register_metric("mc_profit_ratio", cost=COST_SIMULATION)
+def _mc_profit_ratio(ctx: LossContext) -> float:
+    """
+    Quantile of the profit ratio of Monte Carlo simulations of the equity curve.
+
+    Future log returns are drawn from a normal distribution with the drift and
+    deviation of the observed log returns of the equity curve.
+    """
+    starting_balance = ctx.starting_balance
+    iterations = ctx.param("mc_iterations")
+    t_intervals = ctx.trade_count
+
+    # Calculate cumulative profit and log returns for Monte Carlo simulation.
+    cum_profit = starting_balance + np.cumsum(ctx.profit_abs)
+    log_returns = np.log(cum_profit[1:] / cum_profit[:-1])
+
+    # Estimate future returns using Monte Carlo simulation.
+    drift = log_returns.mean() - (0.5 * log_returns.var(ddof=1))
+    stdev = log_returns.std(ddof=1)
+    # Compounding t - 1 lognormal steps only depends on the sum of t - 1 standard
+    # normal draws, which is distributed as sqrt(t - 1) * N(0, 1).
+    steps = t_intervals - 1
+    random_factors = bootstrap.normals(iterations)
+    final_balance = starting_balance * np.exp(
+        steps * drift + stdev * np.sqrt(steps) * random_factors
+    )
+    mc_profit = np.quantile(final_balance, ctx.param("mc_quantile"))
+    return (mc_profit - starting_balance) / starting_balance
+
+
+@register_metric("profit_mean_ci_low", cost=COST_SIMULATION)
+def _profit_mean_ci_low(ctx: LossContext) -> float:
+    """Lower bound of the bootstrap confidence interval of the mean profit ratio."""
+    low, _ = bootstrap.confidence_interval(
+        ctx.profit_ratio,
+        np.mean,
+        iterations=ctx.param("bootstrap_iterations"),
+        alpha=ctx.param("bootstrap_alpha"),
+    )
+    return low
+
+
+class Gate(NamedTuple):
+    """A named check that rejects an epoch when `rejects(ctx)` is true."""
+
+    name: str
+    rejects: Callable[[LossContext], bool]
+
+
+class LossPipeline:
+    """
+    Runs gates in order and evaluates the objective for surviving epochs.
+
+    The number of epochs leaving at each gate is counted in `exits`, with the
+    epochs reaching the objective counted as "passed".
+    """
+
+    def __init__(
+        self,
+        name: str,
+        gates: List[Gate],
+        objective: Callable[[LossContext], float],
+        max_loss: float = MAX_LOSS,
+    ) -> None:
+        self.name = name
+        self.gates = gates
+        self.objective = objective
+        self.max_loss = max_loss
+        self.exits: Counter = Counter()
+        self.epochs = 0
+
+    def __call__(self, ctx: LossContext) -> float:
+        self.epochs += 1
+        if LOG_INTERVAL and self.epochs % LOG_INTERVAL == 0:
+            logger.info(self.summary())
+
+        for gate in self.gates:
+            if gate.rejects(ctx):
+                self.exits[gate.name] += 1
+                return self.max_loss
+
+        self.exits["passed"] += 1
+        return self.objective(ctx)
+
+    def summary(self) -> str:
+        counts = ", ".join(
+            f"{name}: {self.exits[name]}"
+            for name in [gate.name for gate in self.gates] + ["passed"]
+        )
+        return f"{self.name} - {self.epochs} epochs - {counts}"
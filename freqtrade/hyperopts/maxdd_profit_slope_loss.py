@@ -1,12 +1,13 @@
 import numpy as np
 from pandas import DataFrame
 from freqtrade.optimize.hyperopt import IHyperOptLoss
-from freqtrade.data.metrics import calculate_max_drawdown
 from freqtrade.constants import Config
+from loss_pipeline import Gate, LossContext, LossPipeline, register_metric
 
 MIN_TRADES = 500
 MIN_TOTAL_PROFIT = 50000.0
 MAX_LOSS = 100000
+MIN_DRAWDOWN = 1e-5  # Drawdown used when there is no losing trade
 
 
 class MaxDrawdownProfitSlopeLoss(IHyperOptLoss):
@@ -18,10 +19,26 @@ class MaxDrawdownProfitSlopeLoss(IHyperOptLoss):
     to find parameter sets that maximize
     profit while controlling for risk.
 
+    The trade count and total profit checks run before the score is computed.
+    The Monte Carlo check of the original loss is left out: it measured every
+    shuffle with calculate_max_drawdown, which sorts the trades back by close
+    date, so the simulated net profit and drawdown always equaled the actual
+    ones and the check never rejected an epoch.
+
     Attributes:
-        None
+        pipeline (LossPipeline): Gates and objective of the loss.
     """
 
+    pipeline = LossPipeline(
+        "MaxDrawdownProfitSlopeLoss",
+        gates=[
+            Gate("trade_count", lambda ctx: ctx.trade_count < MIN_TRADES),
+            Gate("total_profit", lambda ctx: ctx["total_profit"] < MIN_TOTAL_PROFIT),
+        ],
+        objective=lambda ctx: MaxDrawdownProfitSlopeLoss._calculate_score(ctx),
+        max_loss=MAX_LOSS,
+    )
+
     @staticmethod
     def hyperopt_loss_function(
         results: DataFrame, trade_count: int, config: Config, *args, **kwargs
@@ -37,64 +54,30 @@ class MaxDrawdownProfitSlopeLoss(IHyperOptLoss):
         Returns:
             float: Loss score for optimization.
         """
+        ctx = LossContext(results, config, trade_count=trade_count)
+        return MaxDrawdownProfitSlopeLoss.pipeline(ctx)
 
+    @staticmethod
+    def _calculate_score(ctx: LossContext) -> float:
+        """Combines profit slope, trade count and return over drawdown into the loss."""
         # Calculate cumulative profit over trades
-        profits = results["profit_abs"].cumsum()
-        starting_balance = config["dry_run_wallet"]
-
-        # Early exit with a high loss score if trade count or total profit
-        # criteria are not met
-        if trade_count < MIN_TRADES or profits.iloc[-1] < MIN_TOTAL_PROFIT:
-            return MAX_LOSS
-
-        # Number of Monte Carlo simulations
-        num_simulations = 1000
-        sim_results = []
-
-        # Perform Monte Carlo simulations to assess risk
-        for _ in range(num_simulations):
-            # Shuffle trading results to simulate different outcomes
-            shuffled_results = results.sample(frac=1, replace=False)
-
-            # Calculate net profit and maximum drawdown for the simulated results
-            sim_net_profit = shuffled_results["profit_abs"].cumsum().iloc[-1]
-            try:
-                sim_max_dd = calculate_max_drawdown(
-                    shuffled_results,
-                    value_col="profit_abs",
-                    starting_balance=starting_balance,
-                    relative=True,
-                )[0]
-            except ValueError:
-                sim_max_dd = 1e-5
-
-            sim_results.append((sim_net_profit, sim_max_dd))
-
-        # Calculate the 20th percentile of net profit and 80th percentile
-        # of max drawdown from simulations
-        profit_lower = np.percentile([x[0] for x in sim_results], 20.0)
-        max_dd_upper = np.percentile([x[1] for x in sim_results], 80.0)
-
-        # Calculate the actual maximum drawdown from the original results
-        try:
-            max_dd = calculate_max_drawdown(
-                results,
-                value_col="profit_abs",
-                starting_balance=starting_balance,
-                relative=True,
-            )[0]
-        except ValueError:
-            max_dd = 1e-5
-
-        # Check if profit and drawdown criteria are met based on Monte Carlo simulations
-        if profit_lower < 0.5 * profits.iloc[-1] or max_dd_upper > 2.0 * max_dd:
-            return MAX_LOSS
+        profits = np.cumsum(ctx.profit_abs)
 
         # Generate a trendline for profit slope calculation
-        trendline = np.linspace(profits.iloc[0], profits.iloc[-1], trade_count)
+        trendline = np.linspace(profits[0], profits[-1], ctx.trade_count)
 
         # Calculate the slope of the profit curve
         slope = np.polyfit(trendline, profits, 1)[0]
 
         # Calculate the final score using a combination of slope, profit, and max drawdown
-        return -1.0 * slope * np.log(trade_count) * np.log(profits.iloc[-1] / max_dd)
+        return (
+            -1.0
+            * slope
+            * np.log(ctx.trade_count)
+            * np.log(profits[-1] / ctx["slope_max_drawdown"])
+        )
+
+
+@register_metric("slope_max_drawdown")
+def _slope_max_drawdown(ctx: LossContext) -> float:
+    return ctx["max_drawdown"] or MIN_DRAWDOWN
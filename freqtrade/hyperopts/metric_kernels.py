@@ -0,0 +1,344 @@
+"""
+Shared NumPy kernels for hyperopt losses, pairlist filters and the dashboard.
+
+The functions in this module work on plain arrays so they can be used from
+any of the freqtrade entry points without copying or mutating DataFrames.
+
+The same file is linked into `freqtrade/plugins/` and `freqtrade/dashboard/`,
+copy it next to the loss, pairlist or dashboard file that imports it.
+"""
+import calendar
+
+import numpy as np
+
+SECONDS_PER_DAY = 86400
+
+
+def epoch_day(date) -> int:
+    """
+    Converts a single datetime into its day number since the epoch.
+
+    Parameters:
+    - date (datetime): Datetime, naive values are taken as UTC.
+
+    Returns:
+    - int: Day number.
+    """
+    return calendar.timegm(date.utctimetuple()) // SECONDS_PER_DAY
+
+
+def epoch_days(dates) -> np.ndarray:
+    """
+    Converts datetime-like values into integer day numbers since the epoch.
+
+    Parameters:
+    - dates (pd.Series | np.ndarray): Datetime values, timezone-aware values are taken as UTC.
+
+    Returns:
+    - np.ndarray: Day numbers as int64.
+    """
+    values = np.asarray(getattr(dates, "values", dates))
+    return values.astype("datetime64[D]").view("int64")
+
+
+def daily_sum(
+    values: np.ndarray, days: np.ndarray, start_day: int, n_days: int
+) -> np.ndarray:
+    """
+    Sums values into daily bins with `np.bincount`.
+
+    Values whose day falls outside `[start_day, start_day + n_days)` are dropped,
+    which matches resampling followed by a reindex on the same daily range.
+
+    Parameters:
+    - values (np.ndarray): Values to accumulate.
+    - days (np.ndarray): Day number of each value (see `epoch_days`).
+    - start_day (int): Day number of the first bin.
+    - n_days (int): Number of bins.
+
+    Returns:
+    - np.ndarray: Daily sums, zero for days without values.
+    """
+    offsets = days - start_day
+    mask = (offsets >= 0) & (offsets < n_days)
+    if not mask.all():
+        offsets = offsets[mask]
+        values = values[mask]
+    return np.bincount(offsets, weights=values, minlength=n_days)
+
+
+def stack_tail(arrays, length: int) -> np.ndarray:
+    """
+    Stacks the last `length` values of each array as the columns of a matrix.
+
+    Arrays shorter than `length` are padded with NaN at the start, so the last
+    rows of all columns are aligned.
+
+    Parameters:
+    - arrays (list): 1-D arrays, e.g. daily closes of each pair.
+    - length (int): Number of rows.
+
+    Returns:
+    - np.ndarray: Matrix of shape (length, len(arrays)).
+    """
+    matrix = np.full((length, len(arrays)), np.nan)
+    for col, values in enumerate(arrays):
+        tail = values[-length:]
+        if len(tail):
+            matrix[length - len(tail):, col] = tail
+    return matrix
+
+
+def trend_similarities(cum: np.ndarray) -> np.ndarray:
+    """
+    Column-wise `trend_similarity` of a matrix of cumulative curves.
+
+    NaN values are treated as missing, which allows curves of different lengths
+    padded at the start (see `stack_tail`).
+
+    Parameters:
+    - cum (np.ndarray): Matrix with one cumulative curve per column.
+
+    Returns:
+    - np.ndarray: Similarity of each column.
+    """
+    rows = cum.shape[0]
+    valid = ~np.isnan(cum)
+    values = np.where(valid, cum, 0.0)
+    idx = np.arange(rows, dtype=np.float64)[:, None] * valid
+
+    n = valid.sum(axis=0)
+    sum_i = idx.sum(axis=0)
+    sum_x = values.sum(axis=0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        cov = (idx * values).sum(axis=0) - sum_i * sum_x / n
+        var_i = (idx * idx).sum(axis=0) - sum_i * sum_i / n
+        var_x = (values * values).sum(axis=0) - sum_x * sum_x / n
+
+        first = values[valid.argmax(axis=0), np.arange(cum.shape[1])]
+        last = values[rows - 1 - valid[::-1].argmax(axis=0), np.arange(cum.shape[1])]
+        direction = np.sign(last - first)
+
+        similarity = direction * cov / np.sqrt(var_i * var_x)
+    similarity[(n < 2) | (direction == 0) | ~(var_x > 0)] = np.nan
+    return similarity
+
+
+def trend_similarity(cum: np.ndarray) -> float:
+    """
+    Cosine similarity between a cumulative curve and its first-to-last trendline.
+
+    Both series are standardized before the comparison, so the result equals the
+    Pearson correlation with `np.linspace(cum[0], cum[-1], len(cum))`. It is
+    computed in closed form from running sums instead of materializing the
+    trendline.
+
+    Parameters:
+    - cum (np.ndarray): Cumulative curve, e.g. cumulative returns.
+
+    Returns:
+    - float: Similarity in [-1, 1], NaN if either series is flat.
+    """
+    if len(cum) == 0:
+        return np.nan
+    return float(trend_similarities(np.asarray(cum, dtype=np.float64)[:, None])[0])
+
+
+def linear_slope(values: np.ndarray) -> float:
+    """
+    Slope of the least-squares line through `values` against their index.
+
+    Equivalent to `np.polyfit(range(len(values)), values, 1)[0]`.
+
+    Parameters:
+    - values (np.ndarray): Series to fit, e.g. an equity curve.
+
+    Returns:
+    - float: Slope per step, NaN for fewer than two values.
+    """
+    n = len(values)
+    if n < 2:
+        return np.nan
+    idx = np.arange(n, dtype=np.float64)
+    cov = np.dot(idx, values) - (n - 1) / 2.0 * values.sum()
+    return cov / (n * (n * n - 1) / 12.0)
+
+
+def sortino(returns: np.ndarray, axis: int = 0):
+    """
+    Ratio of mean return over downside deviation.
+
+    The downside deviation is the root mean square of the negative returns only.
+    The ratio is not annualized. NaN values are treated as missing.
+
+    Parameters:
+    - returns (np.ndarray): Returns, 2-D input holds one series per column.
+    - axis (int): Axis along which the series run.
+
+    Returns:
+    - float | np.ndarray: Sortino ratio, NaN where there are no negative returns.
+    """
+    valid = ~np.isnan(returns)
+    values = np.where(valid, returns, 0.0)
+    downside = np.minimum(values, 0.0)
+    n_downside = np.count_nonzero(downside, axis=axis)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        down_stdev = np.sqrt((downside * downside).sum(axis=axis) / n_downside)
+        return values.sum(axis=axis) / valid.sum(axis=axis) / down_stdev
+
+
+def stability(daily_returns: np.ndarray):
+    """
+    Calculates the stability of a daily return series.
+
+    Parameters:
+    - daily_returns (np.ndarray): Daily returns.
+
+    Returns:
+    - tuple: Final cumulative return and the trendline similarity of the equity curve.
+    """
+    cum = np.cumsum(daily_returns)
+    return cum[-1], trend_similarity(cum)
+
+
+def max_drawdown(profit_abs: np.ndarray, starting_balance: float = 0.0):
+    """
+    Calculates the maximum relative drawdown of a profit sequence.
+
+    Mirrors `freqtrade.data.metrics.calculate_max_drawdown(..., relative=True)` on
+    profits that are already ordered by close date. Leading dimensions are treated
+    as independent sequences, e.g. Monte Carlo simulations of shape (n_sims, n_trades).
+
+    Parameters:
+    - profit_abs (np.ndarray): Absolute profits, the last axis is the trade axis.
+    - starting_balance (float | np.ndarray): Starting balance used for the relative
+                                             drawdown, arrays broadcast against the
+                                             leading dimensions with a trailing axis.
+
+    Returns:
+    - tuple: Absolute drawdown at the point of maximum relative drawdown, and the
+             maximum relative drawdown. Both are zero if there is no drawdown.
+    """
+    if profit_abs.shape[-1] == 0:
+        raise ValueError("Trade dataframe empty.")
+
+    cum = np.cumsum(profit_abs, axis=-1)
+    high = np.maximum(np.maximum.accumulate(cum, axis=-1), 0)
+    drawdown = high - cum
+    with np.errstate(divide="ignore", invalid="ignore"):
+        relative = drawdown / (starting_balance + high)
+    relative = np.nan_to_num(relative, nan=0.0, posinf=np.inf)
+
+    idx = np.expand_dims(relative.argmax(axis=-1), -1)
+    drawdown_abs = np.take_along_axis(drawdown, idx, axis=-1)[..., 0]
+    drawdown_rel = np.maximum(np.take_along_axis(relative, idx, axis=-1)[..., 0], 0.0)
+    if drawdown_abs.ndim == 0:
+        return float(drawdown_abs), float(drawdown_rel)
+    return drawdown_abs, drawdown_rel
+
+
+def chunked_sqn(profit_ratio: np.ndarray, chunk_size: int = 100) -> float:
+    """
+    Calculates the mean System Quality Number (SQN) over fixed-size chunks of trades.
+
+    Trailing trades that do not fill a complete chunk are ignored, as are chunks
+    without any variance.
+
+    Parameters:
+    - profit_ratio (np.ndarray): Profit ratio of each trade.
+    - chunk_size (int): Number of trades per chunk.
+
+    Returns:
+    - float: Mean SQN of all valid chunks, zero if there are none.
+    """
+    num_chunks = len(profit_ratio) // chunk_size
+    reshaped = profit_ratio[: num_chunks * chunk_size].reshape(-1, chunk_size)
+    mean = reshaped.mean(axis=1)
+    std = reshaped.std(axis=1)
+    valid = std != 0
+    if not valid.any():
+        return 0.0
+    return float(np.mean(mean[valid] / std[valid]) * np.sqrt(chunk_size))
+
+
+def shuffled_max_drawdowns(
+    profit_abs: np.ndarray,
+    starting_balance: float,
+    permutations,
+    n_sims: int,
+    max_elements: int = 1 << 22,
+):
+    """
+    Monte Carlo maximum drawdowns of randomly reordered trade sequences.
+
+    Simulations are processed in chunks of at most `max_elements` values to
+    bound memory on large trade counts.
+
+    Parameters:
+    - profit_abs (np.ndarray): Absolute profit of each trade.
+    - starting_balance (float): Starting balance used for the relative drawdown.
+    - permutations (Callable): `permutations(start, stop)` returns the trade
+                               orderings of simulations `start:stop`.
+    - n_sims (int): Number of simulations.
+    - max_elements (int): Maximum number of values simulated at once.
+
+    Returns:
+    - tuple: Arrays of absolute and relative drawdowns, one value per simulation.
+    """
+    drawdown_abs = np.empty(n_sims)
+    drawdown_rel = np.empty(n_sims)
+    chunk = max(1, max_elements // max(1, len(profit_abs)))
+    for start in range(0, n_sims, chunk):
+        end = min(start + chunk, n_sims)
+        sims = profit_abs[permutations(start, end)]
+        drawdown_abs[start:end], drawdown_rel[start:end] = max_drawdown(
+            sims, starting_balance
+        )
+    return drawdown_abs, drawdown_rel
+
+
+def simulated_portfolios(
+    mean_returns: np.ndarray,
+    covariance: np.ndarray,
+    weights: np.ndarray,
+    n_iters: int,
+    n_sims: int,
+    init_balance: float,
+    normal,
+    max_elements: int = 1 << 22,
+) -> np.ndarray:
+    """
+    Monte Carlo balances of a weighted portfolio with correlated normal returns.
+
+    Each step the returns of the strategies are `mean_returns + L @ z`, with `L`
+    the Cholesky factor of `covariance` and `z` standard normal draws. Only the
+    weighted sum of the returns is kept, so the draws of all simulations are
+    projected at once on `L.T @ weights`. Simulations are processed in chunks of
+    at most `max_elements` draws to bound memory.
+
+    Parameters:
+    - mean_returns (np.ndarray): Mean return of each strategy.
+    - covariance (np.ndarray): Covariance matrix of the returns.
+    - weights (np.ndarray): Portfolio weight of each strategy.
+    - n_iters (int): Number of steps per simulation.
+    - n_sims (int): Number of simulations.
+    - init_balance (float): Starting balance.
+    - normal (Callable): `normal(size=shape)` returns standard normal draws, e.g.
+                         `np.random.normal`. Draws are taken simulation after
+                         simulation, like simulating them one at a time.
+    - max_elements (int): Maximum number of draws at once.
+
+    Returns:
+    - np.ndarray: Balances of shape (n_iters, n_sims).
+    """
+    n_strategies = len(weights)
+    loading = np.linalg.cholesky(covariance).T @ weights
+    drift = np.dot(mean_returns, weights)
+
+    portfolio = np.empty((n_iters, n_sims))
+    chunk = max(1, max_elements // max(1, n_iters * n_strategies))
+    for start in range(0, n_sims, chunk):
+        end = min(start + chunk, n_sims)
+        returns = normal(size=(end - start, n_iters, n_strategies)) @ loading + drift
+        portfolio[:, start:end] = (np.cumprod(returns + 1, axis=1) * init_balance).T
+    return portfolio
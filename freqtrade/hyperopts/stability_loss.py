@@ -1,12 +1,12 @@
 import numpy as np
 
 from datetime import datetime
-from pandas import DataFrame, date_range
+from pandas import DataFrame
 from freqtrade.constants import Config
 from freqtrade.optimize.hyperopt import IHyperOptLoss
+from metric_kernels import daily_sum, epoch_day, epoch_days, stability
 
 MAX_LOSS = 100000
-RESAMPLE_FREQ = "1D"
 SLIPPAGE_PER_TRADE_RATIO = 0.0005
 DAYS_IN_YEAR = 365
 MIN_ANNUAL_GROWTH_COEF = 1.0
@@ -14,31 +14,6 @@ MIN_PROFIT_MEAN = 0.01
 MIN_PROFIT_MEDIAN = 0.01
 
 
-def cosine_similarity(A, B):
-    """
-    Calculates the cosine similarity between two time-series datasets A and B.
-
-    Parameters:
-    - A, B (np.array): Input time-series datasets.
-
-    Returns:
-    - cosine_sim (float): The cosine similarity between A and B.
-    """
-    # Normalize the datasets
-    A_norm = (A - np.mean(A)) / np.std(A)
-    B_norm = (B - np.mean(B)) / np.std(B)
-
-    # Calculate dot product and norms
-    dot_product = np.dot(A_norm, B_norm)
-    norm_A = np.linalg.norm(A_norm)
-    norm_B = np.linalg.norm(B_norm)
-
-    # Calculate cosine similarity
-    cosine_sim = dot_product / (norm_A * norm_B)
-
-    return cosine_sim
-
-
 class StabilityLoss(IHyperOptLoss):
 
     @staticmethod
@@ -65,29 +40,20 @@ class StabilityLoss(IHyperOptLoss):
         if profit_mean < MIN_PROFIT_MEAN or profit_median < MIN_PROFIT_MEDIAN:
             return MAX_LOSS
 
-        t_index = date_range(
-            start=min_date, end=max_date, freq=RESAMPLE_FREQ, normalize=True
+        # Bin trade profits (after slippage) into daily offsets from min_date
+        start_day = epoch_day(min_date)
+        n_days = epoch_day(max_date) - start_day + 1
+        sum_daily = daily_sum(
+            results["profit_ratio"].to_numpy(dtype=np.float64) - SLIPPAGE_PER_TRADE_RATIO,
+            epoch_days(results["close_date"]),
+            start_day,
+            n_days,
         )
 
-        # Adjust profits for slippage and resample to daily
-        results["profit_ratio_after_slippage"] = (
-            results["profit_ratio"] - SLIPPAGE_PER_TRADE_RATIO
-        )
-
-        sum_daily = (
-            results.resample(RESAMPLE_FREQ, on="close_date")
-            .agg({"profit_ratio_after_slippage": "sum"})
-            .reindex(t_index)
-            .fillna(0)
-        )
-
-        # Calculate cumulative returns and linear trend
-        returns = sum_daily["profit_ratio_after_slippage"].cumsum()
-        trendline = np.linspace(returns.iloc[0], returns.iloc[-1], len(returns))
-
-        # Compute cosine similarity with the trendline
-        similarity = cosine_similarity(trendline, returns)
-        score = np.log(returns.iloc[-1]) * similarity
+        # Compare cumulative returns with their linear trend
+        final_return, similarity = stability(sum_daily)
 
         # Apply penalty for net losses, otherwise return negative stability score
-        return MAX_LOSS if returns.iloc[-1] <= 0 else -score
+        if final_return <= 0:
+            return MAX_LOSS
+        return -np.log(final_return) * similarity
@@ -0,0 +1,329 @@
+"""
+Metric pairlist filter
+"""
+import logging
+from datetime import datetime, timedelta
+from functools import cached_property
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from freqtrade.constants import Config, ListPairsWithTimeframes
+from freqtrade.exceptions import OperationalException
+from freqtrade.exchange.types import Tickers
+from freqtrade.misc import plural
+from freqtrade.plugins.pairlist.IPairList import IPairList, PairlistParameter
+from freqtrade.plugins.pairlist.metric_kernels import sortino, stack_tail, trend_similarities
+from freqtrade.plugins.pairlist.pair_score_cache import PairScoreCache
+from freqtrade.util import dt_floor_day, dt_now, dt_ts
+
+
+logger = logging.getLogger(__name__)
+
+
+class PairWindow:
+    """
+    Daily closes of all scored pairs over the lookback window.
+
+    Rows are days, columns are pairs. Days before the first candle of a pair
+    are NaN, and every metric treats NaN as missing.
+    """
+
+    def __init__(self, closes: List[np.ndarray], days: int) -> None:
+        self.days = days
+        self.close = stack_tail(closes, days + 1)
+
+    @cached_property
+    def returns(self) -> np.ndarray:
+        return self.close[1:] / self.close[:-1] - 1
+
+    @cached_property
+    def cum_returns(self) -> np.ndarray:
+        cum = np.cumsum(np.nan_to_num(self.returns), axis=0)
+        cum[np.isnan(self.returns)] = np.nan
+        return cum
+
+    @cached_property
+    def returns_mean(self) -> np.ndarray:
+        valid = ~np.isnan(self.returns)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(valid, self.returns, 0.0).sum(axis=0) / valid.sum(axis=0)
+
+    @cached_property
+    def returns_std(self) -> np.ndarray:
+        valid = ~np.isnan(self.returns)
+        deviation = np.where(valid, self.returns - self.returns_mean, 0.0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.sqrt((deviation * deviation).sum(axis=0) / (valid.sum(axis=0) - 1))
+
+    @cached_property
+    def first_close(self) -> np.ndarray:
+        return self.close[np.isnan(self.close).argmin(axis=0), np.arange(self.close.shape[1])]
+
+
+PAIR_METRICS: Dict[str, Callable[[PairWindow], np.ndarray]] = {}
+
+
+def register_pair_metric(name: str):
+    """Registers a function of `PairWindow` returning one value per pair."""
+
+    def decorator(func):
+        PAIR_METRICS[name] = func
+        return func
+
+    return decorator
+
+
+@register_pair_metric("roc")
+def _roc(window: PairWindow) -> np.ndarray:
+    """Rate of change over the window."""
+    return window.close[-1] / window.first_close - 1
+
+
+@register_pair_metric("volatility")
+def _volatility(window: PairWindow) -> np.ndarray:
+    return window.returns_std * np.sqrt(window.days)
+
+
+@register_pair_metric("sharpe")
+def _sharpe(window: PairWindow) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return window.returns_mean / window.returns_std * np.sqrt(window.days)
+
+
+@register_pair_metric("sortino")
+def _sortino(window: PairWindow) -> np.ndarray:
+    return sortino(window.returns) * np.sqrt(window.days)
+
+
+@register_pair_metric("max_drawdown")
+def _max_drawdown(window: PairWindow) -> np.ndarray:
+    """Largest relative drop of the close from its running high."""
+    high = np.fmax.accumulate(window.close, axis=0)
+    return np.nanmax(1 - window.close / high, axis=0)
+
+
+@register_pair_metric("calmar")
+def _calmar(window: PairWindow) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return _roc(window) / _max_drawdown(window)
+
+
+@register_pair_metric("stability")
+def _stability(window: PairWindow) -> np.ndarray:
+    return trend_similarities(window.cum_returns)
+
+
+# Metrics of a pair relative to the other pairs, by the pair metric they derive from.
+CROSS_SECTIONAL_METRICS: Dict[str, Tuple[str, Callable[[np.ndarray], np.ndarray]]] = {}
+
+
+def register_cross_sectional_metric(name: str, metric: str):
+    """
+    Registers a function of the `metric` values of all pairs returning one value
+    per pair. Unlike pair metrics they are not cached per pair, but computed over
+    the whole pairlist on every refresh.
+    """
+
+    def decorator(func):
+        CROSS_SECTIONAL_METRICS[name] = (metric, func)
+        return func
+
+    return decorator
+
+
+@register_cross_sectional_metric("roc_rank", "roc")
+def _roc_rank(roc: np.ndarray) -> np.ndarray:
+    """Percentile rank of the rate of change among all pairs, 1 is the best."""
+    roc = np.nan_to_num(roc, nan=-np.inf)
+    if len(roc) < 2:
+        return np.ones_like(roc)
+    return roc.argsort().argsort() / (len(roc) - 1)
+
+
+class MetricFilter(IPairList):
+    """
+    Filters and sorts pairs by a weighted set of metrics of their daily candles
+    """
+
+    def __init__(self, exchange, pairlistmanager,
+                 config: Config, pairlistconfig: Dict[str, Any],
+                 pairlist_pos: int) -> None:
+        super().__init__(exchange, pairlistmanager, config, pairlistconfig, pairlist_pos)
+
+        self._days = pairlistconfig.get('lookback_days', 10)
+        self._metrics: List[Dict[str, Any]] = pairlistconfig.get('metrics', [])
+        self._refresh_period = pairlistconfig.get('refresh_period', 1440)
+        self._def_candletype = self._config['candle_type_def']
+        self._sort_direction: Optional[str] = pairlistconfig.get('sort_direction', None)
+
+        self._pair_cache = PairScoreCache(maxsize=1000, ttl=self._refresh_period)
+
+        candle_limit = exchange.ohlcv_candle_limit('1d', self._config['candle_type_def'])
+        if self._days < 1:
+            raise OperationalException("MetricFilter requires lookback_days to be >= 1")
+        if self._days > candle_limit:
+            raise OperationalException("MetricFilter requires lookback_days to not "
+                                       f"exceed exchange max request size ({candle_limit})")
+        if self._sort_direction not in [None, 'asc', 'desc']:
+            raise OperationalException("MetricFilter requires sort_direction to be "
+                                       "either None (undefined), 'asc' or 'desc'")
+        if not self._metrics:
+            raise OperationalException("MetricFilter requires at least one metric")
+        available = {**PAIR_METRICS, **CROSS_SECTIONAL_METRICS}
+        for metric in self._metrics:
+            if metric.get('metric') not in available:
+                raise OperationalException(
+                    f"MetricFilter: unknown metric '{metric.get('metric')}', "
+                    f"available metrics: {', '.join(sorted(available))}")
+
+    @property
+    def needstickers(self) -> bool:
+        """
+        Boolean property defining if tickers are necessary.
+        If no Pairlist requires tickers, an empty List is passed
+        as tickers argument to filter_pairlist
+        """
+        return False
+
+    def short_desc(self) -> str:
+        """
+        Short whitelist method description - used for startup-messages
+        """
+        names = ", ".join(m['metric'] for m in self._metrics)
+        return (f"{self.name} - Filtering pairs by {names} "
+                f"over the last {self._days} {plural(self._days, 'day')}.")
+
+    @staticmethod
+    def description() -> str:
+        return "Filter and sort pairs by metrics of their recent daily candles."
+
+    @staticmethod
+    def available_parameters() -> Dict[str, PairlistParameter]:
+        return {
+            "lookback_days": {
+                "type": "number",
+                "default": 10,
+                "description": "Lookback Days",
+                "help": "Number of days to look back at.",
+            },
+            "sort_direction": {
+                "type": "option",
+                "default": None,
+                "options": ["", "asc", "desc"],
+                "description": "Sort pairlist",
+                "help": "Sort Pairlist ascending or descending by the weighted metric score.",
+            },
+            **IPairList.refresh_period_parameter()
+        }
+
+    def filter_pairlist(self, pairlist: List[str], tickers: Tickers) -> List[str]:
+        """
+        Validate the metrics of each pair and sort by their weighted score
+        :param pairlist: pairlist to filter or sort
+        :param tickers: Tickers (from exchange.get_tickers). May be cached.
+        :return: new allowlist
+        """
+        needed_pairs: ListPairsWithTimeframes = [
+            (p, '1d', self._def_candletype) for p in pairlist if p not in self._pair_cache]
+
+        since_ms = dt_ts(dt_floor_day(dt_now()) - timedelta(days=self._days))
+        candles = self._exchange.refresh_ohlcv_with_cache(needed_pairs, since_ms=since_ms)
+
+        pair_metrics = self._calculate_metrics(pairlist, candles)
+
+        resulting_pairlist: List[str] = []
+        scores: Dict[str, float] = {}
+        for p in pairlist:
+            values = pair_metrics.get(p)
+
+            if values is not None:
+                if self._validate_pair_loc(p, values):
+                    resulting_pairlist.append(p)
+                    score = sum(m.get('weight', 1.0) * values[m['metric']] for m in self._metrics)
+                    scores[p] = score if not np.isnan(score) else 0
+            else:
+                self.log_once(f"Removed {p} from whitelist, no candles found.", logger.info)
+
+        if self._sort_direction:
+            resulting_pairlist = sorted(resulting_pairlist,
+                                        key=lambda p: scores[p],
+                                        reverse=self._sort_direction == 'desc')
+        return resulting_pairlist
+
+    def _calculate_metrics(self, pairlist: List[str],
+                           candles: Dict) -> Dict[str, Dict[str, float]]:
+        """
+        Calculates all configured metrics of all pairs in one vectorized pass.
+        Pair metrics are cached per pair, cross-sectional metrics are computed
+        from them over the whole pairlist.
+        :param pairlist: pairs to score
+        :param candles: daily candles of the pairs that are not cached
+        :return: metric values per pair, pairs without candles are left out
+        """
+        configured = list(dict.fromkeys(m['metric'] for m in self._metrics))
+        cross_sectional = [name for name in configured if name in CROSS_SECTIONAL_METRICS]
+        names = list(dict.fromkeys(
+            [name for name in configured if name in PAIR_METRICS]
+            + [CROSS_SECTIONAL_METRICS[name][0] for name in cross_sectional]
+        ))
+
+        pair_metrics: Dict[str, Dict[str, float]] = {}
+        pairs: List[str] = []
+        closes: List[np.ndarray] = []
+        candle_dates: List[datetime] = []
+        for p in pairlist:
+            if (values := self._pair_cache.get(p)) is not None:
+                pair_metrics[p] = values
+                continue
+
+            daily_candles = candles.get((p, '1d', self._def_candletype), None)
+            if daily_candles is not None and not daily_candles.empty:
+                pairs.append(p)
+                closes.append(daily_candles["close"].to_numpy(dtype=np.float64))
+                candle_dates.append(daily_candles["date"].iloc[-1])
+
+        if pairs:
+            window = PairWindow(closes, self._days)
+            columns = {name: PAIR_METRICS[name](window).tolist() for name in names}
+            for i, (p, candle_date) in enumerate(zip(pairs, candle_dates)):
+                pair_metrics[p] = {name: columns[name][i] for name in names}
+                self._pair_cache.set(p, pair_metrics[p], candle_date)
+
+        if cross_sectional and pair_metrics:
+            scored = list(pair_metrics)
+            for name in cross_sectional:
+                metric, func = CROSS_SECTIONAL_METRICS[name]
+                values = func(np.array([pair_metrics[p][metric] for p in scored],
+                                       dtype=np.float64)).tolist()
+                for p, value in zip(scored, values):
+                    # Copies, the cached values stay pair metrics only.
+                    pair_metrics[p] = {**pair_metrics[p], name: value}
+
+        logger.debug(f"{self.name} scored {len(pairs)} {plural(len(pairs), 'pair')}, "
+                     f"{self._pair_cache}")
+        return pair_metrics
+
+    def _validate_pair_loc(self, pair: str, values: Dict[str, float]) -> bool:
+        """
+        Validate the metric thresholds
+        :param pair: Pair that's currently validated
+        :param values: Metric values of the pair
+        :return: True if the pair can stay, false if it should be removed
+        """
+        for metric in self._metrics:
+            name = metric['metric']
+            value = values[name]
+            if 'min' in metric and not metric['min'] <= value:
+                bound = f"minimum {metric['min']}"
+            elif 'max' in metric and not value <= metric['max']:
+                bound = f"maximum {metric['max']}"
+            else:
+                continue
+            self.log_once(f"Removed {pair} from whitelist, because {name} "
+                          f"under {self._days} {plural(self._days, 'day')} "
+                          f"is: {value:.3f} "
+                          f"which is not in the configured {bound}.",
+                          logger.info)
+            return False
+        return True
@@ -7,14 +7,15 @@ from datetime import timedelta
 from typing import Any, Dict, List, Optional
 
 import numpy as np
-from cachetools import TTLCache
-from pandas import DataFrame
+from pandas import Series
 
 from freqtrade.constants import Config, ListPairsWithTimeframes
 from freqtrade.exceptions import OperationalException
 from freqtrade.exchange.types import Tickers
 from freqtrade.misc import plural
 from freqtrade.plugins.pairlist.IPairList import IPairList, PairlistParameter
+from freqtrade.plugins.pairlist.pair_score_cache import PairScoreCache
+from freqtrade.plugins.pairlist.rolling_returns import RollingReturns
 from freqtrade.util import dt_floor_day, dt_now, dt_ts
 
 
@@ -37,7 +38,8 @@ class SortinoFilter(IPairList):
         self._def_candletype = self._config['candle_type_def']
         self._sort_direction: Optional[str] = pairlistconfig.get('sort_direction', None)
 
-        self._pair_cache: TTLCache = TTLCache(maxsize=1000, ttl=self._refresh_period)
+        self._pair_cache = PairScoreCache(maxsize=1000, ttl=self._refresh_period)
+        self._rolling = RollingReturns(self._days)
 
         candle_limit = exchange.ohlcv_candle_limit('1d', self._config['candle_type_def'])
         if self._days < 1:
@@ -108,17 +110,17 @@ class SortinoFilter(IPairList):
         since_ms = dt_ts(dt_floor_day(dt_now()) - timedelta(days=self._days))
         candles = self._exchange.refresh_ohlcv_with_cache(needed_pairs, since_ms=since_ms)
 
+        sortino_ratios = self._calculate_sortino(pairlist, candles)
+
         resulting_pairlist: List[str] = []
-        sortino: Dict[str, float] = {}
+        sort_keys: Dict[str, float] = {}
         for p in pairlist:
-            daily_candles = candles.get((p, '1d', self._def_candletype), None)
-
-            sortino_ratio = self._calculate_sortino(p, daily_candles)
+            sortino_ratio = sortino_ratios.get(p)
 
             if sortino_ratio is not None:
                 if self._validate_pair_loc(p, sortino_ratio):
                     resulting_pairlist.append(p)
-                    sortino[p] = (
+                    sort_keys[p] = (
                         sortino_ratio if sortino_ratio and not np.isnan(sortino_ratio) else 0
                     )
             else:
@@ -126,31 +128,44 @@ class SortinoFilter(IPairList):
 
         if self._sort_direction:
             resulting_pairlist = sorted(resulting_pairlist,
-                                        key=lambda p: sortino[p],
+                                        key=lambda p: sort_keys[p],
                                         reverse=self._sort_direction == 'desc')
         return resulting_pairlist
 
-    def _calculate_sortino(self, pair: str,  daily_candles: DataFrame) -> Optional[float]:
-        if (sortino_ratio := self._pair_cache.get(pair, None)) is not None:
-            return sortino_ratio
-
-        if daily_candles is not None and not daily_candles.empty:
-            returns = (daily_candles["close"].shift(1) / daily_candles["close"]) - 1
-            returns.fillna(0, inplace=True)
-
-            returns = returns.iloc[-self._days:]
-            expected_returns_mean = returns.mean()
-            total_downside = returns.loc[returns < 0]
-            down_stdev = np.sqrt((total_downside**2).sum() / len(total_downside))
+    def _calculate_sortino(self, pairlist: List[str], candles: Dict) -> Dict[str, float]:
+        """
+        Calculates the sortino ratio of all pairs from their rolling windows, only
+        candles closed since the last refresh are folded in.
+        :param pairlist: pairs to score
+        :param candles: daily candles of the pairs that are not cached
+        :return: sortino ratio per pair, pairs without candles are left out
+        """
+        sortino_ratios: Dict[str, float] = {}
+        pairs: List[str] = []
+        closes: List[np.ndarray] = []
+        dates: List[Series] = []
+        for p in pairlist:
+            if (sortino_ratio := self._pair_cache.get(p)) is not None:
+                sortino_ratios[p] = sortino_ratio
+                continue
 
-            if down_stdev != 0:
-                sortino_ratio = expected_returns_mean / down_stdev * np.sqrt(self._days)
-            else:
-                # Define high (negative) sortino ratio to be clear that this is NOT optimal.
-                sortino_ratio = -20.0
-            return sortino_ratio
-        else:
-            return None
+            daily_candles = candles.get((p, '1d', self._def_candletype), None)
+            if daily_candles is not None and not daily_candles.empty:
+                pairs.append(p)
+                closes.append(daily_candles["close"].to_numpy(dtype=np.float64))
+                dates.append(daily_candles["date"])
+
+        if pairs:
+            rows = self._rolling.update(pairs, dates, closes)
+            # NaN for pairs without negative returns, their downside is undefined.
+            ratios = self._rolling.sortino(rows) * np.sqrt(self._days)
+            for p, sortino_ratio, pair_dates in zip(pairs, ratios.tolist(), dates):
+                sortino_ratios[p] = sortino_ratio
+                self._pair_cache.set(p, sortino_ratio, pair_dates.iloc[-1])
+
+        logger.debug(f"{self.name} scored {len(pairs)} {plural(len(pairs), 'pair')}, "
+                     f"{self._pair_cache}")
+        return sortino_ratios
 
     def _validate_pair_loc(self, pair: str, sortino_ratio: float) -> bool:
         """
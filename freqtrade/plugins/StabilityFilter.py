@@ -7,14 +7,15 @@ from datetime import timedelta
 from typing import Any, Dict, List, Optional
 
 import numpy as np
-from cachetools import TTLCache
-from pandas import DataFrame
+from pandas import Series
 
 from freqtrade.constants import Config, ListPairsWithTimeframes
 from freqtrade.exceptions import OperationalException
 from freqtrade.exchange.types import Tickers
 from freqtrade.misc import plural
 from freqtrade.plugins.pairlist.IPairList import IPairList, PairlistParameter
+from freqtrade.plugins.pairlist.pair_score_cache import PairScoreCache
+from freqtrade.plugins.pairlist.rolling_returns import RollingReturns
 from freqtrade.util import dt_floor_day, dt_now, dt_ts
 
 
@@ -37,7 +38,8 @@ class StabilityFilter(IPairList):
         self._def_candletype = self._config['candle_type_def']
         self._sort_direction: Optional[str] = pairlistconfig.get('sort_direction', None)
 
-        self._pair_cache: TTLCache = TTLCache(maxsize=1000, ttl=self._refresh_period)
+        self._pair_cache = PairScoreCache(maxsize=1000, ttl=self._refresh_period)
+        self._rolling = RollingReturns(self._days)
 
         candle_limit = exchange.ohlcv_candle_limit('1d', self._config['candle_type_def'])
         if self._days < 1:
@@ -108,17 +110,17 @@ class StabilityFilter(IPairList):
         since_ms = dt_ts(dt_floor_day(dt_now()) - timedelta(days=self._days))
         candles = self._exchange.refresh_ohlcv_with_cache(needed_pairs, since_ms=since_ms)
 
+        stability_scores = self._calculate_stability(pairlist, candles)
+
         resulting_pairlist: List[str] = []
-        sortino: Dict[str, float] = {}
+        sort_keys: Dict[str, float] = {}
         for p in pairlist:
-            daily_candles = candles.get((p, '1d', self._def_candletype), None)
-
-            stability_score = self._calculate_stability(p, daily_candles)
+            stability_score = stability_scores.get(p)
 
             if stability_score is not None:
                 if self._validate_pair_loc(p, stability_score):
                     resulting_pairlist.append(p)
-                    sortino[p] = (
+                    sort_keys[p] = (
                         stability_score if stability_score and not np.isnan(stability_score) else 0
                     )
             else:
@@ -126,36 +128,43 @@ class StabilityFilter(IPairList):
 
         if self._sort_direction:
             resulting_pairlist = sorted(resulting_pairlist,
-                                        key=lambda p: sortino[p],
+                                        key=lambda p: sort_keys[p],
                                         reverse=self._sort_direction == 'desc')
         return resulting_pairlist
 
-    def _calculate_stability(self, pair: str,  daily_candles: DataFrame) -> Optional[float]:
-        def cosine_similarity(A, B):
-            A_norm = (A - np.mean(A)) / np.std(A)
-            B_norm = (B - np.mean(B)) / np.std(B)
-
-            dot_product = np.dot(A_norm, B_norm)
-
-            norm_A = np.linalg.norm(A_norm)
-            norm_B = np.linalg.norm(B_norm)
-
-            return dot_product / (norm_A * norm_B)
-
-        if (stability_score := self._pair_cache.get(pair, None)) is not None:
-            return stability_score
-
-        if daily_candles is not None and not daily_candles.empty:
-            returns = (daily_candles["close"].shift(1) / daily_candles["close"]) - 1
-            returns.fillna(0, inplace=True)
-
-            returns = returns.cumsum().iloc[-self._days:]
-            trendline = np.linspace(returns.iloc[0], returns.iloc[-1], len(returns))
-            stability_score = cosine_similarity(trendline, returns)
+    def _calculate_stability(self, pairlist: List[str], candles: Dict) -> Dict[str, float]:
+        """
+        Calculates the stability score of all pairs from their rolling windows, only
+        candles closed since the last refresh are folded in.
+        :param pairlist: pairs to score
+        :param candles: daily candles of the pairs that are not cached
+        :return: stability score per pair, pairs without candles are left out
+        """
+        stability_scores: Dict[str, float] = {}
+        pairs: List[str] = []
+        closes: List[np.ndarray] = []
+        dates: List[Series] = []
+        for p in pairlist:
+            if (stability_score := self._pair_cache.get(p)) is not None:
+                stability_scores[p] = stability_score
+                continue
 
-            return stability_score
-        else:
-            return None
+            daily_candles = candles.get((p, '1d', self._def_candletype), None)
+            if daily_candles is not None and not daily_candles.empty:
+                pairs.append(p)
+                closes.append(daily_candles["close"].to_numpy(dtype=np.float64))
+                dates.append(daily_candles["date"])
+
+        if pairs:
+            rows = self._rolling.update(pairs, dates, closes)
+            scores = self._rolling.stability(rows)
+            for p, stability_score, pair_dates in zip(pairs, scores.tolist(), dates):
+                stability_scores[p] = stability_score
+                self._pair_cache.set(p, stability_score, pair_dates.iloc[-1])
+
+        logger.debug(f"{self.name} scored {len(pairs)} {plural(len(pairs), 'pair')}, "
+                     f"{self._pair_cache}")
+        return stability_scores
 
     def _validate_pair_loc(self, pair: str, stability_score: float) -> bool:
         """
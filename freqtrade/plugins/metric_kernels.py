@@ -0,0 +1 @@
+../hyperopts/metric_kernels.py
\ No newline at end of file
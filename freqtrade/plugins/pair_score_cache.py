@@ -0,0 +1,76 @@
+"""
+Score cache for pairlist filters
+"""
+from datetime import datetime, timedelta
+from typing import Any, NamedTuple, Optional
+
+from cachetools import TTLCache
+
+from freqtrade.exchange import timeframe_to_prev_date, timeframe_to_seconds
+from freqtrade.util import dt_now
+
+
+class CachedScore(NamedTuple):
+    score: Any
+    candle_date: datetime
+
+
+class PairScoreCache:
+    """
+    Scores of pairs computed from candles of a single timeframe.
+
+    A score is stored together with the date of the last candle it was computed
+    from, and stays valid until a newer candle has closed or `ttl` seconds passed.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: int = 86400, timeframe: str = '1d') -> None:
+        self._entries: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._timeframe = timeframe
+        self.hits = 0
+        self.misses = 0
+
+    def last_closed_candle(self) -> datetime:
+        """
+        Open date of the most recent closed candle.
+        """
+        return (timeframe_to_prev_date(self._timeframe, dt_now())
+                - timedelta(seconds=timeframe_to_seconds(self._timeframe)))
+
+    def _lookup(self, pair: str) -> Optional[CachedScore]:
+        entry = self._entries.get(pair, None)
+        if entry is not None and entry.candle_date < self.last_closed_candle():
+            del self._entries[pair]
+            return None
+        return entry
+
+    def __contains__(self, pair: str) -> bool:
+        return self._lookup(pair) is not None
+
+    def get(self, pair: str) -> Optional[Any]:
+        """
+        Returns the cached score of a pair, None if missing or outdated.
+        :param pair: Pair to look up
+        :return: Score or None
+        """
+        entry = self._lookup(pair)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return entry.score
+
+    def set(self, pair: str, score: Any, candle_date: datetime) -> None:
+        """
+        Stores the score of a pair.
+        :param pair: Pair the score belongs to
+        :param score: Computed score, or the values of several metrics
+        :param candle_date: Open date of the last candle used to compute the score
+        """
+        self._entries[pair] = CachedScore(score, candle_date)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __repr__(self) -> str:
+        return (f"{self.__class__.__name__}({len(self)} pairs, "
+                f"hits: {self.hits}, misses: {self.misses})")
@@ -0,0 +1,204 @@
+"""
+Rolling daily return statistics for pairlist filters
+"""
+from typing import Dict, List
+
+import numpy as np
+
+from freqtrade.plugins.pairlist.metric_kernels import epoch_days
+
+# Per pair arrays: dtype and value of an empty row.
+_FIELDS = {
+    "_last_day": (np.int64, -1),  # Epoch day of the last folded candle
+    "_last_close": (np.float64, np.nan),
+    "_t": (np.int64, -1),  # Time step of the newest return
+    "_count": (np.int64, 0),  # Returns in the window
+    "_folds": (np.int64, 0),  # Folds since the sums were recomputed
+    "_cum": (np.float64, 0.0),  # Newest cumulative return
+    "_sum_r": (np.float64, 0.0),
+    "_sum_down_sq": (np.float64, 0.0),
+    "_n_down": (np.int64, 0),
+    "_sum_c": (np.float64, 0.0),
+    "_sum_c2": (np.float64, 0.0),
+    "_sum_tc": (np.float64, 0.0),
+    "_ring_r": (np.float64, 0.0),  # Returns of the window, at position t % days
+    "_ring_c": (np.float64, 0.0),  # Cumulative returns of the window
+}
+_RING_FIELDS = ("_ring_r", "_ring_c")
+
+
+class RollingReturns:
+    """
+    Running sums of the daily returns of many pairs over the last `days` days.
+
+    Returns are previous close over close, the first return of a pair is 0,
+    like the filters computed them from scratch. Every pair keeps a ring buffer
+    of its window, so folding in a new candle and dropping the expired one
+    costs O(1) per pair, vectorized over all pairs with new candles.
+
+    Kept per pair: sum of returns, sum of squared negative returns and their
+    count for the sortino ratio, and the regression terms of the cumulative
+    returns against time for the stability score.
+    """
+
+    def __init__(self, days: int) -> None:
+        self._days = days
+        self._rows: Dict[str, int] = {}
+        self._capacity = 0
+        self._allocate(64)
+
+    def _allocate(self, capacity: int) -> None:
+        """Grows the per pair arrays to `capacity` rows."""
+        for name, (dtype, fill) in _FIELDS.items():
+            shape = (capacity, self._days) if name in _RING_FIELDS else (capacity,)
+            values = np.full(shape, fill, dtype=dtype)
+            values[:self._capacity] = getattr(self, name, values[:0])
+            setattr(self, name, values)
+        self._capacity = capacity
+
+    def _row(self, pair: str) -> int:
+        if pair not in self._rows:
+            if len(self._rows) == self._capacity:
+                self._allocate(2 * self._capacity)
+            self._rows[pair] = len(self._rows)
+        return self._rows[pair]
+
+    def _reset(self, row: int) -> None:
+        for name, (_, fill) in _FIELDS.items():
+            getattr(self, name)[row] = fill
+
+    def update(self, pairs: List[str], dates: List, closes: List[np.ndarray]) -> np.ndarray:
+        """
+        Folds the candles after the last seen candle of every pair into its window.
+        Pairs that are new, or whose last seen candle is missing from the data
+        (e.g. after a gap), are rebuilt from their last `days` + 1 candles.
+        :param pairs: pairs to update
+        :param dates: candle dates of each pair
+        :param closes: candle closes of each pair
+        :return: rows of the pairs, to pass to the statistics
+        """
+        rows = np.empty(len(pairs), dtype=np.intp)
+        pending: List[tuple] = []
+        for i, (pair, pair_dates, pair_closes) in enumerate(zip(pairs, dates, closes)):
+            row = rows[i] = self._row(pair)
+            candle_days = epoch_days(pair_dates)
+            start = np.searchsorted(candle_days, self._last_day[row])
+            if (self._last_day[row] < 0 or start == len(candle_days)
+                    or candle_days[start] != self._last_day[row]):
+                self._reset(row)
+                start = max(0, len(candle_days) - self._days - 1)
+            else:
+                start += 1
+            if start < len(candle_days):
+                pending.append((row, candle_days[start:], pair_closes[start:]))
+
+        steps = max((len(d) for _, d, _ in pending), default=0)
+        for step in range(steps):
+            batch = [(row, d[step], c[step]) for row, d, c in pending if step < len(d)]
+            self._fold(*map(np.array, zip(*batch)))
+
+        resum = rows[self._folds[rows] >= self._days]
+        if len(resum):
+            self._resum(resum)
+        return rows
+
+    def _fold(self, rows: np.ndarray, days: np.ndarray, close: np.ndarray) -> None:
+        """Appends one candle to each row and drops the expired return."""
+        first = self._t[rows] < 0
+        r = np.where(first, 0.0, self._last_close[rows] / close - 1)
+        t = self._t[rows] + 1
+        pos = t % self._days
+
+        full = self._count[rows] == self._days
+        drop_r = np.where(full, self._ring_r[rows, pos], 0.0)
+        drop_c = np.where(full, self._ring_c[rows, pos], 0.0)
+        drop_down = np.minimum(drop_r, 0.0)
+        self._sum_r[rows] -= drop_r
+        self._sum_down_sq[rows] -= drop_down * drop_down
+        self._n_down[rows] -= drop_down < 0
+        self._sum_c[rows] -= drop_c
+        self._sum_c2[rows] -= drop_c * drop_c
+        self._sum_tc[rows] -= (t - self._days) * drop_c
+
+        cum = self._cum[rows] + r
+        down = np.minimum(r, 0.0)
+        self._sum_r[rows] += r
+        self._sum_down_sq[rows] += down * down
+        self._n_down[rows] += down < 0
+        self._sum_c[rows] += cum
+        self._sum_c2[rows] += cum * cum
+        self._sum_tc[rows] += t * cum
+
+        self._ring_r[rows, pos] = r
+        self._ring_c[rows, pos] = cum
+        self._count[rows] += ~full
+        self._folds[rows] += 1
+        self._cum[rows] = cum
+        self._t[rows] = t
+        self._last_day[rows] = days
+        self._last_close[rows] = close
+
+    def _resum(self, rows: np.ndarray) -> None:
+        """
+        Recomputes the sums of the rows from their ring buffers, rebasing time and
+        cumulative returns to the start of the window. Called once every `days`
+        folds, this bounds the rounding drift of the running sums.
+        """
+        t, count = self._t[rows], self._count[rows]
+        pos = np.arange(self._days)
+        age = (t[:, None] - pos) % self._days
+        valid = age < count[:, None]
+
+        oldest = valid & (age == count[:, None] - 1)
+        offset = np.where(oldest, self._ring_c[rows], 0.0).sum(axis=1)
+        shift = (t - count + 1) // self._days * self._days
+        ring_c = np.where(valid, self._ring_c[rows] - offset[:, None], 0.0)
+        ring_r = np.where(valid, self._ring_r[rows], 0.0)
+        step = np.where(valid, (t - shift)[:, None] - age, 0)
+        down = np.minimum(ring_r, 0.0)
+
+        self._ring_c[rows] = ring_c
+        self._cum[rows] -= offset
+        self._t[rows] = t - shift
+        self._sum_r[rows] = ring_r.sum(axis=1)
+        self._sum_down_sq[rows] = (down * down).sum(axis=1)
+        self._n_down[rows] = (down < 0).sum(axis=1)
+        self._sum_c[rows] = ring_c.sum(axis=1)
+        self._sum_c2[rows] = (ring_c * ring_c).sum(axis=1)
+        self._sum_tc[rows] = (step * ring_c).sum(axis=1)
+        self._folds[rows] = 0
+
+    def sortino(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Mean return over downside deviation of the windows, not annualized.
+        :param rows: rows returned by `update`
+        :return: sortino ratio per row, NaN without negative returns
+        """
+        n_down = self._n_down[rows]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            # The running sum of squares may keep a rounding residue after the
+            # last negative return expired, rely on the count instead.
+            down_stdev = np.where(n_down > 0, np.sqrt(self._sum_down_sq[rows] / n_down), np.nan)
+            return self._sum_r[rows] / self._count[rows] / down_stdev
+
+    def stability(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Trendline similarity of the cumulative returns of the windows
+        (see `metric_kernels.trend_similarity`).
+        :param rows: rows returned by `update`
+        :return: stability score per row
+        """
+        n = self._count[rows].astype(np.float64)
+        t = self._t[rows]
+        first_c = self._ring_c[rows, (t - self._count[rows] + 1) % self._days]
+        direction = np.sign(self._cum[rows] - first_c)
+
+        sum_c = self._sum_c[rows]
+        sum_t = n * (2 * t - n + 1) / 2
+        with np.errstate(divide="ignore", invalid="ignore"):
+            cov = self._sum_tc[rows] - sum_t * sum_c / n
+            var_t = n * (n * n - 1) / 12
+            var_c = self._sum_c2[rows] - sum_c * sum_c / n
+            similarity = direction * cov / np.sqrt(var_t * var_c)
+        similarity[(n < 2) | (direction == 0) | ~(var_c > 0)] = np.nan
+        return similarity
@@ -3,13 +3,13 @@ import pandas as pd
 import talib.abstract as ta
 import pandas_ta as pta
 from itertools import product
-from functools import reduce
 from pandas import DataFrame, Series
 from datetime import datetime
 from typing import Any, Dict, List
 from freqtrade.constants import Config
 from freqtrade.strategy import BooleanParameter, CategoricalParameter, IStrategy
 from freqtrade.optimize.space import Categorical, SKDecimal, Dimension
+from rule_compiler import Condition, evaluate, never
 
 
 class Finder(IStrategy):
@@ -126,40 +126,36 @@ class Finder(IStrategy):
 
         return pd.Series(result)
 
-    def _apply_operator(self, series, side, idx, shift):
+    def _compile_operator(self, name, side, idx, shift):
         operator = getattr(self, f"{side}_{idx}_operator").value
-        averaged = pd.Series(ta.EMA(series, timeperiod=10))
-        shifted = series.shift(shift)
-
-        if operator in ["ABOVE_AVERAGED", "BELOW_AVERAGED"]:
-            comparison = (
-                series > averaged.shift(shift)
-                if operator == "ABOVE_AVERAGED"
-                else series < averaged.shift(shift)
-            )
-            return comparison
-
-        value0, value1, value2 = shifted, shifted.shift(1), shifted.shift(2)
-
-        comparison_operators = {
-            "GOING_UP": (value0 > value1) & (value1 < value2),
-            "GOING_DOWN": (value0 < value1) & (value1 > value2),
-            "RISING": (value0 > value1) & (value1 > value2),
-            "FALLING": (value0 < value1) & (value1 < value2),
-        }
-
-        return comparison_operators.get(operator, pd.Series(False, index=series.index))
+        averaged = f"{name}_averaged"
+
+        if operator == "ABOVE_AVERAGED":
+            return [Condition(name, ">", averaged, 0, shift)]
+        if operator == "BELOW_AVERAGED":
+            return [Condition(name, "<", averaged, 0, shift)]
+
+        # value0, value1, value2 are the indicator `shift`, `shift` + 1 and `shift` + 2 candles ago.
+        value0_value1 = {"GOING_UP": ">", "GOING_DOWN": "<", "RISING": ">", "FALLING": "<"}
+        value1_value2 = {"GOING_UP": "<", "GOING_DOWN": ">", "RISING": ">", "FALLING": "<"}
+        if operator not in value0_value1:
+            return [never(name)]
+        return [
+            Condition(name, value0_value1[operator], name, shift, shift + 1),
+            Condition(name, value1_value2[operator], name, shift + 1, shift + 2),
+        ]
 
-    def _apply_dow_conditions(self, dataframe, side):
+    def _compile_dow_conditions(self, side):
         min_dow = getattr(self, f"{side}_min_dow").value
         max_dow = getattr(self, f"{side}_max_dow").value
         if min_dow < max_dow:
-            return [(dataframe["dow"] >= min_dow) & (dataframe["dow"] <= max_dow)]
+            return [Condition("dow", ">=", min_dow), Condition("dow", "<=", max_dow)]
         else:
-            return [(dataframe["dow"] <= min_dow) & (dataframe["dow"] >= max_dow)]
+            return [Condition("dow", "<=", min_dow), Condition("dow", ">=", max_dow)]
 
-    def _populate_trend(self, dataframe: pd.DataFrame, side: str) -> pd.DataFrame:
+    def _populate_trend(self, dataframe: pd.DataFrame, side: str) -> np.ndarray:
         conditions = []
+        arrays = {"volume": dataframe["volume"], "dow": dataframe["dow"]}
 
         for idx in range(self.NUM_RULES):
             if self._is_rule_disabled(side, idx):
@@ -167,25 +163,24 @@ class Finder(IStrategy):
 
             indicator, period, shift = self._get_rule_parameters(side, idx)
             result = self._calculate_indicator(dataframe, indicator, period)
-            conditions.append(self._apply_operator(result, side, idx, shift))
+            name = f"{side}_{idx}"
+            arrays[name] = result
+            arrays[f"{name}_averaged"] = ta.EMA(result, timeperiod=10)
+            conditions.extend(self._compile_operator(name, side, idx, shift))
 
-        conditions.append(dataframe["volume"] > 0)
-        conditions.extend(self._apply_dow_conditions(dataframe, side))
+        conditions.append(Condition("volume", ">", 0))
+        conditions.extend(self._compile_dow_conditions(side))
 
-        return conditions
+        return evaluate(conditions, arrays, len(dataframe))
 
     def populate_indicators(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         dataframe["dow"] = dataframe["date"].dt.dayofweek
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        conditions = self._populate_trend(dataframe, "buy")
-        if conditions:
-            dataframe.loc[reduce(lambda x, y: x & y, conditions), "enter_long"] = 1
+        dataframe.loc[self._populate_trend(dataframe, "buy"), "enter_long"] = 1
         return dataframe
 
     def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
-        conditions = self._populate_trend(dataframe, "sell")
-        if conditions:
-            dataframe.loc[reduce(lambda x, y: x & y, conditions), "exit_long"] = 1
+        dataframe.loc[self._populate_trend(dataframe, "sell"), "exit_long"] = 1
         return dataframe
@@ -12,13 +12,14 @@ from datetime import datetime, timedelta
 from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
-import riskfolio as rp
 import talib.abstract as ta
 from freqtrade.constants import Config
 from freqtrade.exchange import timeframe_to_minutes, timeframe_to_prev_date
 from freqtrade.optimize.space import Categorical, Dimension, SKDecimal
 from freqtrade.persistence import Trade
 from freqtrade.strategy import CategoricalParameter, IntParameter, IStrategy
+from hrp_engine import RISK_MEASURES as HRP_RISK_MEASURES
+from hrp_engine import hrp_weights
 from pandas import DataFrame, Series
 
 logger = logging.getLogger(__name__)
@@ -64,6 +65,8 @@ class HRPStrategy(IStrategy):
     def __init__(self, config: Config) -> None:
         super().__init__(config)
         self.config = config
+        self._weights_key: Optional[Tuple] = None
+        self._weights: Dict[str, float] = {}
     
         for idx in range(self.config["max_open_trades"]):
             setattr(
@@ -191,16 +194,37 @@ class HRPStrategy(IStrategy):
         return adjustment_amount
 
     def calculate_weights(self) -> Dict:
-        data = {}
-
         if not self.selected_pairs:
             return {}
 
-        for pair in self.selected_pairs:
-            dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
+        dataframes = {
+            pair: self.dp.get_analyzed_dataframe(pair, self.timeframe)[0]
+            for pair in self.selected_pairs
+        }
+        candle_date = max(
+            (df["date"].iloc[-1] for df in dataframes.values() if not df.empty), default=None
+        )
+        # custom_stake_amount and adjust_trade_position ask for the weights of every
+        # pair on every loop, optimize once per candle, pair set and risk measure.
+        key = (candle_date, frozenset(self.selected_pairs), self.risk_measure.value)
+        if key != self._weights_key:
+            self._weights = self.optimize_weights(dataframes)
+            self._weights_key = key
+        return self._weights
+
+    def optimize_weights(self, dataframes: Dict[str, DataFrame]) -> Dict:
+        data = {}
+        for pair, dataframe in dataframes.items():
             data[pair] = dataframe.iloc[-self.startup_candle_count:]["close"]
         returns = DataFrame(data).pct_change(fill_method=None).dropna()
 
+        if self.risk_measure.value in HRP_RISK_MEASURES:
+            weights = hrp_weights(returns.to_numpy(), rm=self.risk_measure.value, leaf_order=True)
+            return dict(zip(returns.columns, weights.tolist()))
+
+        # Other risk measures are only available in riskfolio.
+        import riskfolio as rp
+
         portfolio = rp.HCPortfolio(returns=returns)
         weights = portfolio.optimization(
             model="HRP",
@@ -1,11 +1,12 @@
 import logging
 from datetime import datetime, timedelta
-from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import talib.abstract as ta
+from cross_section import CrossSectionalRanker
 from freqtrade.constants import Config
-from freqtrade.exchange import timeframe_to_prev_date
+from freqtrade.exchange import timeframe_to_prev_date, timeframe_to_seconds
 from freqtrade.strategy import (
     BooleanParameter,
     CategoricalParameter,
@@ -35,11 +36,12 @@ class RotatorStrategy(IStrategy):
     stop_duration = IntParameter(12, 200, default=5, space="protection")
     use_stop_protection = BooleanParameter(default=True, space="protection")
 
-    top_pairs: List = []
+    top_pairs: Set[str] = set()
 
     def __init__(self, config: Config) -> None:
         super().__init__(config)
         self.config = config
+        self.ranker = CrossSectionalRanker(self.timeframe)
 
     @property
     def protections(self):
@@ -66,6 +68,7 @@ class RotatorStrategy(IStrategy):
 
     def populate_indicators(self, dataframe: DataFrame, metadata: Dict) -> DataFrame:
         dataframe["roc"] = ta.ROC(dataframe, timeperiod=self.roc_period.value)
+        self.ranker.update(metadata["pair"], dataframe["date"], dataframe["roc"])
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: Dict) -> DataFrame:
@@ -80,18 +83,15 @@ class RotatorStrategy(IStrategy):
         if (current_time - prev_candle_time) >= timedelta(minutes=5):
             return
 
-        data = {}
-        for pair in self.config["exchange"]["pair_whitelist"]:
-            dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-            if dataframe.empty:
-                continue
-            data[pair] = dataframe["roc"].iat[-1]
-
-        if not data:
+        # Last closed candle, the last row of the analyzed dataframes.
+        candle_date = prev_candle_time - timedelta(seconds=timeframe_to_seconds(self.timeframe))
+        top_pairs = self.ranker.top(
+            candle_date, self.pair_threshold.value, self.config["exchange"]["pair_whitelist"]
+        )
+        if not top_pairs:
             return
 
-        data = sorted(data.items(), key=lambda x: x[1], reverse=True)
-        self.top_pairs = [p[0] for p in data[: self.pair_threshold.value]]
+        self.top_pairs = set(top_pairs)
 
     def confirm_trade_entry(self, pair: str, *args, **kwargs) -> bool:
         if pair not in self.top_pairs:
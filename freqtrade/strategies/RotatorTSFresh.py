@@ -1,30 +1,22 @@
 import itertools
 import logging
 from datetime import datetime, timedelta
-from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import talib.abstract as ta
+from cross_section import CrossSectionalRanker
 from freqtrade.constants import Config
-from freqtrade.exchange import timeframe_to_prev_date
+from freqtrade.exchange import timeframe_to_prev_date, timeframe_to_seconds
 from freqtrade.strategy import BooleanParameter, CategoricalParameter, IStrategy
-from pandas import DataFrame, Series, concat
+from pandas import DataFrame, Series
+from rolling_features import FeatureCache, rolling_minimal_features
 from sklearn.cluster import KMeans
 from sklearn.preprocessing import StandardScaler
 
-# Simply ignore matrix_profile dependency missing warning
-from tsfresh import extract_features
-from tsfresh.feature_extraction import MinimalFCParameters
-
 logger = logging.getLogger(__name__)
 
-
-class DisableLogger:
-    def __enter__(self):
-        logging.disable(logging.CRITICAL)
-
-    def __exit__(self, exit_type, exit_value, exit_traceback):
-        logging.disable(logging.NOTSET)
+FEATURE_WINDOW = 50  # Candles per tsfresh MinimalFCParameters window.
 
 
 class RotatorTSFreshStrategy(IStrategy):
@@ -49,11 +41,15 @@ class RotatorTSFreshStrategy(IStrategy):
     )
     use_stop_protection = BooleanParameter(default=True, space="protection")
 
-    top_pairs: List = []
+    top_pairs: Set[str] = set()
 
     def __init__(self, config: Config) -> None:
         super().__init__(config)
         self.config = config
+        self.ranker = CrossSectionalRanker(self.timeframe)
+        self.features = FeatureCache()
+        self.centroids: Optional[np.ndarray] = None
+        self.centroids_date: Optional[datetime] = None
 
     @property
     def protections(self):
@@ -80,6 +76,12 @@ class RotatorTSFreshStrategy(IStrategy):
 
     def populate_indicators(self, dataframe: DataFrame, metadata: Dict) -> DataFrame:
         dataframe["roc"] = ta.ROC(dataframe, timeperiod=self.roc_period.value)
+        self.ranker.update(metadata["pair"], dataframe["date"], dataframe["roc"])
+        self.features.update(
+            metadata["pair"],
+            dataframe["date"],
+            rolling_minimal_features(dataframe, ["close", "roc"], FEATURE_WINDOW),
+        )
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: Dict) -> DataFrame:
@@ -95,42 +97,34 @@ class RotatorTSFreshStrategy(IStrategy):
             return
 
         pairs = self.config["exchange"]["pair_whitelist"]
-        data, roc = {}, {}
-        for pair in pairs:
-            dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-            if dataframe.empty:
-                continue
-            df = dataframe[["date", "close", "roc"]].iloc[-50:]
-            df["pair"] = pair
-            data[pair] = df
-            roc[pair] = dataframe["roc"].iat[-1]
+        # Last closed candle, the last row of the analyzed dataframes.
+        candle_date = prev_candle_time - timedelta(seconds=timeframe_to_seconds(self.timeframe))
+        roc = dict(zip(pairs, self.ranker.row(candle_date, pairs).tolist()))
 
-        if not data:
+        # CLUSTERING
+        feature_pairs, features = self.features.matrix(candle_date, pairs)
+        if not feature_pairs:
             return
 
-        # CLUSTERING
-        df = concat(data, axis=0).dropna()
-
-        with DisableLogger():
-            features = extract_features(
-                df,
-                column_id="pair",
-                column_sort="date",
-                column_kind=None,
-                column_value=None,
-                disable_progressbar=True,
-                show_warnings=False,
-                default_fc_parameters=MinimalFCParameters(),
-            )
-            scaler = StandardScaler()
-            X = scaler.fit_transform(features)
-            n = self.pair_threshold.value
+        X = StandardScaler().fit_transform(features)
+        n = self.pair_threshold.value
+        if (
+            self.centroids is not None
+            and self.centroids.shape == (n, X.shape[1])
+            and self.centroids_date < candle_date
+        ):
+            # Clusters move little between candles, start from the previous ones.
+            # A new backtest (or hyperopt epoch) goes back in time and starts over.
+            km = KMeans(n_clusters=n, init=self.centroids, n_init=1)
+        else:
             km = KMeans(n_clusters=n, random_state=0)
-            clusters = km.fit_predict(X)
+        clusters = km.fit_predict(X)
+        self.centroids = km.cluster_centers_
+        self.centroids_date = candle_date
 
         top_pairs = []
         for key, group in itertools.groupby(
-            sorted(zip(clusters, pairs)), lambda x: x[0]
+            sorted(zip(clusters, feature_pairs)), lambda x: x[0]
         ):
             group = list(group)
             if not group:
@@ -141,7 +135,7 @@ class RotatorTSFreshStrategy(IStrategy):
                 reverse=True,
             )
             top_pairs.append(group_pairs[0][0])
-        self.top_pairs = top_pairs
+        self.top_pairs = set(top_pairs)
 
     def confirm_trade_entry(self, pair: str, *args, **kwargs) -> bool:
         if pair not in self.top_pairs:
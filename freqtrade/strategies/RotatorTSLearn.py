@@ -1,30 +1,20 @@
-import itertools
 import logging
 from datetime import datetime, timedelta
-from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 import numpy as np
 import talib.abstract as ta
+from cross_section import CrossSectionalRanker
 from freqtrade.constants import Config
-from freqtrade.exchange import timeframe_to_prev_date
+from freqtrade.exchange import timeframe_to_prev_date, timeframe_to_seconds
 from freqtrade.strategy import BooleanParameter, CategoricalParameter, IStrategy
-from pandas import DataFrame, Series, concat
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-
-# Simply ignore matrix_profile dependency missing warning
-from tsfresh import extract_features
-from tsfresh.feature_extraction import MinimalFCParameters
+from pandas import DataFrame, Series
+from rolling_features import FeatureCache, rolling_minimal_features
+from rotation_clusters import RotationTask, precompute_rotations, rotation_pairs
 
 logger = logging.getLogger(__name__)
 
-
-class DisableLogger:
-    def __enter__(self):
-        logging.disable(logging.CRITICAL)
-
-    def __exit__(self, exit_type, exit_value, exit_traceback):
-        logging.disable(logging.NOTSET)
+FEATURE_WINDOW = 50  # Candles per tsfresh MinimalFCParameters window.
 
 
 class RotatorTSFreshStrategy(IStrategy):
@@ -49,11 +39,18 @@ class RotatorTSFreshStrategy(IStrategy):
     )
     use_stop_protection = BooleanParameter(default=True, space="protection")
 
-    top_pairs: List = []
+    # Worker processes precomputing the rotations of a backtest, None for one per core.
+    precompute_workers: Optional[int] = None
+
+    top_pairs: Set[str] = set()
 
     def __init__(self, config: Config) -> None:
         super().__init__(config)
         self.config = config
+        self.ranker = CrossSectionalRanker(self.timeframe)
+        self.features = FeatureCache()
+        # Picked pairs per candle, per (clusters, whitelist).
+        self.rotations: Dict[Tuple[int, Tuple[str, ...]], Dict[datetime, List[str]]] = {}
 
     @property
     def protections(self):
@@ -80,6 +77,13 @@ class RotatorTSFreshStrategy(IStrategy):
 
     def populate_indicators(self, dataframe: DataFrame, metadata: Dict) -> DataFrame:
         dataframe["roc"] = ta.ROC(dataframe, timeperiod=self.roc_period.value)
+        self.ranker.update(metadata["pair"], dataframe["date"], dataframe["roc"])
+        self.features.update(
+            metadata["pair"],
+            dataframe["date"],
+            rolling_minimal_features(dataframe, ["close", "roc"], FEATURE_WINDOW),
+        )
+        self.rotations.clear()
         return dataframe
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: Dict) -> DataFrame:
@@ -95,54 +99,41 @@ class RotatorTSFreshStrategy(IStrategy):
             return
 
         pairs = self.config["exchange"]["pair_whitelist"]
-        data, roc = {}, {}
-        for pair in pairs:
-            dataframe, _ = self.dp.get_analyzed_dataframe(pair, self.timeframe)
-            if dataframe.empty:
-                continue
-            df = dataframe[["date", "close", "roc"]].iloc[-50:]
-            df["pair"] = pair
-            data[pair] = df
-            roc[pair] = dataframe["roc"].iat[-1]
-
-        if not data:
+        # Last closed candle, the last row of the analyzed dataframes.
+        candle_date = prev_candle_time - timedelta(seconds=timeframe_to_seconds(self.timeframe))
+        n = self.pair_threshold.value
+
+        if self.dp.runmode.value in ("backtest", "hyperopt"):
+            key = (n, tuple(pairs))
+            if key not in self.rotations:
+                # Hyperopt epochs already run side by side in their own processes.
+                workers = 1 if self.dp.runmode.value == "hyperopt" else self.precompute_workers
+                tasks = {}
+                for date in self.features.dates():
+                    task = self.rotation_task(date, pairs)
+                    if task is not None:
+                        tasks[date] = task
+                self.rotations[key] = precompute_rotations(tasks, n, workers)
+                logger.info(f"Precomputed rotations of {len(tasks)} candles")
+            top_pairs = self.rotations[key].get(candle_date)
+        else:
+            task = self.rotation_task(candle_date, pairs)
+            top_pairs = rotation_pairs(*task, n) if task is not None else None
+
+        if not top_pairs:
             return
 
-        # CLUSTERING
-        df = concat(data, axis=0).dropna()
-
-        with DisableLogger():
-            features = extract_features(
-                df,
-                column_id="pair",
-                column_sort="date",
-                column_kind=None,
-                column_value=None,
-                n_jobs=0, # disable parallelisation
-                disable_progressbar=True,
-                show_warnings=False,
-                default_fc_parameters=MinimalFCParameters(),
-            )
-            scaler = StandardScaler()
-            X = scaler.fit_transform(features)
-            n = self.pair_threshold.value
-            km = KMeans(n_clusters=n, random_state=0)
-            clusters = km.fit_predict(X)
-
-        top_pairs = []
-        for key, group in itertools.groupby(
-            sorted(zip(clusters, pairs)), lambda x: x[0]
-        ):
-            group = list(group)
-            if not group:
-                continue
-            group_pairs = sorted(
-                [(x[1], roc.get(x[1], 0.0)) for x in group],
-                key=lambda x: x[1],
-                reverse=True,
-            )
-            top_pairs.append(group_pairs[0][0])
-        self.top_pairs = top_pairs
+        self.top_pairs = set(top_pairs)
+
+    def rotation_task(self, date: datetime, pairs: List[str]) -> Optional[RotationTask]:
+        """
+        Pairs with features at a candle, their features and ROC.
+        """
+        feature_pairs, features = self.features.matrix(date, pairs)
+        if not feature_pairs:
+            return None
+        roc = self.ranker.row(date, feature_pairs).tolist()
+        return feature_pairs, features, roc
 
     def confirm_trade_entry(self, pair: str, *args, **kwargs) -> bool:
         if pair not in self.top_pairs:
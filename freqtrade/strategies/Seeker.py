@@ -3,13 +3,13 @@ import pandas as pd
 import talib.abstract as ta
 import pandas_ta as pta
 
-from functools import reduce
 from pandas import DataFrame, Series
 from datetime import datetime
 from typing import Any, Dict, List
 from freqtrade.constants import Config
 from freqtrade.strategy import BooleanParameter, CategoricalParameter, IStrategy
 from freqtrade.optimize.space import Categorical, SKDecimal, Dimension
+from rule_compiler import Condition, evaluate, never
 
 
 class Seeker(IStrategy):
@@ -51,29 +51,30 @@ class Seeker(IStrategy):
 
     def compare_series(
         self,
-        series1: Series,
-        series2: Series,
+        series1: str,
+        series2: str,
         shift: int = 0,
         comparison: str = "CROSS_UP",
-    ) -> bool:
-        value1 = series1.shift(shift + 1)
-        value2 = series2.shift(shift + 1)
-        value3 = series1.shift(shift)
-        value4 = series2.shift(shift)
-
+    ) -> List[Condition]:
         if comparison == "CROSS_UP":
-            return (value1 < value2) & (value3 > value4)
+            return [
+                Condition(series1, "<", series2, shift + 1, shift + 1),
+                Condition(series1, ">", series2, shift, shift),
+            ]
         elif comparison == "CROSS_DOWN":
-            return (value1 > value2) & (value3 < value4)
+            return [
+                Condition(series1, ">", series2, shift + 1, shift + 1),
+                Condition(series1, "<", series2, shift, shift),
+            ]
         elif comparison == "GREATER_THAN":
-            return series1.shift(shift) > series2.shift(shift)
+            return [Condition(series1, ">", series2, shift, shift)]
         elif comparison == "LESSER_THAN":
-            return series1.shift(shift) < series2.shift(shift)
+            return [Condition(series1, "<", series2, shift, shift)]
         elif comparison == "RAISING":
-            return value1 < value3
+            return [Condition(series1, "<", series1, shift + 1, shift)]
         elif comparison == "FALLING":
-            return value1 > value3
-        return False
+            return [Condition(series1, ">", series1, shift + 1, shift)]
+        return [never(series1)]
 
     def initialize_parameters(self):
         SERIES = """upperband lowerband macd macdsignal slowk slowd fastk fastd
@@ -156,7 +157,7 @@ class Seeker(IStrategy):
 
         return dataframe
 
-    def populate_trend(self, dataframe: DataFrame, side: str) -> DataFrame:
+    def populate_trend(self, dataframe: DataFrame, side: str) -> List[Condition]:
         conditions = []
 
         for idx in range(self.NUM_RULES):
@@ -164,14 +165,14 @@ class Seeker(IStrategy):
             indicator = getattr(self, f"{side}_{idx}_series").value
             shift = getattr(self, f"{side}_{idx}_shift").value
 
-            left = dataframe[f"{indicator}"]
-            right = dataframe[f"{indicator}_smooth_{self.smooth.value}"]
+            left = f"{indicator}"
+            right = f"{indicator}_smooth_{self.smooth.value}"
 
             if operator != "DISABLED":
-                conditions.append(self.compare_series(left, right, shift, operator))
+                conditions.extend(self.compare_series(left, right, shift, operator))
 
         if conditions:
-            conditions.append(dataframe["volume"] > 0)
+            conditions.append(Condition("volume", ">", 0))
         return conditions
 
     def populate_entry_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
@@ -184,12 +185,12 @@ class Seeker(IStrategy):
             #    conditions.append((data_hour >= min_hour) & (data_hour < max_hour))
             # else:
             #    conditions.append((data_hour < min_hour) & (data_hour >= max_hour))
-            dataframe.loc[reduce(lambda x, y: x & y, conditions), "enter_long"] = 1
+            dataframe.loc[evaluate(conditions, dataframe, len(dataframe)), "enter_long"] = 1
         return dataframe
 
     def populate_exit_trend(self, dataframe: DataFrame, metadata: dict) -> DataFrame:
         if "sell" in self.SIDES:
             conditions = self.populate_trend(dataframe, "sell")
             if conditions:
-                dataframe.loc[reduce(lambda x, y: x & y, conditions), "exit_long"] = 1
+                dataframe.loc[evaluate(conditions, dataframe, len(dataframe)), "exit_long"] = 1
         return dataframe
@@ -0,0 +1,105 @@
+"""
+Cross-sectional ranking of pairs by one feature.
+
+Strategies feed the feature column of every pair from `populate_indicators`
+into a (time x pairs) matrix on the candle grid of their timeframe. Ranking
+the pairs at a candle is then a single row lookup and `np.argpartition`,
+instead of reading the analyzed dataframe of every pair in `bot_loop_start`.
+"""
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import numpy as np
+from freqtrade.exchange import timeframe_to_seconds
+from pandas import Series
+
+MIN_ROWS = 256  # Rows allocated at once when the matrix grows.
+
+
+class CrossSectionalRanker:
+    """
+    Feature values of all pairs, one row per candle and one column per pair.
+
+    Parameters:
+    - timeframe (str): Timeframe of the candles.
+    """
+
+    def __init__(self, timeframe: str) -> None:
+        self.step = timeframe_to_seconds(timeframe)
+        self.columns: Dict[str, int] = {}
+        self.origin: Optional[int] = None  # Timestamp of row 0
+        self.values = np.full((0, 0), np.nan)
+
+    def _row(self, timestamp: int) -> int:
+        return (timestamp - self.origin) // self.step
+
+    def _resize(self, rows_before: int, rows: int, cols: int) -> None:
+        values = np.full((rows, cols), np.nan)
+        old_rows, old_cols = self.values.shape
+        values[rows_before:rows_before + old_rows, :old_cols] = self.values
+        self.values = values
+        self.origin -= rows_before * self.step
+
+    def update(self, pair: str, dates: Series, values: Series) -> None:
+        """
+        Stores the feature values of a pair, overwriting earlier values of the same candles.
+
+        Parameters:
+        - pair (str): Pair the values belong to.
+        - dates (Series): Candle dates.
+        - values (Series): Feature values.
+        """
+        if dates.empty:
+            return
+        timestamps = dates.values.astype("datetime64[s]").astype(np.int64)
+        if self.origin is None:
+            self.origin = int(timestamps[0])
+        if pair not in self.columns:
+            self.columns[pair] = len(self.columns)
+
+        rows = self._row(timestamps)
+        n_rows, n_cols = self.values.shape
+        before = max(0, -int(rows.min()))
+        after = max(0, int(rows.max()) + 1 - n_rows)
+        if before or after or len(self.columns) > n_cols:
+            before = before and max(before, MIN_ROWS)
+            after = after and max(after, MIN_ROWS)
+            self._resize(before, n_rows + before + after, max(n_cols, 2 * len(self.columns)))
+            rows += before
+
+        self.values[rows, self.columns[pair]] = values.to_numpy(dtype=np.float64)
+
+    def row(self, date: datetime, pairs: List[str]) -> np.ndarray:
+        """
+        Feature values of the pairs at a candle, NaN where unknown.
+        """
+        result = np.full(len(pairs), np.nan)
+        if self.origin is None:
+            return result
+        row = self._row(int(date.timestamp()))
+        if not 0 <= row < len(self.values):
+            return result
+        cols = [self.columns.get(pair, -1) for pair in pairs]
+        known = np.array([col >= 0 for col in cols], dtype=bool)
+        result[known] = self.values[row, np.array(cols)[known]]
+        return result
+
+    def top(self, date: datetime, k: int, pairs: List[str]) -> List[str]:
+        """
+        The `k` pairs with the highest feature value at a candle, best first.
+
+        Parameters:
+        - date (datetime): Open date of the candle.
+        - k (int): Number of pairs to select.
+        - pairs (list): Pairs to rank, e.g. the current whitelist.
+
+        Returns:
+        - list: Selected pairs, empty if no pair has a value at the candle.
+        """
+        values = self.row(date, pairs)
+        candidates = np.flatnonzero(~np.isnan(values))
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-values[candidates], k - 1)[:k]]
+        # Highest value first, ties in the order of `pairs`.
+        order = np.lexsort((candidates, -values[candidates]))
+        return [pairs[i] for i in candidates[order]]
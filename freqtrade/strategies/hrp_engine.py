@@ -0,0 +1,152 @@
+"""
+Hierarchical Risk Parity on NumPy arrays.
+
+Reproduces `riskfolio.HCPortfolio(returns).optimization(model="HRP",
+codependence="pearson", linkage="single", rf=0)` for the dispersion risk
+measures below, without building DataFrames on every call. The linkage and
+its optimal leaf ordering come from SciPy, like riskfolio does.
+"""
+from typing import List
+
+import numpy as np
+from scipy.cluster import hierarchy
+from scipy.spatial.distance import squareform
+
+RISK_MEASURES = ("vol", "MV", "MAD", "MSV", "FLPM", "SLPM")
+
+
+def correlation_distance(returns: np.ndarray) -> np.ndarray:
+    """
+    Distance matrix sqrt((1 - corr) / 2) of the Pearson correlation of the returns.
+
+    Parameters:
+    - returns (np.ndarray): Returns of shape (observations, assets).
+
+    Returns:
+    - np.ndarray: Distance matrix of shape (assets, assets).
+    """
+    corr = np.corrcoef(returns, rowvar=False)
+    return np.sqrt(np.clip((1 - corr) / 2, 0.0, 1.0))
+
+
+def cluster_order(distance: np.ndarray, leaf_order: bool = True) -> np.ndarray:
+    """
+    Quasi-diagonal order of the assets from single linkage clustering.
+
+    Parameters:
+    - distance (np.ndarray): Distance matrix.
+    - leaf_order (bool): Reorder the leaves to minimize distances between neighbours.
+
+    Returns:
+    - np.ndarray: Asset indices in seriation order.
+    """
+    linkage = hierarchy.linkage(
+        squareform(distance, checks=False), method="single", optimal_ordering=leaf_order
+    )
+    return hierarchy.leaves_list(linkage)
+
+
+def risk(returns: np.ndarray, cov: np.ndarray, weights: np.ndarray, rm: str) -> np.ndarray:
+    """
+    Risk of one or more portfolios.
+
+    Parameters:
+    - returns (np.ndarray): Asset returns of shape (observations, assets).
+    - cov (np.ndarray): Covariance matrix of the assets.
+    - weights (np.ndarray): Weights of shape (assets, portfolios).
+    - rm (str): Risk measure, "vol" and "MV" are the standard deviation.
+
+    Returns:
+    - np.ndarray: Risk of each portfolio.
+    """
+    if rm in ("vol", "MV"):
+        return np.sqrt(np.einsum("ap,ab,bp->p", weights, cov, weights))
+
+    portfolio = returns @ weights
+    n = len(portfolio)
+    if rm == "MAD":
+        return np.abs(portfolio - portfolio.mean(axis=0)).mean(axis=0)
+    if rm == "MSV":
+        downside = np.minimum(portfolio - portfolio.mean(axis=0), 0.0)
+        return np.sqrt((downside * downside).sum(axis=0) / (n - 1))
+    shortfall = np.maximum(-portfolio, 0.0)
+    if rm == "FLPM":
+        return shortfall.sum(axis=0) / n
+    if rm == "SLPM":
+        return np.sqrt((shortfall * shortfall).sum(axis=0) / (n - 1))
+    raise ValueError(f"Unsupported risk measure {rm}, use one of {', '.join(RISK_MEASURES)}")
+
+
+def naive_weights(returns: np.ndarray, cov: np.ndarray, rm: str) -> np.ndarray:
+    """
+    Inverse risk weights of the assets of a cluster, inverse variance for "MV".
+
+    Returns:
+    - np.ndarray: Weights summing to one.
+    """
+    asset_risk = risk(returns, cov, np.eye(cov.shape[0]), rm)
+    inverse = 1 / (asset_risk * asset_risk if rm == "MV" else asset_risk)
+    return inverse / inverse.sum()
+
+
+def cluster_risk(returns: np.ndarray, cov: np.ndarray, rm: str) -> float:
+    """
+    Risk of a cluster held with its naive weights, the variance for "MV".
+    """
+    weights = naive_weights(returns, cov, rm)[:, None]
+    value = risk(returns, cov, weights, rm)[0]
+    return value * value if rm == "MV" else value
+
+
+def recursive_bisection(returns: np.ndarray, cov: np.ndarray, order: np.ndarray,
+                        rm: str = "MV") -> np.ndarray:
+    """
+    Splits the ordered assets in halves and allocates between them by inverse risk.
+
+    Parameters:
+    - returns (np.ndarray): Returns of shape (observations, assets).
+    - cov (np.ndarray): Covariance matrix of the assets.
+    - order (np.ndarray): Seriation order of the assets.
+    - rm (str): Risk measure.
+
+    Returns:
+    - np.ndarray: Weights per asset, in the original asset order.
+    """
+    weights = np.ones(cov.shape[0])
+    clusters: List[np.ndarray] = [order]
+    while clusters:
+        clusters = [
+            half
+            for cluster in clusters
+            if len(cluster) > 1
+            for half in (cluster[:len(cluster) // 2], cluster[len(cluster) // 2:])
+        ]
+        for left, right in zip(clusters[::2], clusters[1::2]):
+            left_risk = cluster_risk(returns[:, left], cov[np.ix_(left, left)], rm)
+            right_risk = cluster_risk(returns[:, right], cov[np.ix_(right, right)], rm)
+            alpha = 1 - left_risk / (left_risk + right_risk)
+            weights[left] *= alpha
+            weights[right] *= 1 - alpha
+    return weights
+
+
+def hrp_weights(returns: np.ndarray, rm: str = "MV", leaf_order: bool = True) -> np.ndarray:
+    """
+    Hierarchical Risk Parity weights.
+
+    Parameters:
+    - returns (np.ndarray): Returns of shape (observations, assets) without NaN.
+    - rm (str): Risk measure, one of RISK_MEASURES.
+    - leaf_order (bool): Use the optimal leaf ordering of the linkage.
+
+    Returns:
+    - np.ndarray: Weights per asset summing to one.
+    """
+    if rm not in RISK_MEASURES:
+        raise ValueError(f"Unsupported risk measure {rm}, use one of {', '.join(RISK_MEASURES)}")
+    if returns.shape[1] == 1:
+        return np.ones(1)
+
+    cov = np.cov(returns, rowvar=False)
+    order = cluster_order(correlation_distance(returns), leaf_order)
+    return recursive_bisection(returns, cov, order, rm)
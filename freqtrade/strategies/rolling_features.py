@@ -0,0 +1,121 @@
+"""
+Rolling tsfresh MinimalFCParameters features.
+
+`tsfresh.extract_features` with `MinimalFCParameters` on the last `window` rows
+of every pair recomputes ten summary statistics from scratch on every candle,
+although consecutive windows share all but one row. The same features are
+computed here for every row at once with pandas rolling windows, which keep
+running sums (and an order-statistics window for the median), so they can be
+precomputed in `populate_indicators` and looked up per candle.
+"""
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+import numpy as np
+from pandas import DataFrame, Series
+
+# Same order as tsfresh.feature_extraction.MinimalFCParameters.
+MINIMAL_FEATURES = (
+    "sum_values",
+    "median",
+    "mean",
+    "length",
+    "standard_deviation",
+    "variance",
+    "root_mean_square",
+    "maximum",
+    "absolute_maximum",
+    "minimum",
+)
+
+
+def rolling_minimal_features(dataframe: DataFrame, columns: List[str], window: int = 50
+                             ) -> DataFrame:
+    """
+    MinimalFCParameters features of the last `window` rows, at every row.
+
+    Rows where any of `columns` is NaN are left out of the windows, like
+    dropping them before calling `extract_features`.
+
+    Parameters:
+    - dataframe (DataFrame): Candles with the feature columns.
+    - columns (list): Columns to extract features from.
+    - window (int): Number of rows per window.
+
+    Returns:
+    - DataFrame: One column per feature, named "{column}__{feature}" like tsfresh.
+    """
+    valid = dataframe[columns].notna().all(axis=1)
+    features: Dict[str, Series] = {}
+    for column in columns:
+        values = dataframe[column].where(valid).astype(np.float64)
+        rolling = values.rolling(window, min_periods=1)
+        length = rolling.count()
+        mean = rolling.mean()
+        variance = rolling.var(ddof=0)
+        features.update({
+            f"{column}__sum_values": rolling.sum(),
+            f"{column}__median": rolling.median(),
+            f"{column}__mean": mean,
+            f"{column}__length": length.where(length > 0),
+            f"{column}__standard_deviation": np.sqrt(variance),
+            f"{column}__variance": variance,
+            f"{column}__root_mean_square": np.sqrt(
+                (values * values).rolling(window, min_periods=1).mean()
+            ),
+            f"{column}__maximum": rolling.max(),
+            f"{column}__absolute_maximum": values.abs().rolling(window, min_periods=1).max(),
+            f"{column}__minimum": rolling.min(),
+        })
+    return DataFrame(features, index=dataframe.index)
+
+
+class FeatureCache:
+    """
+    Precomputed feature rows of every pair, looked up by candle date.
+    """
+
+    def __init__(self) -> None:
+        self._dates: Dict[str, np.ndarray] = {}
+        self._values: Dict[str, np.ndarray] = {}
+
+    def update(self, pair: str, dates: Series, features: DataFrame) -> None:
+        self._dates[pair] = dates.values.astype("datetime64[s]").astype(np.int64)
+        self._values[pair] = features.to_numpy(dtype=np.float64)
+
+    def dates(self) -> List[datetime]:
+        """
+        Candle dates of all pairs, sorted.
+        """
+        if not self._dates:
+            return []
+        timestamps = np.unique(np.concatenate(list(self._dates.values())))
+        return [datetime.fromtimestamp(int(ts), tz=timezone.utc) for ts in timestamps]
+
+    def matrix(self, date: datetime, pairs: List[str]) -> Tuple[List[str], np.ndarray]:
+        """
+        Feature rows of the pairs at a candle.
+
+        Parameters:
+        - date (datetime): Open date of the candle.
+        - pairs (list): Pairs to look up.
+
+        Returns:
+        - tuple: Pairs with complete features at the candle, sorted like the
+                 index of `extract_features`, and their (pairs x features) matrix.
+        """
+        timestamp = int(date.timestamp())
+        found, rows = [], []
+        for pair in sorted(pairs):
+            dates = self._dates.get(pair)
+            if dates is None:
+                continue
+            idx = np.searchsorted(dates, timestamp)
+            if idx == len(dates) or dates[idx] != timestamp:
+                continue
+            row = self._values[pair][idx]
+            if np.isnan(row).any():
+                continue
+            found.append(pair)
+            rows.append(row)
+        return found, np.array(rows) if rows else np.empty((0, 0))
@@ -0,0 +1,89 @@
+"""
+Rotation picks of the clustering rotators, precomputed per candle.
+
+Every candle the pairs are clustered on their features and the pair with the
+highest ROC of each cluster is picked. The candles are independent of each
+other, so before a backtest the picks of all candles are computed at once,
+spread over a process pool, into a table that `bot_loop_start` looks up.
+"""
+import itertools
+import os
+import site
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from functools import partial
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+from sklearn.cluster import KMeans
+from sklearn.preprocessing import StandardScaler
+from threadpoolctl import threadpool_limits
+
+# (pairs, features, roc) of a candle, the input of `rotation_pairs`.
+RotationTask = Tuple[List[str], np.ndarray, List[float]]
+
+
+def rotation_pairs(pairs: List[str], features: np.ndarray, roc: List[float], n: int
+                   ) -> List[str]:
+    """
+    Clusters the pairs and picks the highest ROC pair of each cluster.
+
+    Parameters:
+    - pairs (list): Pairs, sorted.
+    - features (np.ndarray): (pairs x features) matrix.
+    - roc (list): ROC of each pair.
+    - n (int): Number of clusters.
+
+    Returns:
+    - list: One pair per cluster.
+    """
+    X = StandardScaler().fit_transform(features)
+    km = KMeans(n_clusters=min(n, len(pairs)), random_state=0)
+    clusters = km.fit_predict(X)
+
+    top_pairs = []
+    roc_of = dict(zip(pairs, roc))
+    for key, group in itertools.groupby(sorted(zip(clusters, pairs)), lambda x: x[0]):
+        group_pairs = sorted(
+            [(x[1], roc_of[x[1]]) for x in group],
+            key=lambda x: x[1],
+            reverse=True,
+        )
+        top_pairs.append(group_pairs[0][0])
+    return top_pairs
+
+
+def _rotation_pairs_task(task: RotationTask, n: int) -> List[str]:
+    # Workers run side by side, one thread each instead of one per core each.
+    with threadpool_limits(limits=1):
+        return rotation_pairs(*task, n)
+
+
+def precompute_rotations(tasks: Dict[datetime, RotationTask], n: int,
+                         workers: Optional[int] = None) -> Dict[datetime, List[str]]:
+    """
+    Rotation picks of many candles.
+
+    Parameters:
+    - tasks (dict): (pairs, features, roc) per candle date.
+    - n (int): Number of clusters.
+    - workers (int): Worker processes, None for one per core, 1 to run in this process.
+
+    Returns:
+    - dict: Picked pairs per candle date.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        return {date: rotation_pairs(*task, n) for date, task in tasks.items()}
+
+    # Strategies import this module from their own directory, which is only on
+    # sys.path while freqtrade loads them; spawned workers need it to unpickle.
+    initializer = partial(site.addsitedir, str(Path(__file__).resolve().parent))
+    with ProcessPoolExecutor(max_workers=workers, initializer=initializer) as executor:
+        results = executor.map(
+            partial(_rotation_pairs_task, n=n),
+            tasks.values(),
+            chunksize=max(1, len(tasks) // (4 * workers)),
+        )
+        return dict(zip(tasks.keys(), results))
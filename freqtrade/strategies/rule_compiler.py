@@ -0,0 +1,78 @@
+"""
+Entry and exit rules compiled to NumPy comparisons.
+
+A rule set is a list of `Condition`s, each comparing an array at a lag with
+another array at a lag, or with a constant. `evaluate` ANDs them into one
+boolean mask in place, comparing offset slices of the arrays instead of
+allocating a shifted Series per operand and per comparison.
+"""
+from typing import Iterable, Mapping, NamedTuple, Union
+
+import numpy as np
+
+OPERATORS = {
+    ">": np.greater,
+    "<": np.less,
+    ">=": np.greater_equal,
+    "<=": np.less_equal,
+}
+
+
+class Condition(NamedTuple):
+    """
+    `left` `lag` candles ago compared with `right` `right_lag` candles ago.
+
+    Like comparing `.shift()`ed Series, the condition does not hold where either
+    side is NaN or lies before the first candle.
+    """
+    left: str
+    operator: str
+    right: Union[str, float]
+    lag: int = 0
+    right_lag: int = 0
+
+
+def never(name: str) -> Condition:
+    """A condition that holds on no candle, for rules that cannot match."""
+    return Condition(name, "<", name)
+
+
+def evaluate(conditions: Iterable[Condition], arrays: Mapping, length: int) -> np.ndarray:
+    """
+    Candles where all conditions hold.
+
+    Parameters:
+    - conditions (iterable): Conditions to AND.
+    - arrays (Mapping): Arrays or Series by name, e.g. a DataFrame.
+    - length (int): Number of candles.
+
+    Returns:
+    - np.ndarray: Boolean mask, True where all conditions hold.
+    """
+    mask = np.ones(length, dtype=bool)
+    scratch = np.empty(length, dtype=bool)
+    values = {}
+
+    def array(name: str) -> np.ndarray:
+        if name not in values:
+            values[name] = np.asarray(arrays[name], dtype=np.float64)
+        return values[name]
+
+    for condition in conditions:
+        constant = not isinstance(condition.right, str)
+        start = max(condition.lag, 0 if constant else condition.right_lag)
+        if start >= length:
+            mask[:] = False
+            break
+        mask[:start] = False
+
+        left = array(condition.left)[start - condition.lag:length - condition.lag]
+        if constant:
+            right = condition.right
+        else:
+            right = array(condition.right)[
+                start - condition.right_lag:length - condition.right_lag
+            ]
+        OPERATORS[condition.operator](left, right, out=scratch[start:])
+        mask[start:] &= scratch[start:]
+    return mask
@@ -0,0 +1,100 @@
+# Verifies the HRP engine in `freqtrade/strategies/hrp_engine.py` against riskfolio
+# and benchmarks both per call.
+#
+# `hrp-fixtures.json` holds synthetic returns and the weights riskfolio computed
+# for them per risk measure, so the engine is verified without riskfolio.
+#
+# $ python hrp-check.py                # against the fixtures
+# $ python hrp-check.py --live         # against riskfolio, requires riskfolio
+# $ python hrp-check.py --save         # rewrite the fixtures, requires riskfolio
+
+import sys
+import time
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+import rapidjson
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "strategies"))
+from hrp_engine import RISK_MEASURES, hrp_weights  # noqa: E402
+
+CASES = [(4, 200, 1), (8, 300, 2), (10, 500, 3), (20, 500, 4)]  # (assets, observations, seed)
+FIXTURES = Path(__file__).with_name("hrp-fixtures.json")
+
+
+def generate_returns(n_assets, n_obs, seed):
+    """Returns of assets loading on a few common factors, like crypto pairs do."""
+    rng = np.random.default_rng(seed)
+    factors = rng.normal(0, 0.02, (n_obs, 3))
+    loadings = rng.uniform(0.2, 1.5, (3, n_assets))
+    noise = rng.standard_t(4, (n_obs, n_assets)) * rng.uniform(0.005, 0.03, n_assets)
+    # Rounded, the fixtures store them as text.
+    return np.round(factors @ loadings + noise, 6)
+
+
+def riskfolio_weights(returns, rm):
+    import riskfolio as rp
+
+    columns = [f"A{i:02d}" for i in range(returns.shape[1])]
+    portfolio = rp.HCPortfolio(returns=pd.DataFrame(returns, columns=columns))
+    weights = portfolio.optimization(
+        model="HRP",
+        codependence="pearson",
+        rm=rm,
+        rf=0,
+        linkage="single",
+        max_k=10,
+        leaf_order=True,
+    )
+    return weights["weights"].reindex(columns).to_numpy()
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, float(np.median(timings) * 1000)
+
+
+def main(live=False, save=False, fixtures=str(FIXTURES), repeat=20, tolerance=1e-8):
+    if live or save:
+        cases = [{"returns": generate_returns(*case).tolist(), "weights": {}} for case in CASES]
+    else:
+        with open(fixtures, "r") as f:
+            cases = rapidjson.load(f)
+
+    failures = 0
+    for case in cases:
+        returns = np.array(case["returns"])
+        for rm in RISK_MEASURES:
+            weights, engine_ms = timed(lambda: hrp_weights(returns, rm=rm), repeat)
+
+            if rm in case["weights"]:
+                expected, reference_ms = np.array(case["weights"][rm]), None
+            else:
+                expected, reference_ms = timed(lambda: riskfolio_weights(returns, rm), repeat)
+                case["weights"][rm] = expected.tolist()
+
+            error = float(np.abs(weights - expected).max())
+            failures += error > tolerance
+            reference = f"riskfolio {reference_ms:>8.2f} ms" if reference_ms else "stored weights"
+            print(
+                f"{returns.shape[1]:>3} assets {returns.shape[0]:>4} obs {rm:<5} "
+                f"engine {engine_ms:>8.2f} ms  {reference}  max error {error:.2e}"
+            )
+
+    if save:
+        with open(fixtures, "w") as f:
+            rapidjson.dump(cases, f)
+
+    if failures:
+        print(f"\n{failures} case(s) beyond tolerance {tolerance}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
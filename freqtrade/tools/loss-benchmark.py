@@ -0,0 +1,220 @@
+# Benchmark for the custom hyperopt losses in `freqtrade/hyperopts/`.
+#
+# Every `IHyperOptLoss` found in the folder is called with synthetic backtest
+# results of increasing size. Per-call latency and peak allocations are
+# reported, and can be saved as a baseline to fail later runs that regress.
+#
+# $ python loss-benchmark.py --save=baseline.json
+# $ python loss-benchmark.py --baseline=baseline.json --threshold=1.25
+
+import importlib
+import inspect
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import fire
+import numpy as np
+import pandas as pd
+import rapidjson
+from freqtrade.optimize.hyperopt import IHyperOptLoss
+
+HYPEROPTS_DIR = Path(__file__).resolve().parents[1] / "hyperopts"
+STARTING_BALANCE = 1000.0
+STAKE_AMOUNT = 100.0
+PAIRS = [f"PAIR{i:02d}/USDT" for i in range(40)]
+
+
+def generate_results(n_trades, years=3, profit_mean=0.01, profit_std=0.05, seed=1337):
+    """
+    Generates a synthetic backtest results DataFrame.
+
+    Trades are spread uniformly over `years` ending at 2024-01-01, with
+    exponentially distributed durations and normally distributed profits.
+
+    Returns:
+    - tuple: (results, config, min_date, max_date)
+    """
+    rng = np.random.default_rng(seed)
+    max_date = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    min_date = max_date - timedelta(days=365 * years)
+    span = (max_date - min_date).total_seconds()
+
+    open_offset = np.sort(rng.uniform(0, span * 0.98, n_trades))
+    duration = np.minimum(rng.exponential(12 * 3600, n_trades), span - open_offset)
+    open_date = pd.to_datetime(min_date) + pd.to_timedelta(open_offset, unit="s")
+    close_date = open_date + pd.to_timedelta(duration, unit="s")
+    profit_ratio = rng.normal(profit_mean, profit_std, n_trades)
+    open_rate = rng.uniform(0.1, 100.0, n_trades)
+
+    results = pd.DataFrame(
+        {
+            "pair": rng.choice(PAIRS, n_trades),
+            "stake_amount": STAKE_AMOUNT,
+            "amount": STAKE_AMOUNT / open_rate,
+            "open_date": open_date.floor("min"),
+            "close_date": close_date.floor("min"),
+            "open_rate": open_rate,
+            "close_rate": open_rate * (1 + profit_ratio),
+            "fee_open": 0.001,
+            "fee_close": 0.001,
+            "trade_duration": (duration // 60).astype(int),
+            "profit_ratio": profit_ratio,
+            "profit_abs": profit_ratio * STAKE_AMOUNT,
+            "exit_reason": rng.choice(["roi", "exit_signal", "stop_loss"], n_trades),
+            "is_open": False,
+            "is_short": rng.random(n_trades) < 0.3,
+            "enter_tag": "",
+        }
+    )
+    config = {
+        "dry_run_wallet": STARTING_BALANCE,
+        "stake_currency": "USDT",
+        "stake_amount": STAKE_AMOUNT,
+        "max_open_trades": 10,
+        "timeframe": "1h",
+    }
+    return results, config, min_date, max_date
+
+
+def load_losses(directory=HYPEROPTS_DIR, names=None):
+    """Imports every module in `directory` and collects the IHyperOptLoss classes."""
+    sys.path.insert(0, str(directory))
+    losses = {}
+    for module_path in sorted(Path(directory).glob("*.py")):
+        module = importlib.import_module(module_path.stem)
+        for name, obj in inspect.getmembers(module, inspect.isclass):
+            if (
+                issubclass(obj, IHyperOptLoss)
+                and obj is not IHyperOptLoss
+                and obj.__module__ == module.__name__
+                and (not names or name in names)
+            ):
+                losses[name] = obj
+    return losses
+
+
+def _call(loss, results, config, min_date, max_date):
+    return loss.hyperopt_loss_function(
+        results=results,
+        trade_count=len(results),
+        min_date=min_date,
+        max_date=max_date,
+        config=config,
+        processed={},
+        backtest_stats={},
+        starting_balance=config["dry_run_wallet"],
+    )
+
+
+def benchmark_loss(loss, results, config, min_date, max_date, repeat=5):
+    """
+    Times a single loss and measures its peak allocations.
+
+    The results frame is copied before every call (outside of the timer) since
+    some losses add columns to it, like freqtrade passes a fresh frame per epoch.
+
+    Returns:
+    - dict: Median and minimum latency in ms, peak allocations in KiB and the loss value.
+    """
+    timings = []
+    for _ in range(repeat):
+        frame = results.copy()
+        start = time.perf_counter()
+        value = _call(loss, frame, config, min_date, max_date)
+        timings.append(time.perf_counter() - start)
+
+    frame = results.copy()
+    tracemalloc.start()
+    _call(loss, frame, config, min_date, max_date)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "median_ms": float(np.median(timings) * 1000),
+        "min_ms": float(np.min(timings) * 1000),
+        "peak_kib": peak / 1024,
+        "loss": float(value),
+    }
+
+
+def check_regressions(report, baseline, threshold, expected=None):
+    """
+    Lists the benchmarks that are slower or allocate more than `threshold` x baseline,
+    and the baseline benchmarks missing from the report, e.g. losses that now fail.
+    `expected` limits the missing ones to the benchmarks of the current run.
+    """
+    regressions = [
+        f"{key}: missing, failed or not found"
+        for key in baseline
+        if key not in report and (expected is None or expected(key))
+    ]
+    for key, current in report.items():
+        previous = baseline.get(key)
+        if previous is None:
+            continue
+        for metric in ("median_ms", "peak_kib"):
+            if previous[metric] > 0 and current[metric] > previous[metric] * threshold:
+                regressions.append(
+                    f"{key}: {metric} {previous[metric]:.2f} -> {current[metric]:.2f}"
+                )
+    return regressions
+
+
+def main(sizes=(100, 1_000, 10_000, 100_000), years=3, profit_mean=0.01, repeat=5,
+         losses=None, hyperopts_dir=str(HYPEROPTS_DIR), baseline=None, save=None,
+         threshold=1.25):
+    if isinstance(sizes, int):
+        sizes = (sizes,)
+    if isinstance(losses, str):
+        losses = (losses,)
+
+    loss_classes = load_losses(Path(hyperopts_dir), losses)
+    report = {}
+
+    for size in sizes:
+        results, config, min_date, max_date = generate_results(size, years, profit_mean)
+        for name, loss in loss_classes.items():
+            try:
+                stats = benchmark_loss(loss, results, config, min_date, max_date, repeat)
+            except NotImplementedError:
+                # Abstract base losses
+                continue
+            except Exception as e:
+                print(f"{name} ({size} trades) failed: {e!r}")
+                continue
+            report[f"{name}@{size}"] = stats
+            print(
+                f"{name:<45} {size:>7} trades  "
+                f"median {stats['median_ms']:>10.2f} ms  "
+                f"min {stats['min_ms']:>10.2f} ms  "
+                f"peak {stats['peak_kib']:>10.1f} KiB"
+            )
+
+    if save:
+        with open(save, "w") as f:
+            rapidjson.dump(report, f, indent=2)
+
+    if baseline:
+        with open(baseline, "r") as f:
+            regressions = check_regressions(
+                report,
+                rapidjson.load(f),
+                threshold,
+                # Benchmarks of the sizes and losses of this run.
+                lambda key: (
+                    key.rpartition("@")[2] in {str(size) for size in sizes}
+                    and (losses is None or key.rpartition("@")[0] in losses)
+                ),
+            )
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against baseline (threshold {threshold}x):")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)
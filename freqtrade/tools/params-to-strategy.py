@@ -1,3 +1,10 @@
+# Turns the results of a hyperopt results file into strategy variants, written as
+# one variants file of parameters for auto-hyperopt's variant loader, or with
+# --python as one derived strategy file per result.
+#
+# $ python params-to-strategy.py results.fthypt user_data/strategies/Evolver
+# $ python params-to-strategy.py results.fthypt user_data/strategies --python
+
 from copy import deepcopy
 from datetime import datetime, timezone
 from pathlib import Path
@@ -89,11 +96,26 @@ def write_file(params, idx, output_dir, strategy_name):
         f.write("\n".join(params_text))
 
 
-def main(input_file, output_dir, strategy_name="Evolver"):
+def write_variants(variants, output_dir, strategy_name):
+    outfile = Path(output_dir) / "variants.json"
+    with outfile.open("w") as f:
+        rapidjson.dump({"strategy": strategy_name, "variants": variants}, f)
+
+
+def main(input_file, output_dir, strategy_name="Evolver", python=False):
+    variants = {}
     for idx, line in enumerate(open(input_file, "r")):
         config = rapidjson.loads(line)
         params = get_strategy_config(config, strategy_name)
-        write_file(params["params"], idx, output_dir, strategy_name)
+        if python:
+            write_file(params["params"], idx, output_dir, strategy_name)
+        else:
+            variants[f"{strategy_name}_{idx:03d}"] = {
+                space: HyperoptTools._space_params(params["params"], space, 5)
+                for space in params["params"]
+            }
+    if not python:
+        write_variants(variants, output_dir, strategy_name)
 
 
 if __name__ == "__main__":
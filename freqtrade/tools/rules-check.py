@@ -0,0 +1,166 @@
+# Verifies the rules compiled by Finder and Seeker in `freqtrade/strategies/rule_compiler.py`
+# against the Series-based rules they replaced, for every operator, shift and day
+# of week window, and benchmarks both.
+#
+# $ python rules-check.py
+# $ python rules-check.py --candles=50000 --repeat=50
+
+import sys
+import time
+from functools import reduce
+from itertools import product
+from pathlib import Path
+from types import SimpleNamespace
+
+import fire
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "strategies"))
+from Finder import Finder  # noqa: E402
+from rule_compiler import Condition, evaluate  # noqa: E402
+from Seeker import Seeker  # noqa: E402
+
+FINDER_OPERATORS = ["GOING_UP", "GOING_DOWN", "RISING", "FALLING", "ABOVE_AVERAGED", "BELOW_AVERAGED"]
+SEEKER_OPERATORS = ["CROSS_UP", "CROSS_DOWN", "GREATER_THAN", "LESSER_THAN", "RAISING", "FALLING"]
+
+
+def finder_reference(series, averaged, operator, shift):
+    shifted = series.shift(shift)
+
+    if operator in ["ABOVE_AVERAGED", "BELOW_AVERAGED"]:
+        comparison = (
+            series > averaged.shift(shift)
+            if operator == "ABOVE_AVERAGED"
+            else series < averaged.shift(shift)
+        )
+        return comparison
+
+    value0, value1, value2 = shifted, shifted.shift(1), shifted.shift(2)
+
+    comparison_operators = {
+        "GOING_UP": (value0 > value1) & (value1 < value2),
+        "GOING_DOWN": (value0 < value1) & (value1 > value2),
+        "RISING": (value0 > value1) & (value1 > value2),
+        "FALLING": (value0 < value1) & (value1 < value2),
+    }
+
+    return comparison_operators.get(operator, pd.Series(False, index=series.index))
+
+
+def finder_dow_reference(dow, min_dow, max_dow):
+    if min_dow < max_dow:
+        return (dow >= min_dow) & (dow <= max_dow)
+    else:
+        return (dow <= min_dow) & (dow >= max_dow)
+
+
+def seeker_reference(series1, series2, shift, comparison):
+    value1 = series1.shift(shift + 1)
+    value2 = series2.shift(shift + 1)
+    value3 = series1.shift(shift)
+    value4 = series2.shift(shift)
+
+    if comparison == "CROSS_UP":
+        return (value1 < value2) & (value3 > value4)
+    elif comparison == "CROSS_DOWN":
+        return (value1 > value2) & (value3 < value4)
+    elif comparison == "GREATER_THAN":
+        return series1.shift(shift) > series2.shift(shift)
+    elif comparison == "LESSER_THAN":
+        return series1.shift(shift) < series2.shift(shift)
+    elif comparison == "RAISING":
+        return value1 < value3
+    elif comparison == "FALLING":
+        return value1 > value3
+    return False
+
+
+def generate_dataframe(candles, seed):
+    """Indicator-like series with a NaN warmup, flat stretches and zero volume candles."""
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, candles)))
+    close[rng.random(candles) < 0.1] = np.nan
+    close = pd.Series(close).ffill().round(1)  # Rounding makes ties.
+    close[:20] = np.nan
+    return pd.DataFrame({
+        "date": pd.date_range("2022-01-01", periods=candles, freq="4h", tz="UTC"),
+        "close": close,
+        "close_smooth": close.ewm(span=10).mean().round(1),
+        "volume": np.where(rng.random(candles) < 0.05, 0.0, rng.uniform(1, 100, candles)),
+    })
+
+
+def parameters(**values):
+    return SimpleNamespace(**{name: SimpleNamespace(value=value) for name, value in values.items()})
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return result, float(np.median(timings) * 1000)
+
+
+def main(candles=5000, seed=1, repeat=20):
+    df = generate_dataframe(candles, seed)
+    df["dow"] = df["date"].dt.dayofweek
+    series, averaged, volume = df["close"], df["close_smooth"], df["volume"]
+    failures, checked = 0, 0
+
+    for operator, shift, (min_dow, max_dow) in product(
+        FINDER_OPERATORS, range(0, 12, 2), product(range(7), range(7))
+    ):
+        params = parameters(buy_0_operator=operator, buy_min_dow=min_dow, buy_max_dow=max_dow)
+        conditions = Finder._compile_operator(params, "buy_0", "buy", 0, shift)
+        conditions += Finder._compile_dow_conditions(params, "buy")
+        arrays = {"buy_0": series, "buy_0_averaged": averaged, "dow": df["dow"]}
+        expected = finder_reference(series, averaged, operator, shift) & finder_dow_reference(
+            df["dow"], min_dow, max_dow
+        )
+        failures += not np.array_equal(evaluate(conditions, arrays, candles), expected.to_numpy())
+        checked += 1
+
+    for operator, shift in product(SEEKER_OPERATORS, range(0, 20, 2)):
+        conditions = Seeker.compare_series(None, "close", "close_smooth", shift, operator)
+        expected = seeker_reference(series, averaged, shift, operator)
+        failures += not np.array_equal(evaluate(conditions, df, candles), expected.to_numpy())
+        checked += 1
+
+    # Two rules, volume and day of week, like a Finder side with both rules enabled.
+    params = parameters(
+        buy_0_operator="GOING_UP", buy_1_operator="ABOVE_AVERAGED", buy_min_dow=1, buy_max_dow=5
+    )
+    conditions = Finder._compile_operator(params, "buy_0", "buy", 0, 2)
+    conditions += Finder._compile_operator(params, "buy_1", "buy", 1, 4)
+    conditions += Finder._compile_dow_conditions(params, "buy")
+    arrays = {
+        "buy_0": series, "buy_0_averaged": averaged,
+        "buy_1": averaged, "buy_1_averaged": series,
+        "dow": df["dow"], "volume": volume,
+    }
+    conditions.append(Condition("volume", ">", 0))
+
+    def reference():
+        return reduce(lambda x, y: x & y, [
+            finder_reference(series, averaged, "GOING_UP", 2),
+            finder_reference(averaged, series, "ABOVE_AVERAGED", 4),
+            volume > 0,
+            finder_dow_reference(df["dow"], 1, 5),
+        ])
+
+    expected, reference_ms = timed(reference, repeat)
+    mask, compiled_ms = timed(lambda: evaluate(conditions, arrays, candles), repeat)
+    failures += not np.array_equal(mask, expected.to_numpy())
+    checked += 1
+
+    print(f"{checked} rule sets, {failures} mismatch(es)")
+    print(f"{candles} candles: series {reference_ms:.3f} ms  compiled {compiled_ms:.3f} ms")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    fire.Fire(main)